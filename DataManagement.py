@@ -7,11 +7,15 @@ Possibly using JSON format, which seems easy in Python
 http://stackabuse.com/reading-and-writing-json-to-a-file-in-python/"""
 
 # TODO: Create a class to handle analyzing data, or at least some scripts
-import dill
 import datetime
 import errno
+import mmap
 import os
-from tkinter.filedialog import askopenfilename
+import struct
+import numpy as np
+from Threat import THREAT_DTYPE, GaussThreatField, GaussDynamicThreatField
+# dill and tkinter are imported where they are used, so headless workers
+# importing this module don't pay for (or fail on) them
 
 
 class DataCollector:
@@ -44,6 +48,7 @@ class DataCollector:
             if e.errno != errno.EEXIST:
                 raise
         full_file = the_folder + self.filename
+        import dill
         with open(full_file, 'wb') as f:
             dill.dump(self.sim_data, f)
 
@@ -60,6 +65,8 @@ class DataReader:
         self.file_location = ''
 
     def get_data_from_prompt(self):
+        import dill
+        from tkinter.filedialog import askopenfilename
         pickle_file = askopenfilename()
 
         with open(pickle_file, 'rb') as f:
@@ -79,9 +86,246 @@ class SimData:
         self.sim_id = sim_id
         self.path_costs = {"no_wait": 0, "wait": 0, "wait_heuristic": 0}
         self.paths = {"no_wait": None, "wait": None, "wait_heuristic": None}
+        self.path_codes = {}  # same keys as paths, encode_path bytes stored by store_path
+        self.path_grids = {}  # same keys as path_codes, (n_grid_x, n_grid) the path was encoded with
         self.num_nodes_gen = {"no_wait": 0, "wait": 0, "wait_heuristic": 0}
         self.compute_time = {"no_wait": 0, "wait": 0, "wait_heuristic": 0}
+        self.search_stats = {"no_wait": None, "wait": None, "wait_heuristic": None}  # SearchStats.as_dict()
         self.env_data = {"n_threats": 0, "x_size": 0, "y_size": 0, "x_pts": 10, "y_pts": 0,
-                         "t_final": 0, "t_pts": 0, "exposure_cost": 0, "move_cost": 0, "wait_cost": 0}
+                         "t_final": 0, "t_pts": 0, "exposure_cost": 0, "move_cost": 0, "wait_cost": 0,
+                         "threat_offset": 0}
         self.threats = None
+        self.field_bytes = None  # threat field and environment in the binary field format, see store_field
         self.wait_label = None  # "wait" or "go"
+
+    def __setstate__(self, state):
+        # SimData pickled before field_bytes, path_codes and path_grids were added has none of them
+        self.__dict__.update(state)
+        self.__dict__.setdefault("field_bytes", None)
+        self.__dict__.setdefault("path_codes", {})
+        self.__dict__.setdefault("path_grids", {})
+
+    def store_field(self, env, threat_field):
+        """Record the environment and threat field: fills env_data and stores them as
+        field_bytes (pack_fields) instead of pickling the threat objects"""
+        self.env_data["n_threats"] = threat_field.n_threats
+        self.env_data["x_size"] = env.x_size
+        self.env_data["y_size"] = env.y_size
+        self.env_data["x_pts"] = env.n_grid_x
+        self.env_data["y_pts"] = env.n_grid_y
+        self.env_data["t_final"] = env.t_final
+        self.env_data["t_pts"] = env.t_pts
+        self.env_data["exposure_cost"] = env.exposure_cost
+        self.env_data["move_cost"] = env.move_cost
+        self.env_data["wait_cost"] = env.wait_cost
+        self.env_data["threat_offset"] = threat_field.offset
+        self.threats = None
+        self.field_bytes = pack_fields([threat_field], env=env)
+
+    def load_field(self):
+        """Return (env, threat_field) with the field added to env, from field_bytes or, for
+        older data, from env_data and threats"""
+        if self.field_bytes is not None:
+            archive = FieldArchive(self.field_bytes)
+            env, threat_field = archive.environment(), archive.field(0)
+            env.add_threat_field(threat_field)
+            return env, threat_field
+        from Environment import XYTEnvironment
+        env_data = self.env_data
+        env = XYTEnvironment(x_size=env_data["x_size"], y_size=env_data["y_size"], x_pts=env_data["x_pts"],
+                             y_pts=env_data["y_pts"], t_final=env_data["t_final"], t_pts=env_data["t_pts"],
+                             exp_cost=env_data["exposure_cost"], wait_cost=env_data["wait_cost"],
+                             move_cost=env_data["move_cost"])
+        threat_field = GaussDynamicThreatField(threats=self.threats, offset=env_data.get("threat_offset", 0))
+        env.add_threat_field(threat_field)
+        return env, threat_field
+
+    def store_path(self, key, env, path):
+        """Store a path (node_ids, Nodes or PathArrays) under key as encode_path bytes, with the
+        grid of env it decodes on, so store_field isn't needed to load it back"""
+        self.paths[key] = None
+        self.path_codes[key] = encode_path(env, path) if path is not None else None
+        self.path_grids[key] = (env.n_grid_x, env.n_grid if hasattr(env, 't_final') else 0)
+
+    def load_path(self, key):
+        """node_id array of the path stored under key, from path_codes or paths. None if there is none"""
+        if self.path_codes.get(key) is not None:
+            if key in self.path_grids:
+                n_grid_x, n_grid = self.path_grids[key]
+            else:  # stored before path_grids, decode on the grid recorded by store_field
+                env_data = self.env_data
+                n_grid_x = env_data["x_pts"]
+                n_grid = env_data["x_pts"] * env_data["y_pts"] if env_data["t_pts"] else 0
+            return decode_path(n_grid_x, n_grid, self.path_codes[key])
+        if self.paths.get(key) is None:
+            return None
+        return np.array([node.node_id for node in self.paths[key]], dtype=np.int64)
+
+
+# Binary field format, little endian:
+#   header        _FIELD_HEADER: magic, version, flags, number of fields, environment spec
+#   field table   FIELD_DTYPE per field: offset, index of its first threat record, threat count, dynamic
+#   threats       THREAT_DTYPE per threat, all fields back to back
+# Every section is 8-byte aligned, so the tables can be viewed with np.frombuffer without copying.
+FIELD_FORMAT_VERSION = 1
+_FIELD_MAGIC = b'TFLD'
+_FIELD_HEADER = struct.Struct('<4sHHQddIIdIIddd')
+_HAS_ENV = 1
+_INTEGRATE_EXPOSURE = 2
+FIELD_DTYPE = np.dtype([('offset', '<f8'), ('first', '<u8'), ('n_threats', '<u4'), ('dynamic', '<u4')])
+
+
+def pack_fields(threat_fields, env=None):
+    """Serialize GaussThreatFields (and optionally the environment they share) to bytes
+
+    blob = pack_fields([threat_field], env=env)
+    env, threat_field = FieldArchive(blob).environment(), FieldArchive(blob).field(0)"""
+    threat_fields = list(threat_fields)
+    records = [threat_field.threat_records() for threat_field in threat_fields]
+    table = np.zeros(len(threat_fields), dtype=FIELD_DTYPE)
+    table['offset'] = [threat_field.offset for threat_field in threat_fields]
+    table['n_threats'] = [len(rec) for rec in records]
+    table['first'] = np.cumsum(table['n_threats']) - table['n_threats']
+    table['dynamic'] = [isinstance(threat_field, GaussDynamicThreatField) for threat_field in threat_fields]
+
+    flags = 0
+    env_spec = (0.0, 0.0, 0, 0, 0.0, 0, 0, 0.0, 0.0, 0.0)
+    if env is not None:
+        flags = _HAS_ENV | (_INTEGRATE_EXPOSURE if getattr(env, 'integrate_exposure', False) else 0)
+        env_spec = (env.x_size, env.y_size, env.n_grid_x, env.n_grid_y, getattr(env, 't_final', 0.0),
+                    getattr(env, 't_pts', 0), 0, getattr(env, 'exposure_cost', 0.0),
+                    getattr(env, 'move_cost', 0.0), getattr(env, 'wait_cost', 0.0))
+    header = _FIELD_HEADER.pack(_FIELD_MAGIC, FIELD_FORMAT_VERSION, flags, len(threat_fields), *env_spec)
+    threats = np.concatenate(records) if records else np.zeros(0, dtype=THREAT_DTYPE)
+    return b''.join((header, table.tobytes(), threats.tobytes()))
+
+
+def write_fields(filename, threat_fields, env=None):
+    """Write pack_fields(threat_fields, env) to filename, read it back with FieldArchive.open"""
+    with open(filename, 'wb') as f:
+        f.write(pack_fields(threat_fields, env=env))
+
+
+class FieldArchive:
+    """FieldArchive
+
+    Read access to the binary field format, from bytes or a memory mapped file. The field
+    table and threat records are np.frombuffer views of the buffer, nothing is copied until
+    a field object is built.
+
+    archive = FieldArchive.open('fields.bin')
+    env = archive.environment()
+    threat_field = archive.field(3)
+    unique = {archive.field_key(i) for i in range(len(archive))}
+
+    Functions:
+    - threats: the THREAT_DTYPE records of one field (a view)
+    - field: build the GaussThreatField/GaussDynamicThreatField of one field
+    - field_key: hashable bytes identifying one field by value
+    - environment: build the environment stored in the header, None if there is none"""
+
+    def __init__(self, buffer):
+        magic, version, flags, n_fields, *env_spec = _FIELD_HEADER.unpack_from(buffer, 0)
+        if magic != _FIELD_MAGIC:
+            raise ValueError("not a threat field buffer")
+        if version != FIELD_FORMAT_VERSION:
+            raise ValueError("field format version {0} is not supported (expected {1})".format(
+                version, FIELD_FORMAT_VERSION))
+        self.version = version
+        self.buffer = buffer
+        self.table = np.frombuffer(buffer, dtype=FIELD_DTYPE, count=n_fields, offset=_FIELD_HEADER.size)
+        n_threats = int(self.table['n_threats'].sum())
+        self.records = np.frombuffer(buffer, dtype=THREAT_DTYPE, count=n_threats,
+                                     offset=_FIELD_HEADER.size + self.table.nbytes)
+        self.env_spec = None
+        if flags & _HAS_ENV:
+            x_size, y_size, x_pts, y_pts, t_final, t_pts, _, exposure_cost, move_cost, wait_cost = env_spec
+            self.env_spec = {"x_size": x_size, "y_size": y_size, "x_pts": x_pts, "y_pts": y_pts,
+                             "t_final": t_final, "t_pts": t_pts, "exposure_cost": exposure_cost,
+                             "move_cost": move_cost, "wait_cost": wait_cost,
+                             "integrate_exposure": bool(flags & _INTEGRATE_EXPOSURE)}
+
+    @classmethod
+    def open(cls, filename):
+        """Memory map filename read-only and return a FieldArchive over it"""
+        with open(filename, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __len__(self):
+        return len(self.table)
+
+    def threats(self, index):
+        first = int(self.table['first'][index])
+        return self.records[first:first + int(self.table['n_threats'][index])]
+
+    def field(self, index):
+        cls = GaussDynamicThreatField if self.table['dynamic'][index] else GaussThreatField
+        return cls.from_records(self.threats(index), offset=float(self.table['offset'][index]))
+
+    def field_key(self, index):
+        entry = self.table[index]
+        return struct.pack('<dI', entry['offset'], entry['dynamic']) + self.threats(index).tobytes()
+
+    def environment(self):
+        """Build the stored environment (XYTEnvironment, or XYEnvironment if it has no time
+        points) without a threat field"""
+        if self.env_spec is None:
+            return None
+        from Environment import XYEnvironment, XYTEnvironment
+        spec = self.env_spec
+        if not spec["t_pts"]:
+            return XYEnvironment(x_size=spec["x_size"], y_size=spec["y_size"], x_pts=spec["x_pts"], y_pts=spec["y_pts"])
+        return XYTEnvironment(x_size=spec["x_size"], y_size=spec["y_size"], x_pts=spec["x_pts"], y_pts=spec["y_pts"],
+                              t_final=spec["t_final"], t_pts=spec["t_pts"], exp_cost=spec["exposure_cost"],
+                              wait_cost=spec["wait_cost"], move_cost=spec["move_cost"],
+                              integrate_exposure=spec["integrate_exposure"])
+
+
+# Path codec: every step of a time-expanded path moves one layer up and WAITs or moves one cell
+# RIGHT, LEFT, ABOVE or BELOW (the ReservationTable order), so a path is its start node_id plus
+# a 3-bit move code per step, packed 8 codes to 3 bytes. On an XYEnvironment the steps are
+# the same moves without the layer (n_grid = 0).
+_PATH_HEADER = struct.Struct('<qI')  # start node_id, number of steps
+_CODE_WEIGHTS = np.array([4, 2, 1], dtype=np.uint8)
+
+
+def _move_offsets(n_grid_x, n_grid):
+    """node_id offset of each move code"""
+    return np.array([0, 1, -1, n_grid_x, -n_grid_x], dtype=np.int64) + n_grid
+
+
+def encode_path(env, path):
+    """Encode a path of node_ids (list/array, or Nodes/PathArrays) on env as bytes
+
+    code = encode_path(env, path_ids)
+    path_ids = decode_path(env.n_grid_x, env.n_grid, code)"""
+    if hasattr(path, 'node_id'):
+        node_ids = np.asarray(path.node_id, dtype=np.int64)
+    else:
+        node_ids = np.array([getattr(node, 'node_id', node) for node in path], dtype=np.int64)
+    n_grid = env.n_grid if hasattr(env, 't_final') else 0
+    steps = np.diff(node_ids)
+    offsets = _move_offsets(env.n_grid_x, n_grid)
+    order = np.argsort(offsets)
+    codes = order[np.clip(np.searchsorted(offsets[order], steps), 0, len(offsets) - 1)]
+    if not np.array_equal(offsets[codes], steps):
+        bad = int(np.flatnonzero(offsets[codes] != steps)[0])
+        raise ValueError("step {0} of the path ({1} -> {2}) is not a lattice move".format(
+            bad, node_ids[bad], node_ids[bad + 1]))
+    # low 3 bits of each code, most significant first
+    bits = np.unpackbits(codes.astype(np.uint8)[:, None], axis=1)[:, 5:]
+    return _PATH_HEADER.pack(int(node_ids[0]), len(steps)) + np.packbits(bits.ravel()).tobytes()
+
+
+def decode_path(n_grid_x, n_grid, code):
+    """node_id array of a path encoded with encode_path. n_grid is 0 for XYEnvironment paths
+
+    path_ids = decode_path(env.n_grid_x, env.n_grid, code)"""
+    start_id, n_steps = _PATH_HEADER.unpack_from(code, 0)
+    bits = np.unpackbits(np.frombuffer(code, dtype=np.uint8, offset=_PATH_HEADER.size))[:3 * n_steps]
+    codes = bits.reshape(n_steps, 3) @ _CODE_WEIGHTS
+    node_ids = np.empty(n_steps + 1, dtype=np.int64)
+    node_ids[0] = start_id
+    np.cumsum(_move_offsets(n_grid_x, n_grid)[codes], out=node_ids[1:])
+    node_ids[1:] += start_id
+    return node_ids
@@ -100,6 +100,22 @@ class XYEnvironment(Environment):
             neighbors.append(new_node)
         return neighbors
 
+    def get_node_in_direction(self, node, step):
+        """Get the XYNode one grid step away from node, or None if the step leaves the grid.
+        step is a node_id offset: +1/-1 for RIGHT/LEFT, +n_grid_x/-n_grid_x for ABOVE/BELOW
+
+        right_node = env.get_node_in_direction(node, 1)"""
+        curr_id = node.node_id
+        new_id = curr_id + step
+        if new_id < 0 or new_id >= self.n_grid:
+            return None
+        if (step == 1 or step == -1) and int(new_id / self.n_grid_x) != int(curr_id / self.n_grid_x):
+            return None
+        new_node = XYNode(new_id)
+        new_node.pos_x = (new_id % self.n_grid_x) * self.grid_sep_x
+        new_node.pos_y = int(new_id / self.n_grid_x) * self.grid_sep_y
+        return new_node
+
     def get_location_from_gridpt(self, gridpt):
         """Get an x, y location from a grid point id number
 
@@ -140,10 +156,14 @@ class SquareXYEnvironment(XYEnvironment):
 
 
 class XYTEnvironment(XYEnvironment):
-    """This defines a Time-varying 2D environment, therefore locations are (x, y, t) points"""
+    """This defines a Time-varying 2D environment, therefore locations are (x, y, t) points
+
+    With integrate_exposure=True, TimeAstar charges each edge the threat integrated along it
+    (threat_field.edge_exposure) instead of the threat sampled at the destination node, which
+    keeps path costs accurate on coarser grids."""
 
     def __init__(self, x_size, y_size, x_pts, y_pts, t_final, t_pts, exp_cost=1,
-                 wait_cost=0, move_cost=0):
+                 wait_cost=0, move_cost=0, integrate_exposure=False):
         super().__init__(x_size=x_size, y_size=y_size, x_pts=x_pts, y_pts=y_pts)
 
         self.t_final = t_final
@@ -152,6 +172,11 @@ class XYTEnvironment(XYEnvironment):
         self.exposure_cost = exp_cost
         self.wait_cost = wait_cost
         self.move_cost = move_cost
+        self.integrate_exposure = integrate_exposure
+        # Spatial length of an edge, keyed by its node_id offset within the next time layer
+        # (neighbor.node_id - node.node_id - n_grid): WAIT, RIGHT, LEFT, ABOVE, BELOW
+        self.step_distance = {0: 0.0, 1: self.grid_sep_x, -1: self.grid_sep_x,
+                              self.n_grid_x: self.grid_sep_y, -self.n_grid_x: self.grid_sep_y}
         # There are some additional considerations to think about speed with relation
         # to the density of the grid. Seems more appropriate if time step is related to
         # the grid separation. Otherwise vehicle apparent speed changes with grid size,
@@ -242,6 +267,20 @@ class XYTEnvironment(XYEnvironment):
         gridpt = my * self.n_grid_x + mx + t_idx * self.n_grid
         return gridpt
 
+    def bake_threat_values(self):
+        """Evaluate the threat field at every node of the lattice (time layers 0..t_pts).
+        Returns an array of shape (t_pts + 1, n_grid_y, n_grid_x), laid out so that
+        threat.ravel()[node_id] is the threat value at node_id
+
+        threat = env.bake_threat_values()"""
+        pos_x = np.arange(self.n_grid_x) * self.grid_sep_x
+        pos_y = np.arange(self.n_grid_y) * self.grid_sep_y
+        grid_x, grid_y = np.meshgrid(pos_x, pos_y)
+        threat = np.empty((self.t_pts + 1, self.n_grid_y, self.n_grid_x))
+        for time_idx in range(self.t_pts + 1):  # a layer at a time keeps memory at n_grid*n_threats
+            threat[time_idx] = self.threat_field.threat_values(grid_x, grid_y, time_idx * self.t_sep)
+        return threat
+
     def node_spatial_distance(self, node1, node2):
         """Find the Euclidean (Norm-2) distance between two nodes in the XYTEnvironment"""
         n1_vec = (node1.pos_x, node1.pos_y)
@@ -252,3 +291,57 @@ class XYTEnvironment(XYEnvironment):
         selfstring = "x_size = {0}, y_size = {1}, n_grid_x = {2}, n_grid_y = {3}, t_final = {4}".format(
             self.x_size, self.y_size, self.n_grid_x, self.n_grid_y, self.t_final)
         return "XYTEnv: " + selfstring
+
+
+class StreamingXYTEnvironment(XYEnvironment):
+    """A Time-varying 2D environment without a fixed final time, for long missions
+
+    Time is an unbounded index of layers t = time_idx*t_sep and threat values are evaluated a
+    whole layer at a time, on demand, when get_layer asks for it. Layers are kept until
+    discard_before drops the ones behind the search frontier, so memory depends on the
+    planning horizon, not the mission length. Locations are grid points (cells) and time
+    indices are kept separately, instead of being encoded in the node_id.
+
+    env = StreamingXYTEnvironment(x_size=10, y_size=10, x_pts=20, y_pts=20, t_sep=0.25,
+                                  threat_field=dynamic_field)
+    threat = env.get_layer(time_idx)   # shape (n_grid_y, n_grid_x)
+    env.discard_before(time_idx)
+
+    The threat field must stay valid (positive shapes) for every time the mission reaches."""
+
+    def __init__(self, x_size, y_size, x_pts, y_pts, t_sep, exp_cost=1, wait_cost=0, move_cost=0,
+                 threat_field=None):
+        super().__init__(x_size=x_size, y_size=y_size, x_pts=x_pts, y_pts=y_pts, threat_field=threat_field)
+
+        self.t_sep = t_sep
+        self.exposure_cost = exp_cost
+        self.wait_cost = wait_cost
+        self.move_cost = move_cost
+        self.step_distance = {0: 0.0, 1: self.grid_sep_x, -1: self.grid_sep_x,
+                              self.n_grid_x: self.grid_sep_y, -self.n_grid_x: self.grid_sep_y}
+        self.first_layer = 0  # layers before this time index have been discarded
+        self.layers = {}  # time_idx -> threat values of the layer
+
+        pos_x = np.arange(self.n_grid_x) * self.grid_sep_x
+        pos_y = np.arange(self.n_grid_y) * self.grid_sep_y
+        self._grid_x, self._grid_y = np.meshgrid(pos_x, pos_y)
+
+    def get_layer(self, time_idx):
+        """Threat values of every cell at time index time_idx, shape (n_grid_y, n_grid_x)"""
+        if time_idx < self.first_layer:
+            raise ValueError("time layer {0} was discarded, first layer is {1}".format(time_idx, self.first_layer))
+        if time_idx not in self.layers:
+            self.layers[time_idx] = self.threat_field.threat_values(self._grid_x, self._grid_y,
+                                                                    time_idx * self.t_sep)
+        return self.layers[time_idx]
+
+    def discard_before(self, time_idx):
+        """Drop the layers before time index time_idx, they can no longer be requested"""
+        for old_idx in [t for t in self.layers if t < time_idx]:
+            del self.layers[old_idx]
+        self.first_layer = max(self.first_layer, time_idx)
+
+    def __str__(self):
+        selfstring = "x_size = {0}, y_size = {1}, n_grid_x = {2}, n_grid_y = {3}, t_sep = {4}".format(
+            self.x_size, self.y_size, self.n_grid_x, self.n_grid_y, self.t_sep)
+        return "StreamingXYTEnv: " + selfstring
@@ -9,7 +9,14 @@ f: (g + h) expected cost from start to goal
 g: cost from start vertex to current vertex
 h: the heuristic cost of going from current vertex to goal
 is_in_openlist: marker if in the openlist/frontier
-is_visited: marker if vertex has been explored (closed/expanded vertex list)"""
+is_visited: marker if vertex has been explored (closed/expanded vertex list)
+
+A Graph can be reused for many consecutive searches. Each search starts a new search epoch
+(graph.new_search()) and a Vertex's search info is only reset when the search first touches
+it, so reuse costs O(1) up front and keeps the cached adjacency (successors) of every Vertex.
+
+Nodes and Vertex's use __slots__ to keep per-node memory small. CompactGraph/CompactVertex
+additionally store each Vertex's neighbors as a tuple of node_ids instead of a dict."""
 
 import sys
 from functools import total_ordering
@@ -22,6 +29,8 @@ class Node(object):
 
     Typically there should be no need to directly generate Node objects, except perhaps
     for the start and goal node locations. """
+    __slots__ = ('node_id', 'is_goal')
+
     def __init__(self, node_id):
         self.node_id = node_id
         self.is_goal = False
@@ -32,12 +41,29 @@ class Node(object):
     def __eq__(self, other):
         return self.node_id == other.node_id
 
+    def __getstate__(self):
+        state = {}
+        for cls in type(self).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                if hasattr(self, name):
+                    state[name] = getattr(self, name)
+        return state
+
+    def __setstate__(self, state):
+        # Nodes pickled before __slots__ was added have a plain dict state
+        if isinstance(state, tuple):
+            state = dict(state[0] or {}, **(state[1] or {}))
+        for name, value in state.items():
+            setattr(self, name, value)
+
 
 class XYNode(Node):
     """XYNode is the 2D Node which should be used with XYEnvironment
 
     Most use cases have no need to generate XYNode directly.
     See 'test_search.py' for example of generating all XYNodes in a given XYEnvironment."""
+    __slots__ = ('pos_x', 'pos_y', 'threat_value')
+
     def __init__(self, node_id, pos_x=0, pos_y=0, threat_value=0):
         super().__init__(node_id=node_id)
 
@@ -56,6 +82,8 @@ class XYNode(Node):
 
 class XYTNode(XYNode):
     """Time dependent version of XYNode"""
+    __slots__ = ('time', 'time_idx')
+
     def __init__(self, node_id, pos_x=0, pos_y=0, threat_value=0, time=0, time_idx=0):
         super().__init__(node_id=node_id, pos_x=pos_x, pos_y=pos_y, threat_value=threat_value)
 
@@ -73,50 +101,48 @@ class XYTNode(XYNode):
 
 
 @total_ordering
-class Vertex(object):
-    """Vertex objects are used in the Search algorithms. They are 'interface' between
-    the physical Nodes and the Graph class. Vertex's store all the typical search algorithm
-    parameters such as: parent/previous/backpointer, neighbors, (g,h,f) costs, and flags
-    marking if the Vertex is in the open list/frontier/fringe and a flag for explored/
-    visited/closed list.
+class _VertexBase(object):
+    """Search info shared by Vertex and CompactVertex. Each subclass adds the slots its
+    neighbor storage needs, so no vertex carries an unused neighbors slot."""
+    __slots__ = ('vert_id', 'node', 'parent', 'is_in_openlist', 'is_visited',
+                 'f_cost', 'g_cost', 'h_cost', 'search_epoch', 'successors', 'successors_wait')
 
-    Takes a Node object to initialize:
-    start_node = XYNode(node_id, pos_x, pos_y)
-    start_vertex = Vertex(start_node)
-
-    Although most Vertex's are generated internally by the Graph class."""
-    def __init__(self, node):
+    def __init__(self, node, search_epoch=0):
         self.vert_id = node.node_id
         self.node = node
         self.parent = None
-        self.neighbors = {}
         self.is_in_openlist = False
         self.is_visited = False
         self.f_cost = sys.maxsize
         self.g_cost = sys.maxsize
         self.h_cost = 0
+        self.search_epoch = search_epoch
+        self.successors = None
+        self.successors_wait = False
 
     def clear_vertex_search_info(self):
         self.parent = None
-        self.neighbors = {}
         self.is_in_openlist = False
         self.is_visited = False
         self.f_cost = sys.maxsize
         self.g_cost = sys.maxsize
         self.h_cost = 0
+        self.successors = None
+        self.successors_wait = False
 
-    def add_neighbor(self, neighbor, edge_cost=0):
-        self.neighbors[neighbor] = edge_cost
-
-    def get_neighbors_ids(self):
-        return self.neighbors.keys()
+    def reset_search_info(self, search_epoch):
+        """Reset the search info for a new search epoch, keeping neighbors and successors"""
+        self.parent = None
+        self.is_in_openlist = False
+        self.is_visited = False
+        self.f_cost = sys.maxsize
+        self.g_cost = sys.maxsize
+        self.h_cost = 0
+        self.search_epoch = search_epoch
 
     def get_node_id(self):
         return self.node.node_id
 
-    def get_neighbor_cost(self, neighbor):  # edge weight, edge cost
-        return self.neighbors[neighbor]
-
     def get_g_cost(self):
         return self.g_cost
 
@@ -138,9 +164,6 @@ class Vertex(object):
     def set_is_in_open(self, value=True):
         self.is_in_openlist = value
 
-    def __str__(self):
-        return str(self.node.node_id) + '\'s neighbors: ' + str([x.node.node_id for x in self.neighbors])
-
     def __eq__(self, other):
         if isinstance(other, self.__class__):
             return self.f_cost == other.f_cost
@@ -154,6 +177,87 @@ class Vertex(object):
         return id(self)
 
 
+class Vertex(_VertexBase):
+    """Vertex objects are used in the Search algorithms. They are 'interface' between
+    the physical Nodes and the Graph class. Vertex's store all the typical search algorithm
+    parameters such as: parent/previous/backpointer, neighbors, (g,h,f) costs, and flags
+    marking if the Vertex is in the open list/frontier/fringe and a flag for explored/
+    visited/closed list.
+
+    Takes a Node object to initialize:
+    start_node = XYNode(node_id, pos_x, pos_y)
+    start_vertex = Vertex(start_node)
+
+    Although most Vertex's are generated internally by the Graph class.
+
+    search_epoch: the Graph search epoch the search info (parent, flags, costs) belongs to
+    successors: cached tuple of the Vertex's successor Vertex's (from env.get_neighbors),
+                successors_wait marks if they were generated with wait=True"""
+    __slots__ = ('neighbors',)
+
+    def __init__(self, node, search_epoch=0):
+        super().__init__(node, search_epoch=search_epoch)
+        self.neighbors = {}
+
+    def clear_vertex_search_info(self):
+        super().clear_vertex_search_info()
+        self.neighbors = {}
+
+    def add_neighbor(self, neighbor, edge_cost=0):
+        self.neighbors[neighbor] = edge_cost
+
+    def get_neighbors_ids(self):
+        return self.neighbors.keys()
+
+    def get_neighbor_cost(self, neighbor):  # edge weight, edge cost
+        return self.neighbors[neighbor]
+
+    def __str__(self):
+        return str(self.node.node_id) + '\'s neighbors: ' + str([x.node.node_id for x in self.neighbors])
+
+
+class CompactVertex(_VertexBase):
+    """Vertex that stores its neighbors as a tuple of node_ids (and a matching tuple of edge
+    costs) instead of a dict of Vertex's. Neighbor Vertex's are looked up in the owning Graph's
+    vert_dict, so v.neighbors, get_neighbors_ids and get_neighbor_cost work as for Vertex.
+
+    Generated by CompactGraph, not normally created directly."""
+    __slots__ = ('neighbor_ids', 'neighbor_costs', 'vert_dict')
+
+    def __init__(self, node, vert_dict, search_epoch=0):
+        super().__init__(node, search_epoch=search_epoch)
+        self.neighbor_ids = ()
+        self.neighbor_costs = ()
+        self.vert_dict = vert_dict
+
+    @property
+    def neighbors(self):
+        vert_dict = self.vert_dict
+        return tuple(vert_dict[neighbor_id] for neighbor_id in self.neighbor_ids)
+
+    def clear_vertex_search_info(self):
+        super().clear_vertex_search_info()
+        self.neighbor_ids = ()
+        self.neighbor_costs = ()
+
+    def add_neighbor(self, neighbor, edge_cost=0):
+        if neighbor.vert_id in self.neighbor_ids:
+            idx = self.neighbor_ids.index(neighbor.vert_id)
+            self.neighbor_costs = self.neighbor_costs[:idx] + (edge_cost,) + self.neighbor_costs[idx + 1:]
+        else:
+            self.neighbor_ids = self.neighbor_ids + (neighbor.vert_id,)
+            self.neighbor_costs = self.neighbor_costs + (edge_cost,)
+
+    def get_neighbors_ids(self):
+        return self.neighbor_ids
+
+    def get_neighbor_cost(self, neighbor):  # edge weight, edge cost
+        return self.neighbor_costs[self.neighbor_ids.index(neighbor.vert_id)]
+
+    def __str__(self):
+        return str(self.node.node_id) + '\'s neighbors: ' + str(list(self.neighbor_ids))
+
+
 class Graph(object):
     """Used by the Search algorithm class functions. Typical use cases only call
     for initializing a graph and adding a start vertex. The rest of the vertex and edge
@@ -165,16 +269,28 @@ class Graph(object):
 
     goal_vertex = Vertex(node=goal_node)
     goal_vertex_found = Astart(graph=graph, start_vertex=start_vertex, goal_vertex=goal_vertex)
+
+    The same graph can be passed to further searches (with other start/goal vertices, or
+    after changing the env's threat field or costs) without rebuilding it. Get the start
+    vertex of a later search with graph.get_vertex(start_node), adding it only if missing.
     """
     def __init__(self, env):
         self.vert_dict = {}
         self.num_vertices = 0
         self.env = env
+        self.search_epoch = 0
 
     def reset_graph(self):
         self.vert_dict = {}
         self.num_vertices = 0
 
+    def new_search(self):
+        """Start a new search epoch: every existing Vertex's search info becomes stale and is
+        reset lazily (Vertex.reset_search_info) when the search first touches it. Called by the
+        Search algorithms, returns the new epoch"""
+        self.search_epoch = self.search_epoch + 1
+        return self.search_epoch
+
     def __iter__(self):
         return iter(self.vert_dict.values())
 
@@ -183,7 +299,7 @@ class Graph(object):
         start_node = XYNode(node_id, x_loc, y_loc)
         graph.add_vertex(start_node)"""
         self.num_vertices = self. num_vertices + 1
-        new_vertex = Vertex(node=node)
+        new_vertex = Vertex(node=node, search_epoch=self.search_epoch)
         self.vert_dict[node.node_id] = new_vertex
         return new_vertex
 
@@ -218,3 +334,18 @@ class Graph(object):
         node_type_string = "Node type: {0}".format(self.vert_dict[0].node)
         env_string = "Environment: {0}".format(self.env)
         return "Graph Info:" + "\n" + num_v_string + "\n" + node_type_string + "\n" + env_string
+
+
+class CompactGraph(Graph):
+    """Graph made of CompactVertex's, for lower memory use in large searches. Used exactly
+    like Graph:
+
+    graph = CompactGraph(env=env)
+    graph.add_vertex(start_node)
+    start_vertex = graph.get_vertex(start_node)"""
+
+    def add_vertex(self, node):
+        self.num_vertices = self.num_vertices + 1
+        new_vertex = CompactVertex(node=node, vert_dict=self.vert_dict, search_epoch=self.search_epoch)
+        self.vert_dict[node.node_id] = new_vertex
+        return new_vertex
@@ -0,0 +1,747 @@
+"""Lattice Search
+
+TimeAstar over the time-expanded lattice of an XYTEnvironment using flat arrays instead of
+Graph/Vertex/Node objects. Threat values are baked once into a tensor indexed by node_id
+(env.bake_threat_values) and the search loop works on node_ids only: a binary heap, the
+neighbor arithmetic of XYTEnvironment.get_neighbors and cost lookups from the tensor.
+
+threat = env.bake_threat_values()  # reuse for every search on this env
+path_ids, cost = LatticeTimeAstar(env=env, start_id=0, goal_id=goal_id, time_window=(0, env.t_final),
+                                  wait=True, threat=threat)
+
+When numba is installed the loop is compiled, otherwise the same loop runs as plain Python on
+lists. Either way the costs are identical to TimeAstar, as the heuristic is 0 (Dijkstra) and
+edges are costed exactly as in Search.neighbor_costs. Only time layers 0..t_pts are searched.
+
+ParetoTimeSearch keeps exposure, distance and elapsed time as separate criteria and returns
+the Pareto front of paths in one layer-by-layer label-setting run; best_weighted then picks
+the optimum for any exposure/move/wait weights from the front. WeightSweep instead runs one
+LatticeTimeAstar per weight setting, warm-started from a cost-to-go computed for nearby weights.
+
+RollingHorizonPlanner plans on a StreamingXYTEnvironment with receding horizons instead: each
+plan is a layer-by-layer dynamic program over the next `horizon` time layers only."""
+import copy
+import heapq
+import math
+import multiprocessing
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from timeit import default_timer
+from Search import GoalSet, ReservationTable, SearchStats
+from Graph import XYTNode
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+def _lattice_dijkstra(threat, goal_bits, vertex_bits, edge_bits, heuristic, dist, parent, counters, start_id,
+                      n_grid_x, n_grid, wait, exposure_cost, move_cost, wait_cost, t_sep, grid_sep_x, grid_sep_y,
+                      upper_bound):
+    """Search loop shared by the compiled and the Python path. Fills dist/parent by node_id and
+    returns the node_id of the first goal popped, or -1 if no goal is reachable.
+    vertex_bits/edge_bits are the ReservationTable bitmaps, empty when there are none.
+    heuristic is a consistent cost-to-go bound by node_id (inf: no goal reachable), empty for
+    Dijkstra. Neighbors whose f exceeds upper_bound are not queued.
+    counters receives the number of expanded nodes, generated neighbors and pruned neighbors"""
+    n_nodes = len(threat)
+    n_goal_bits = len(goal_bits)
+    n_reserved = len(vertex_bits)
+    n_heuristic = len(heuristic)
+    dist[start_id] = 0.0
+    heap = [(heuristic[start_id] if n_heuristic > 0 else 0.0, start_id)]
+    while len(heap) > 0:
+        f_cost, node_id = heapq.heappop(heap)
+        g_cost = dist[node_id]
+        if f_cost > g_cost + (heuristic[node_id] if n_heuristic > 0 else 0.0):
+            continue  # stale entry, node_id was reached cheaper
+        if node_id < n_goal_bits and goal_bits[node_id]:
+            return node_id
+
+        next_id = node_id + n_grid  # same cell, next time layer
+        if next_id >= n_nodes:
+            continue
+        counters[0] += 1
+        cell = node_id % n_grid
+        cell_x = cell % n_grid_x
+        # WAIT, RIGHT, LEFT, ABOVE, BELOW, in the order of XYTEnvironment.get_neighbors
+        for direction in range(5):
+            if direction == 0:
+                if not wait:
+                    continue
+                nbr_id = next_id
+                step = 0.0
+            elif direction == 1:
+                if cell_x + 1 >= n_grid_x:
+                    continue
+                nbr_id = next_id + 1
+                step = grid_sep_x
+            elif direction == 2:
+                if cell_x == 0:
+                    continue
+                nbr_id = next_id - 1
+                step = grid_sep_x
+            elif direction == 3:
+                if cell + n_grid_x >= n_grid:
+                    continue
+                nbr_id = next_id + n_grid_x
+                step = grid_sep_y
+            else:
+                if cell - n_grid_x < 0:
+                    continue
+                nbr_id = next_id - n_grid_x
+                step = grid_sep_y
+            counters[1] += 1
+            if nbr_id < n_reserved and (vertex_bits[nbr_id] or (edge_bits[node_id] >> direction) & 1):
+                continue
+            new_cost = g_cost + (exposure_cost*threat[nbr_id] + move_cost*step + wait_cost*t_sep)
+            if new_cost < dist[nbr_id]:
+                new_f = new_cost + (heuristic[nbr_id] if n_heuristic > 0 else 0.0)
+                if new_f > upper_bound or new_f == math.inf:
+                    counters[2] += 1
+                    continue
+                dist[nbr_id] = new_cost
+                parent[nbr_id] = node_id
+                heapq.heappush(heap, (new_f, nbr_id))
+    return -1
+
+
+if numba is not None:
+    # nogil: searches in separate threads run in parallel (see compare_modes)
+    _lattice_dijkstra_compiled = numba.njit(cache=True, nogil=True)(_lattice_dijkstra)
+else:
+    _lattice_dijkstra_compiled = None
+
+
+def LatticeTimeAstar(env, start_id, goal_id=None, time_window=None, wait=False, goal_set=None,
+                     threat=None, use_numba=True, reservations=None, stats=None, heuristic=None, upper_bound=None):
+    """Array-backed TimeAstar from node_id start_id on the lattice of env (an XYTEnvironment)
+
+    Goals are given as in TimeAstar: goal_id with an optional time_window, or a GoalSet.
+    threat is the tensor from env.bake_threat_values(), baked here if not given.
+    use_numba=False forces the Python loop even when numba is installed.
+    reservations is an optional Search.ReservationTable of states/moves to avoid.
+    stats is an optional SearchStats, filled with nodes_expanded, nodes_generated, pruned and time_total.
+    heuristic is an optional consistent lower bound on the cost-to-go, an array by node_id (inf
+    where no goal is reachable), e.g. from WeightSweep; without one the search is Dijkstra.
+    upper_bound is an optional cost no better path can exceed (e.g. a known path's cost): nodes
+    whose f is above it are pruned.
+
+    Returns (path_ids, cost), path_ids being the node_ids from start to goal, or (None, None)
+    when no goal is reached within time layers 0..t_pts"""
+    if env.integrate_exposure:
+        raise ValueError("LatticeTimeAstar uses node threat values, integrate_exposure is not supported")
+    search_start = default_timer()
+    if threat is None:
+        threat = env.bake_threat_values()
+    if goal_set is None:
+        goal_set = GoalSet(env=env)
+        if time_window:
+            goal_set.add_location(goal_id, time_window=time_window)
+        goal_set.add_node(goal_id)
+
+    n_nodes = threat.size
+    if reservations is not None:
+        vertex_bits, edge_bits = bytes(reservations.vertex_bits), bytes(reservations.edge_bits)
+    else:
+        vertex_bits, edge_bits = b'', b''
+    goal_bits = goal_set.node_bitmap(n_nodes)  # goals past the baked layers can't be reached
+    if heuristic is None:
+        heuristic = np.zeros(0)
+    args = (start_id, env.n_grid_x, env.n_grid, bool(wait), float(env.exposure_cost), float(env.move_cost),
+            float(env.wait_cost), float(env.t_sep), float(env.grid_sep_x), float(env.grid_sep_y),
+            math.inf if upper_bound is None else float(upper_bound))
+    if use_numba and _lattice_dijkstra_compiled is not None:
+        dist = np.full(n_nodes, np.inf)
+        parent = np.full(n_nodes, -1, dtype=np.int64)
+        counters = np.zeros(3, dtype=np.int64)
+        found_id = _lattice_dijkstra_compiled(threat.ravel(), goal_bits,
+                                              np.frombuffer(vertex_bits, dtype=np.uint8),
+                                              np.frombuffer(edge_bits, dtype=np.uint8),
+                                              np.asarray(heuristic, dtype=float).ravel(), dist, parent, counters, *args)
+    elif len(heuristic) > 0:
+        # a guided search touches few nodes, so converting every array to a list would cost more
+        # than indexing the arrays saves
+        dist = np.full(n_nodes, np.inf)
+        parent = np.full(n_nodes, -1, dtype=np.int64)
+        counters = [0, 0, 0]
+        found_id = _lattice_dijkstra(threat.ravel(), goal_bits.tobytes(), vertex_bits, edge_bits,
+                                     np.asarray(heuristic, dtype=float).ravel(), dist, parent, counters, *args)
+    else:
+        # Python lists index much faster than numpy arrays element by element
+        dist = [math.inf] * n_nodes
+        parent = [-1] * n_nodes
+        counters = [0, 0, 0]
+        found_id = _lattice_dijkstra(threat.ravel().tolist(), goal_bits.tobytes(), vertex_bits, edge_bits,
+                                     [], dist, parent, counters, *args)
+    if stats is not None:
+        stats.nodes_expanded = stats.nodes_expanded + int(counters[0])
+        stats.nodes_generated = stats.nodes_generated + int(counters[1])
+        stats.pruned = stats.pruned + int(counters[2])
+        stats.time_total = stats.time_total + default_timer() - search_start
+
+    if found_id < 0:
+        return None, None
+    path_ids = [int(found_id)]
+    while path_ids[-1] != start_id:
+        path_ids.append(int(parent[path_ids[-1]]))
+    path_ids.reverse()
+    return path_ids, float(dist[found_id])
+
+
+def compare_modes(env, start_id, goal_id, time_window=None, threat=None, executor=None):
+    """Run the wait and no-wait searches of one start/goal on a single baked threat tensor,
+    concurrently when possible
+
+    results = compare_modes(env=env, start_id=0, goal_id=env.n_grid - 1, time_window=(0, env.t_final))
+    path_ids, cost = results["wait"]
+    stats = results["stats"]   # {"wait": SearchStats, "no_wait": SearchStats, "bake_time": seconds}
+
+    With numba the compiled kernel releases the GIL, so both modes run in two threads. Pass an
+    executor (e.g. a ProcessPoolExecutor reused across sims) to run them there instead, without
+    numba and without one they run one after the other"""
+    bake_start = default_timer()
+    if threat is None:
+        threat = env.bake_threat_values()
+    bake_time = default_timer() - bake_start
+
+    stats = {"wait": SearchStats(), "no_wait": SearchStats(), "bake_time": bake_time}
+    modes = (("wait", True), ("no_wait", False))
+    results = {"stats": stats}
+
+    own_pool = None
+    if executor is None and _lattice_dijkstra_compiled is not None:
+        executor = own_pool = ThreadPoolExecutor(max_workers=2)
+    try:
+        if executor is None:
+            for mode, wait in modes:
+                results[mode], stats[mode] = _compare_mode(env, start_id, goal_id, time_window, wait, threat)
+        else:
+            futures = {mode: executor.submit(_compare_mode, env, start_id, goal_id, time_window, wait, threat)
+                       for mode, wait in modes}
+            for mode, future in futures.items():
+                results[mode], stats[mode] = future.result()
+    finally:
+        if own_pool is not None:
+            own_pool.shutdown()
+    return results
+
+
+def _compare_mode(env, start_id, goal_id, time_window, wait, threat):
+    stats = SearchStats()
+    result = LatticeTimeAstar(env=env, start_id=start_id, goal_id=goal_id, time_window=time_window, wait=wait,
+                              threat=threat, stats=stats)
+    return result, stats
+
+
+def path_nodes(env, path_ids, threat=None):
+    """XYTNodes (with positions, times and threat values from the baked tensor) for a path of
+    node_ids, like the paths built with reconstruct_path from Vertex's
+
+    path = path_nodes(env, path_ids, threat)"""
+    if path_ids is None:
+        return None
+    nodes = []
+    flat_threat = threat.ravel() if threat is not None else None
+    for node_id in path_ids:
+        pos_x, pos_y, time_idx = env.get_location_from_gridpt(node_id)
+        threat_value = float(flat_threat[node_id]) if flat_threat is not None else 0
+        nodes.append(XYTNode(node_id=node_id, pos_x=pos_x, pos_y=pos_y, threat_value=threat_value,
+                             time=time_idx * env.t_sep, time_idx=time_idx))
+    return nodes
+
+
+def _pareto_filter(group, exposure, distance):
+    """Indices of the labels not dominated in (exposure, distance) by another label of the same
+    group (a label dominates when it is <= in both; of equal labels the first is kept)"""
+    order = np.lexsort((distance, exposure, group))
+    d_rank = np.unique(distance, return_inverse=True)[1].reshape(-1)[order]
+    # shifting each group below all groups before it makes one running minimum restart per group
+    running = d_rank - group[order].astype(np.int64) * (int(d_rank.max(initial=0)) + 1)
+    keep = np.ones(len(order), dtype=bool)
+    keep[1:] = running[1:] < np.minimum.accumulate(running)[:-1]
+    return order[keep]
+
+
+def _dominated(front_exposure, front_distance, exposure, distance):
+    """Mask of the (exposure, distance) labels dominated by a front staircase: front_exposure
+    sorted ascending, front_distance the running minimum of distance along it"""
+    idx = np.searchsorted(front_exposure, exposure, side='right') - 1
+    return (idx >= 0) & (front_distance[np.maximum(idx, 0)] <= distance)
+
+
+def ParetoTimeSearch(env, start_id, goal_id=None, time_window=None, wait=True, goal_set=None, threat=None,
+                     stats=None):
+    """Multi-objective label-setting search from node_id start_id on the lattice of env. Paths
+    are compared on exposure (sum of the threat values entered), distance and elapsed time as
+    separate criteria, and all Pareto-optimal ones are returned in one run.
+
+    front = ParetoTimeSearch(env=env, start_id=0, goal_id=env.n_grid - 1, time_window=(0, env.t_final),
+                             threat=threat)
+    path_ids, cost = best_weighted(front, exposure_cost=1, move_cost=0.5, wait_cost=0)
+
+    Goals are given as in LatticeTimeAstar. Every move goes one time layer up, so the labels of
+    a node all share its elapsed time: labels are propagated a layer at a time as flat arrays
+    (cell, exposure, distance, parent label) and each node keeps only its labels undominated in
+    (exposure, distance). With non-negative threat, labels that cannot reach the goal
+    undominated by a path already found (using Manhattan distance to the goal as a bound) are
+    pruned and goal labels are not extended.
+    stats is an optional SearchStats: nodes_expanded counts labels extended, nodes_generated
+    the labels made and pruned those dropped against the front found so far.
+
+    Returns a list of {"path_ids", "exposure", "distance", "time"} sorted by time, empty if no
+    goal is reached. The weighted TimeAstar cost of an entry is
+    exposure_cost*exposure + move_cost*distance + wait_cost*time, so best_weighted gives the
+    TimeAstar optimum for any weights without a new search"""
+    if env.integrate_exposure:
+        raise ValueError("ParetoTimeSearch uses node threat values, integrate_exposure is not supported")
+    search_start = default_timer()
+    if threat is None:
+        threat = env.bake_threat_values()
+    if goal_set is None:
+        goal_set = GoalSet(env=env)
+        if time_window:
+            goal_set.add_location(goal_id, time_window=time_window)
+        goal_set.add_node(goal_id)
+
+    n_grid, n_grid_x = env.n_grid, env.n_grid_x
+    layer_threat = threat.reshape(-1, n_grid)
+    goal_layers = goal_set.node_bitmap(threat.size).reshape(-1, n_grid).astype(bool)
+    goal_rows = np.flatnonzero(goal_layers.any(axis=1))
+    if len(goal_rows) == 0 or start_id // n_grid > goal_rows[-1]:
+        return []
+    last_layer = int(goal_rows[-1])
+
+    prune = bool(threat.min() >= 0)
+    if prune:
+        # spatial distance still to cover to the nearest goal cell, a lower bound on added distance
+        goal_cells = np.flatnonzero(goal_layers.any(axis=0))
+        all_cells = np.arange(n_grid)
+        to_goal = np.full(n_grid, np.inf)
+        for goal_cell in goal_cells:
+            to_goal = np.minimum(to_goal, np.abs(all_cells % n_grid_x - goal_cell % n_grid_x) * env.grid_sep_x +
+                                 np.abs(all_cells // n_grid_x - goal_cell // n_grid_x) * env.grid_sep_y)
+
+    moves = [(0, 0.0), (1, env.grid_sep_x), (-1, env.grid_sep_x), (n_grid_x, env.grid_sep_y),
+             (-n_grid_x, env.grid_sep_y)]
+    if not wait:
+        moves = moves[1:]
+    time_idx = start_id // n_grid
+    cell = np.array([start_id % n_grid], dtype=np.int64)
+    exposure = np.zeros(1)
+    distance = np.zeros(1)
+    layers = [(cell, np.full(1, -1, dtype=np.int64))]  # per layer: label cells and parent label index
+    stored = np.zeros(1, dtype=np.int64)  # index of each live label in its stored layer
+    front = []  # goal labels: (time_idx, label index, exposure, distance)
+    front_exposure, front_distance = np.zeros(0), np.zeros(0)
+    n_expanded = n_generated = n_pruned = 0
+    if goal_layers[time_idx][cell[0]]:
+        front.append((time_idx, 0, 0.0, 0.0))
+        front_exposure, front_distance = np.zeros(1), np.zeros(1)
+        if prune:
+            cell = cell[:0]  # nothing can improve on staying at the start
+
+    while len(cell) > 0 and time_idx < last_layer:
+        cell_x = cell % n_grid_x
+        new_cell, new_parent, new_exposure, new_distance = [], [], [], []
+        for offset, step in moves:
+            if offset == 1:
+                valid = cell_x + 1 < n_grid_x
+            elif offset == -1:
+                valid = cell_x > 0
+            elif offset > 0:
+                valid = cell + offset < n_grid
+            elif offset < 0:
+                valid = cell + offset >= 0
+            else:
+                valid = np.ones(len(cell), dtype=bool)
+            nbr = cell[valid] + offset
+            new_cell.append(nbr)
+            new_parent.append(stored[valid])
+            new_exposure.append(exposure[valid] + layer_threat[time_idx + 1][nbr])
+            new_distance.append(distance[valid] + step)
+        n_expanded = n_expanded + len(cell)
+        cell, parent = np.concatenate(new_cell), np.concatenate(new_parent)
+        exposure, distance = np.concatenate(new_exposure), np.concatenate(new_distance)
+        n_generated = n_generated + len(cell)
+        time_idx = time_idx + 1
+
+        if prune and len(front_exposure):
+            alive = ~_dominated(front_exposure, front_distance, exposure, distance + to_goal[cell])
+            n_pruned = n_pruned + int(len(cell) - alive.sum())
+            cell, parent, exposure, distance = cell[alive], parent[alive], exposure[alive], distance[alive]
+        keep = _pareto_filter(cell, exposure, distance)
+        cell, parent, exposure, distance = cell[keep], parent[keep], exposure[keep], distance[keep]
+        layers.append((cell, parent))
+        stored = np.arange(len(cell))
+
+        at_goal = goal_layers[time_idx][cell]
+        if at_goal.any():
+            goal_idx = np.flatnonzero(at_goal)
+            goal_idx = goal_idx[_pareto_filter(np.zeros(len(goal_idx), dtype=np.int64), exposure[goal_idx],
+                                               distance[goal_idx])]
+            if len(front_exposure):
+                goal_idx = goal_idx[~_dominated(front_exposure, front_distance, exposure[goal_idx],
+                                                distance[goal_idx])]
+            front.extend((time_idx, int(i), float(exposure[i]), float(distance[i])) for i in goal_idx)
+            all_exposure = np.array([label[2] for label in front])
+            all_distance = np.array([label[3] for label in front])
+            order = np.lexsort((all_distance, all_exposure))
+            front_exposure = all_exposure[order]
+            front_distance = np.minimum.accumulate(all_distance[order])
+            if prune:
+                # going on from a goal label only adds exposure, distance and time
+                moving = ~at_goal
+                cell, exposure, distance, stored = cell[moving], exposure[moving], distance[moving], stored[moving]
+
+    if stats is not None:
+        stats.nodes_expanded = stats.nodes_expanded + n_expanded
+        stats.nodes_generated = stats.nodes_generated + n_generated
+        stats.pruned = stats.pruned + n_pruned
+        stats.time_total = stats.time_total + default_timer() - search_start
+
+    start_layer = start_id // n_grid
+    results = []
+    for goal_time_idx, index, goal_exposure, goal_distance in front:
+        path_ids = []
+        layer_idx = goal_time_idx
+        while index >= 0:
+            cells, parent = layers[layer_idx - start_layer]
+            path_ids.append(int(cells[index]) + layer_idx * n_grid)
+            index = int(parent[index])
+            layer_idx = layer_idx - 1
+        path_ids.reverse()
+        results.append({"path_ids": path_ids, "exposure": goal_exposure, "distance": goal_distance,
+                        "time": (goal_time_idx - start_layer) * env.t_sep})
+    return results
+
+
+def best_weighted(front, exposure_cost=1, move_cost=0, wait_cost=0):
+    """(path_ids, cost) of the ParetoTimeSearch front entry with the least weighted cost, the
+    cost TimeAstar would find on an env with these weights. (None, None) for an empty front"""
+    if not front:
+        return None, None
+    costs = [exposure_cost*entry["exposure"] + move_cost*entry["distance"] + wait_cost*entry["time"]
+             for entry in front]
+    best = int(np.argmin(costs))
+    return front[best]["path_ids"], float(costs[best])
+
+
+class WeightSweep:
+    """Warm-started LatticeTimeAstar searches of one start/goal over many cost weights
+
+    The threat tensor and goal set are built once. Every search gets a heuristic from an
+    anchor: the exact cost-to-go under the anchor's weights, from one backward dynamic program
+    over the layers, scaled by the smallest ratio of new to anchor weights. That bound is
+    admissible and consistent for the new weights when threat values are non-negative, and
+    close to exact for nearby weights. The previous solution re-costed under the new weights
+    is passed as upper bound. When a search expands more than reanchor times the nodes of its
+    path, the next search first moves the anchor to the current weights.
+
+    sweep = WeightSweep(env=env, start_id=0, goal_id=env.n_grid - 1, time_window=(0, env.t_final), wait=True)
+    results = sweep.run([(1, move_cost, 0) for move_cost in np.linspace(0, 2, 50)])
+    path_ids, cost = results[0]
+
+    With negative threat values the bound doesn't hold and every search runs cold. env itself
+    is not modified, searches run on copies carrying the weights"""
+
+    def __init__(self, env, start_id, goal_id=None, time_window=None, wait=True, goal_set=None, threat=None,
+                 use_numba=True, reanchor=8.0):
+        if env.integrate_exposure:
+            raise ValueError("WeightSweep uses node threat values, integrate_exposure is not supported")
+        self.env = env
+        self.start_id = start_id
+        self.wait = wait
+        self.use_numba = use_numba
+        self.reanchor = reanchor
+        self.threat = threat if threat is not None else env.bake_threat_values()
+        if goal_set is None:
+            goal_set = GoalSet(env=env)
+            if time_window:
+                goal_set.add_location(goal_id, time_window=time_window)
+            goal_set.add_node(goal_id)
+        self.goal_set = goal_set
+        self.warm = bool(self.threat.min() >= 0)
+        self.anchor = None  # (weights, cost-to-go by node_id) the heuristics are scaled from
+        self.move_anchor = True
+        self.previous = None  # path_ids of the last solution
+        self.stats = []  # SearchStats per solve, in order
+        self.anchor_time = 0.0  # seconds spent in cost_to_go
+
+    def cost_to_go(self, exposure_cost, move_cost, wait_cost):
+        """Exact cost from every node to the goal set under these weights, by node_id (inf where no
+        goal can be reached), computed backward a layer at a time"""
+        env = self.env
+        threat = self.threat
+        n_layers = threat.shape[0]
+        goal = self.goal_set.node_bitmap(threat.size).reshape(threat.shape).astype(bool)
+
+        cost = np.full(threat.shape, np.inf)
+        cost[-1][goal[-1]] = 0.0
+        candidates = np.empty((5,) + threat.shape[1:])
+        for layer in range(n_layers - 2, self.start_id // env.n_grid - 1, -1):
+            after = cost[layer + 1]
+            exposure = exposure_cost * threat[layer + 1]
+            wait_edge = exposure + wait_cost*env.t_sep
+            x_edge = exposure + move_cost*env.grid_sep_x + wait_cost*env.t_sep
+            y_edge = exposure + move_cost*env.grid_sep_y + wait_cost*env.t_sep
+
+            # cost of each move out of a cell of this layer, in the order of get_neighbors
+            candidates.fill(np.inf)
+            if self.wait:
+                candidates[0] = wait_edge + after
+            candidates[1][:, :-1] = x_edge[:, 1:] + after[:, 1:]
+            candidates[2][:, 1:] = x_edge[:, :-1] + after[:, :-1]
+            candidates[3][:-1, :] = y_edge[1:, :] + after[1:, :]
+            candidates[4][1:, :] = y_edge[:-1, :] + after[:-1, :]
+            cost[layer] = np.min(candidates, axis=0)
+            cost[layer][goal[layer]] = 0.0
+        return cost.ravel()
+
+    def heuristic(self, weights):
+        """Cost-to-go lower bound for weights from the anchor, None when there is no anchor"""
+        if self.anchor is None:
+            return None
+        anchor_weights, anchor_cost = self.anchor
+        ratios = [new / old for new, old in zip(weights, anchor_weights) if old > 0]
+        ratio = min(ratios) if ratios else 0.0
+        heuristic = np.full_like(anchor_cost, np.inf)
+        reachable = np.isfinite(anchor_cost)
+        heuristic[reachable] = ratio * anchor_cost[reachable]
+        return heuristic
+
+    def solve(self, exposure_cost=1, move_cost=0, wait_cost=0):
+        """(path_ids, cost) for one setting of the weights, (None, None) if no goal is reached"""
+        weights = (float(exposure_cost), float(move_cost), float(wait_cost))
+        env = copy.copy(self.env)
+        env.exposure_cost, env.move_cost, env.wait_cost = weights
+
+        heuristic, upper_bound = None, None
+        if self.warm:
+            if self.move_anchor:
+                anchor_start = default_timer()
+                self.anchor = (weights, self.cost_to_go(*weights))
+                self.anchor_time = self.anchor_time + default_timer() - anchor_start
+                self.move_anchor = False
+            heuristic = self.heuristic(weights)
+            if self.previous is not None:
+                # slack: with an exact heuristic g + h of the optimal path may round just above its cost
+                upper_bound = path_cost(env, self.previous, self.threat) * (1 + 1e-9) + 1e-9
+
+        stats = SearchStats()
+        path_ids, cost = LatticeTimeAstar(env=env, start_id=self.start_id, wait=self.wait, goal_set=self.goal_set,
+                                          threat=self.threat, use_numba=self.use_numba, stats=stats,
+                                          heuristic=heuristic, upper_bound=upper_bound)
+        self.stats.append(stats)
+        if path_ids is not None:
+            self.previous = path_ids
+            self.move_anchor = stats.nodes_expanded > self.reanchor * len(path_ids)
+        return path_ids, cost
+
+    def run(self, weights):
+        """solve() for each (exposure_cost, move_cost, wait_cost) in weights, in order (consecutive
+        weights close to each other warm-start best). Returns the list of (path_ids, cost)"""
+        return [self.solve(*w) for w in weights]
+
+
+def path_cost(env, path_ids, threat):
+    """Cost of a path of node_ids under the weights of env, with threat values from the baked tensor"""
+    flat_threat = threat.ravel()
+    cost = 0.0
+    for node_id, nbr_id in zip(path_ids, path_ids[1:]):
+        step = env.step_distance[nbr_id - node_id - env.n_grid]
+        cost = cost + (env.exposure_cost*flat_threat[nbr_id] + env.move_cost*step + env.wait_cost*env.t_sep)
+    return float(cost)
+
+
+def PrioritizedTimeAstar(env, start_ids, goal_cells, time_window=None, wait=True, park=True, threat=None,
+                         n_workers=1):
+    """Prioritized multi-agent planning: agents are planned one after the other with
+    LatticeTimeAstar, each avoiding the states and swaps reserved by the agents before it (a
+    ReservationTable). Agent order is priority order.
+
+    threat = env.bake_threat_values()
+    paths, costs = PrioritizedTimeAstar(env=env, start_ids=[0, 9], goal_cells=[99, 90], wait=True, threat=threat)
+
+    With n_workers > 1, batches of n_workers agents are planned in parallel processes against
+    the same reservations, then committed in priority order. An agent whose path conflicts with
+    the agents committed before it in its batch is replanned, any other path is still optimal
+    under the added reservations, so costs are those of the sequential planner.
+
+    Returns (paths, costs), lists of node_id paths and costs by agent, None where no path was
+    found (that agent reserves nothing)"""
+    if threat is None:
+        threat = env.bake_threat_values()
+    reservations = ReservationTable(env=env)
+    paths = []
+    costs = []
+
+    def plan(agent):
+        goal_set = reservations.goal_set(goal_cells[agent], time_window=time_window)
+        return LatticeTimeAstar(env=env, start_id=start_ids[agent], wait=wait, goal_set=goal_set,
+                                threat=threat, reservations=reservations)
+
+    def commit(path_ids, cost):
+        if path_ids is not None:
+            reservations.reserve_path(path_ids, park=park)
+        paths.append(path_ids)
+        costs.append(cost)
+
+    agents = list(range(len(start_ids)))
+    if n_workers <= 1:
+        for agent in agents:
+            commit(*plan(agent))
+        return paths, costs
+
+    with multiprocessing.get_context('spawn').Pool(processes=n_workers, initializer=_init_worker,
+                                                   initargs=(env, threat, wait)) as pool:
+        for batch_start in range(0, len(agents), n_workers):
+            batch = agents[batch_start:batch_start + n_workers]
+            goal_sets = [reservations.goal_set(goal_cells[agent], time_window=time_window) for agent in batch]
+            tasks = [(start_ids[agent], goal_set.first_layer, goal_set.bitmap, goal_set.windows,
+                      reservations.vertex_bits, reservations.edge_bits) for agent, goal_set in zip(batch, goal_sets)]
+            results = pool.map(_plan_worker, tasks)
+            for agent, (path_ids, cost) in zip(batch, results):
+                if agent != batch[0] and path_ids is not None and (
+                        reservations.conflicts(path_ids) or
+                        path_ids[-1] not in reservations.goal_set(goal_cells[agent], time_window=time_window)):
+                    path_ids, cost = plan(agent)  # planned against reservations that have since grown
+                commit(path_ids, cost)
+    return paths, costs
+
+
+_worker_args = None
+
+
+def _init_worker(env, threat, wait):
+    global _worker_args
+    _worker_args = (env, threat, wait)
+
+
+def _plan_worker(task):
+    env, threat, wait = _worker_args
+    start_id, first_layer, goal_bits, goal_windows, vertex_bits, edge_bits = task
+    goal_set = GoalSet(env=env)
+    goal_set.first_layer, goal_set.bitmap, goal_set.windows = first_layer, goal_bits, goal_windows
+    reservations = ReservationTable(env=env)
+    reservations.vertex_bits, reservations.edge_bits = vertex_bits, edge_bits
+    return LatticeTimeAstar(env=env, start_id=start_id, wait=wait, goal_set=goal_set, threat=threat,
+                            reservations=reservations)
+
+
+class RollingHorizonPlanner:
+    """Receding horizon planner on a StreamingXYTEnvironment
+
+    Every edge of the lattice advances one time layer, so the cheapest cost of reaching every
+    cell at the next layer follows from the current layer alone. plan() runs that dynamic
+    program over the next `horizon` layers, keeping one cost layer and an int8 backpointer per
+    layer, and discards environment layers behind its start. Memory is O(horizon*n_grid) no
+    matter how long the mission runs.
+
+    planner = RollingHorizonPlanner(env=env, horizon=40, wait=True)
+    path_cells, cost, reached = planner.plan(start_cell=0, time_idx=0, goal_cell=env.n_grid - 1)
+    cells, cost, reached = planner.run(start_cell=0, goal_cell=env.n_grid - 1)  # execute a whole mission
+
+    Edge costs are those of TimeAstar (exposure of the destination cell, move and wait costs).
+    When the goal can't be reached inside the horizon, the plan ends at the cell minimizing
+    cost + terminal_cost, with terminal_cost the grid steps left to the goal times the cheapest
+    possible edge cost in the last layer."""
+
+    # Backpointer codes: how a cell was entered, in the order of XYTEnvironment.get_neighbors
+    WAIT, RIGHT, LEFT, ABOVE, BELOW = range(5)
+
+    def __init__(self, env, horizon, wait=True):
+        self.env = env
+        self.horizon = horizon
+        self.wait = wait
+
+    def plan(self, start_cell, time_idx, goal_cell):
+        """Plan from start_cell at time index time_idx toward goal_cell over the next horizon layers
+
+        Returns (path_cells, cost, reached): the cells at time indices time_idx, time_idx+1, ...,
+        the cost of that path, and whether it ends at goal_cell"""
+        env = self.env
+        env.discard_before(time_idx)
+        n_grid_x = env.n_grid_x
+        goal_y, goal_x = divmod(goal_cell, n_grid_x)
+
+        cost = np.full((env.n_grid_y, n_grid_x), np.inf)
+        cost.flat[start_cell] = 0.0
+        backpointers = np.empty((self.horizon, env.n_grid_y, n_grid_x), dtype=np.int8)
+        best_layer, best_cell, best_cost = 0, start_cell, (0.0 if start_cell == goal_cell else np.inf)
+
+        candidates = np.empty((5,) + cost.shape)
+        for layer in range(1, self.horizon + 1):
+            exposure = env.exposure_cost * env.get_layer(time_idx + layer)
+            wait_edge = exposure + env.move_cost*0.0 + env.wait_cost*env.t_sep
+            x_edge = exposure + env.move_cost*env.grid_sep_x + env.wait_cost*env.t_sep
+            y_edge = exposure + env.move_cost*env.grid_sep_y + env.wait_cost*env.t_sep
+
+            candidates.fill(np.inf)
+            if self.wait:
+                candidates[self.WAIT] = cost + wait_edge
+            candidates[self.RIGHT][:, 1:] = cost[:, :-1] + x_edge[:, 1:]
+            candidates[self.LEFT][:, :-1] = cost[:, 1:] + x_edge[:, :-1]
+            candidates[self.ABOVE][1:, :] = cost[:-1, :] + y_edge[1:, :]
+            candidates[self.BELOW][:-1, :] = cost[1:, :] + y_edge[:-1, :]
+            backpointers[layer - 1] = np.argmin(candidates, axis=0)
+            cost = np.min(candidates, axis=0)
+
+            if cost[goal_y, goal_x] < best_cost:
+                best_layer, best_cell, best_cost = layer, goal_cell, cost[goal_y, goal_x]
+
+        reached = best_cost < np.inf
+        if not reached:
+            # Goal out of reach within the horizon: end where the estimated cost to go is lowest
+            min_edge = (env.exposure_cost*np.min(env.get_layer(time_idx + self.horizon)) +
+                        env.move_cost*min(env.grid_sep_x, env.grid_sep_y) + env.wait_cost*env.t_sep)
+            cell_y, cell_x = np.indices(cost.shape)
+            terminal_cost = (np.abs(cell_x - goal_x) + np.abs(cell_y - goal_y)) * min_edge
+            best_layer = self.horizon
+            best_cell = int(np.argmin(cost + terminal_cost))
+            best_cost = cost.flat[best_cell]
+
+        path_cells = [best_cell]
+        cell = best_cell
+        for layer in range(best_layer, 0, -1):
+            move = backpointers[layer - 1].flat[cell]
+            if move == self.RIGHT:
+                cell = cell - 1
+            elif move == self.LEFT:
+                cell = cell + 1
+            elif move == self.ABOVE:
+                cell = cell - n_grid_x
+            elif move == self.BELOW:
+                cell = cell + n_grid_x
+            path_cells.append(cell)
+        path_cells.reverse()
+        return path_cells, float(best_cost), bool(reached)
+
+    def run(self, start_cell, goal_cell, time_idx=0, max_steps=None):
+        """Execute a mission by replanning at every time step and taking the first move of each
+        plan, until goal_cell is reached or max_steps steps were taken. The streaming lattice
+        has no last layer and replanning can keep trading one detour for another, so the
+        mission is always cut off; max_steps defaults to n_grid + horizon.
+
+        Returns (cells, cost, reached): the cells visited from time index time_idx on, the cost
+        paid and whether the mission ended at goal_cell (False for the partial path when it
+        ran out of steps)"""
+        if max_steps is None:
+            max_steps = self.env.n_grid + self.horizon
+        cells = [start_cell]
+        total_cost = 0.0
+        cell = start_cell
+        while cell != goal_cell and len(cells) <= max_steps:
+            path_cells, _, _ = self.plan(start_cell=cell, time_idx=time_idx, goal_cell=goal_cell)
+            if len(path_cells) < 2:
+                break  # nowhere to go, e.g. no wait and no neighbors
+            next_cell = path_cells[1]
+            threat = self.env.get_layer(time_idx + 1).flat[next_cell]
+            step = self.env.step_distance[next_cell - cell]
+            total_cost = total_cost + (self.env.exposure_cost*threat + self.env.move_cost*step +
+                                       self.env.wait_cost*self.env.t_sep)
+            cell = next_cell
+            time_idx = time_idx + 1
+            cells.append(cell)
+        return cells, total_cost, cell == goal_cell
@@ -0,0 +1,144 @@
+"""Path Cache
+
+Memoization layer in front of the Search algorithms. Repeated planning requests for the
+same threat picture, environment, endpoints and cost weights are answered from the cache
+instead of running a new search.
+
+cache = PathCache(max_entries=1000, max_bytes=50*2**20, filename='path_cache.pkl')
+path, cost = cache.time_astar(env=env, start_node=start_node, goal_node=goal_node,
+                              time_window=(0, t_final), wait=True)
+print(cache.stats())
+cache.save()
+
+Entries are evicted least recently used first once either bound is exceeded."""
+from collections import OrderedDict
+import os
+import pickle
+from Graph import Vertex, Graph
+from Search import Astar, TimeAstar, reconstruct_path
+
+
+class PathCache:
+    """PathCache
+
+    LRU cache of search results keyed by (threat-field fingerprint, environment spec, start,
+    goal, time_window, wait, exposure/move/wait costs, exposure integration).
+
+    max_entries: maximum number of cached paths
+    max_bytes: maximum total (pickled) size of the cached paths
+    filename: optional file to load the cache from at creation and write to on save()
+
+    Functions:
+    - astar / time_astar: return (path, cost), running the search only on a cache miss
+    - stats: hit/miss/eviction counts and current size
+    - save: persist the cache to filename"""
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 2**20, filename=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.filename = filename
+        self.entries = OrderedDict()  # key -> (path, cost, n_bytes), most recently used last
+        self.n_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if filename and os.path.exists(filename):
+            self.load()
+
+    @staticmethod
+    def make_key(env, start_node, goal_node, time_window=None, wait=None):
+        """Build the cache key for a search request"""
+        env_spec = (type(env).__name__, env.x_size, env.y_size, env.n_grid_x, env.n_grid_y,
+                    getattr(env, 't_final', None), getattr(env, 't_pts', None))
+        costs = (getattr(env, 'exposure_cost', None), getattr(env, 'move_cost', None),
+                 getattr(env, 'wait_cost', None), getattr(env, 'integrate_exposure', False))
+        if time_window is not None:
+            time_window = tuple(time_window)
+        return (env.threat_field.fingerprint(), env_spec, start_node.node_id, goal_node.node_id,
+                time_window, wait, costs)
+
+    def get(self, key):
+        """Return the cached (path, cost) for key, or None on a miss"""
+        if key not in self.entries:
+            self.misses = self.misses + 1
+            return None
+        self.hits = self.hits + 1
+        self.entries.move_to_end(key)
+        path, cost, _ = self.entries[key]
+        return (list(path) if path is not None else None), cost
+
+    def put(self, key, path, cost):
+        """Add a (path, cost) result, evicting least recently used entries to stay in bounds"""
+        if key in self.entries:
+            self.n_bytes = self.n_bytes - self.entries.pop(key)[2]
+        n_bytes = len(pickle.dumps((key, path, cost), protocol=pickle.HIGHEST_PROTOCOL))
+        if n_bytes > self.max_bytes:
+            return  # would never fit, don't flush the whole cache for it
+        self.entries[key] = (path, cost, n_bytes)
+        self.n_bytes = self.n_bytes + n_bytes
+        while len(self.entries) > self.max_entries or self.n_bytes > self.max_bytes:
+            _, (_, _, old_bytes) = self.entries.popitem(last=False)
+            self.n_bytes = self.n_bytes - old_bytes
+            self.evictions = self.evictions + 1
+
+    def astar(self, env, start_node, goal_node):
+        """Cached Astar: returns (path, cost), path is a list of Nodes from start to goal.
+        (None, None) if no path exists"""
+        key = self.make_key(env, start_node, goal_node)
+        result = self.get(key)
+        if result is None:
+            graph = Graph(env=env)
+            start_vertex = graph.add_vertex(start_node)
+            goal_vertex_found = Astar(graph=graph, start_vertex=start_vertex, goal_vertex=Vertex(node=goal_node))
+            result = self._store(key, goal_vertex_found)
+        return result
+
+    def time_astar(self, env, start_node, goal_node, time_window=None, wait=False):
+        """Cached TimeAstar: returns (path, cost), path is a list of Nodes from start to goal.
+        (None, None) if no path exists"""
+        key = self.make_key(env, start_node, goal_node, time_window, wait)
+        result = self.get(key)
+        if result is None:
+            graph = Graph(env=env)
+            start_vertex = graph.add_vertex(start_node)
+            goal_vertex_found = TimeAstar(graph=graph, start_vertex=start_vertex, goal_vertex=Vertex(node=goal_node),
+                                          time_window=time_window, wait=wait)
+            result = self._store(key, goal_vertex_found)
+        return result
+
+    def _store(self, key, goal_vertex_found):
+        if goal_vertex_found is None:
+            path, cost = None, None
+        else:
+            path = [goal_vertex_found.node]
+            reconstruct_path(goal_vertex_found, path)
+            path.reverse()
+            cost = goal_vertex_found.g_cost
+        self.put(key, path, cost)
+        return (list(path) if path is not None else None), cost
+
+    def stats(self):
+        """Hit/miss statistics and current size of the cache"""
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self.entries), "bytes": self.n_bytes}
+
+    def clear(self):
+        self.entries = OrderedDict()
+        self.n_bytes = 0
+
+    def save(self, filename=None):
+        """Write the cache entries to filename (or the filename given at creation)"""
+        filename = filename or self.filename
+        with open(filename, 'wb') as f:
+            pickle.dump(list(self.entries.items()), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load(self, filename=None):
+        """Load cache entries from filename (or the filename given at creation)"""
+        filename = filename or self.filename
+        with open(filename, 'rb') as f:
+            items = pickle.load(f)
+        for key, (path, cost, _) in items:
+            self.put(key, path, cost)
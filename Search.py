@@ -4,10 +4,22 @@ Focusing on A* search, with implementations for:
 Basic Astar: search on Graph generated from Environment/Threats
 Time-Varying A*: search on Graphs with time-varying Environment/Threats
     - AStarNoWait - time-varying graph, but does not consider waiting Nodes
-    - AStarWait - considers additional 'waiting' Node neighbors"""
+    - AStarWait - considers additional 'waiting' Node neighbors
+MultiGoal A*: one-to-many versions of both, settling many goals in a single search
+
+Searches report through the 'Search' logger instead of printing, enable with e.g.
+logging.basicConfig(level=logging.DEBUG)"""
 import heapq
 import itertools
+import logging
+import math
 import numpy as np
+from timeit import default_timer
+from Graph import XYTNode
+
+logger = logging.getLogger(__name__)
+
+GOAL_BITMAP_LAYERS = 128  # wider GoalSet windows are kept as time ranges instead of bitmap layers
 
 
 class PriorityQueue:
@@ -67,7 +79,420 @@ class PriorityQueue:
         return not self._entry_finder
 
 
-def Astar(graph, start_vertex, goal_vertex):
+class SearchStats:
+    """Instrumentation for a single search. Pass a SearchStats to Astar/TimeAstar to fill it in:
+
+    stats = SearchStats()
+    goal_vertex_found = TimeAstar(graph=graph, start_vertex=start_vertex, goal_vertex=goal_vertex,
+                                  time_window=time_window, wait=True, stats=stats)
+    print(stats)
+
+    Counters:
+    nodes_expanded: vertices popped from the open list and expanded, counted once per pop
+                    whether their neighbors come from env.get_neighbors or from adjacency cached
+                    on the Graph by an earlier search
+    nodes_generated: neighbor Nodes returned by env.get_neighbors (cached adjacency generates none)
+    reopenings: priority updates of vertices already in the open list
+    peak_open_size: largest number of live entries in the open list
+    heap_tombstones: removed entries left behind in the heap by priority updates
+    peak_vertices: largest size of graph.vert_dict
+    pruned: neighbors not queued because their f exceeded the incumbent's cost (TimeAstar prune=True)
+    incumbent_cost: cost of the greedy incumbent path used as upper bound, None without one
+    Timers (seconds): time_total, time_threat_value, time_get_neighbors, time_add_edge, time_queue
+
+    When no SearchStats is passed the timing wrappers and the instrumented queue are left out,
+    so disabled stats only cost an `is not None` check per expansion (and per pruned neighbor),
+    not the timer calls."""
+
+    def __init__(self):
+        self.nodes_expanded = 0
+        self.nodes_generated = 0
+        self.reopenings = 0
+        self.peak_open_size = 0
+        self.heap_tombstones = 0
+        self.peak_vertices = 0
+        self.pruned = 0
+        self.incumbent_cost = None
+        self.time_total = 0.0
+        self.time_threat_value = 0.0
+        self.time_get_neighbors = 0.0
+        self.time_add_edge = 0.0
+        self.time_queue = 0.0
+
+    def instrument(self, graph):
+        """Return timed/counting versions of (get_neighbors, threat_value, add_edge, open_list)"""
+        stats = self
+        env_get_neighbors = graph.env.get_neighbors
+        field_threat_value = graph.env.threat_field.threat_value
+        graph_add_edge = graph.add_edge
+
+        def get_neighbors(*args, **kwargs):
+            start = default_timer()
+            neighbors = env_get_neighbors(*args, **kwargs)
+            stats.time_get_neighbors = stats.time_get_neighbors + default_timer() - start
+            stats.nodes_generated = stats.nodes_generated + len(neighbors)
+            return neighbors
+
+        threat_value = self.timed_threat(field_threat_value)
+
+        def add_edge(*args):
+            start = default_timer()
+            graph_add_edge(*args)
+            stats.time_add_edge = stats.time_add_edge + default_timer() - start
+            if graph.num_vertices > stats.peak_vertices:
+                stats.peak_vertices = graph.num_vertices
+
+        return get_neighbors, threat_value, add_edge, _InstrumentedPriorityQueue(stats)
+
+    def timed_threat(self, field_function):
+        """Wrap a threat field function so its time is added to time_threat_value"""
+        stats = self
+
+        def timed(*args):
+            start = default_timer()
+            value = field_function(*args)
+            stats.time_threat_value = stats.time_threat_value + default_timer() - start
+            return value
+        return timed
+
+    def finish(self, graph, search_start):
+        """Record the end of a search that started at default_timer() value search_start"""
+        self.time_total = self.time_total + default_timer() - search_start
+        if graph.num_vertices > self.peak_vertices:
+            self.peak_vertices = graph.num_vertices
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def __str__(self):
+        return "SearchStats: " + ", ".join("{0} = {1:.4g}".format(k, v) if isinstance(v, float) else
+                                           "{0} = {1}".format(k, v) for k, v in vars(self).items())
+
+
+class _InstrumentedPriorityQueue(PriorityQueue):
+    """PriorityQueue that reports queue sizes, priority updates and time spent to a SearchStats"""
+
+    def __init__(self, stats):
+        super().__init__()
+        self._stats = stats
+
+    def add(self, item, priority):
+        start = default_timer()
+        if item in self._entry_finder:
+            self._stats.reopenings = self._stats.reopenings + 1
+        super().add(item, priority)
+        if len(self._entry_finder) > self._stats.peak_open_size:
+            self._stats.peak_open_size = len(self._entry_finder)
+        self._stats.time_queue = self._stats.time_queue + default_timer() - start
+
+    def remove(self, item):
+        super().remove(item)
+        self._stats.heap_tombstones = self._stats.heap_tombstones + 1
+
+    def pop(self):
+        start = default_timer()
+        item = super().pop()
+        self._stats.time_queue = self._stats.time_queue + default_timer() - start
+        return item
+
+
+class GoalSet:
+    """Set of goal states on the time-expanded lattice of an XYTEnvironment
+
+    Goals are spatial locations (grid points) paired with time intervals, or exact lattice
+    node_ids. Membership is precomputed into a bitmap, so checking a popped vertex in TimeAstar
+    is a single lookup instead of a modulo and two time comparisons. The bitmap only covers the
+    time layers first_layer..last_bitmap_layer that hold goals; byte node_id - first_layer*n_grid
+    is set for a goal node_id. Windows spanning more than GOAL_BITMAP_LAYERS layers, open-ended
+    ones included, are kept as (first, last) time_idx ranges by cell in windows instead.
+
+    goal_set = GoalSet(env=env)
+    goal_set.add_location(gridpt=env.n_grid - 1, time_window=(5, 10))
+    goal_set.add_location(gridpt=env.n_grid - 2)  # whole time horizon t = 0..t_final
+    goal_set.add_location(gridpt=env.n_grid - 3, time_window=(5, float('inf')))  # any time from t = 5
+    goal_vertex_found = TimeAstar(graph=graph, start_vertex=start_vertex, goal_vertex=None,
+                                  goal_set=goal_set, wait=True)
+
+    n_layers bounds the lattice to time layers 0..n_layers-1 (e.g. env.t_pts + 1 for the baked
+    threat tensor); by default it is unbounded like TimeAstar's lattice, which goes on past
+    t_final. A time_window is clipped to the lattice: layers before 0 or from n_layers on are
+    dropped, and a window with nothing left adds no goals."""
+
+    def __init__(self, env, n_layers=None):
+        self.env = env
+        self.n_layers = n_layers
+        self.first_layer = 0
+        self.bitmap = bytearray()
+        self.windows = {}  # cell -> list of (first, last) time_idx ranges, last may be inf
+
+    @property
+    def last_bitmap_layer(self):
+        """Last time layer covered by the bitmap (first_layer - 1 when it is empty)"""
+        return self.first_layer + len(self.bitmap) // self.env.n_grid - 1
+
+    @property
+    def last_layer(self):
+        """Last time layer holding a goal, inf if a window is open-ended"""
+        last_layers = [last for ranges in self.windows.values() for _, last in ranges]
+        return max([self.last_bitmap_layer] + last_layers)
+
+    def _cover(self, first, last):
+        """Grow the bitmap to cover time layers first..last"""
+        n_grid = self.env.n_grid
+        if not self.bitmap:
+            self.first_layer = first
+        elif first < self.first_layer:
+            self.bitmap[:0] = bytes((self.first_layer - first) * n_grid)
+            self.first_layer = first
+        if last > self.last_bitmap_layer:
+            self.bitmap.extend(bytes((last - self.last_bitmap_layer) * n_grid))
+
+    def add_location(self, gridpt, time_window=None):
+        """Mark spatial grid point gridpt as a goal for all times inside time_window
+        (inclusive), clipped to the lattice. With no time_window the whole horizon
+        t = 0..t_final is used; the window may be open-ended, e.g. (0, inf)."""
+        n_grid, t_sep = self.env.n_grid, self.env.t_sep
+        gridpt = gridpt % n_grid
+        if time_window is None:
+            time_window = (0, self.env.t_final)
+        # first and last layer from candidates next to the window edges, checked with the same
+        # time arithmetic as XYTEnvironment.get_neighbors so window edges match exactly
+        first = max(int(math.floor(time_window[0] / t_sep)), 0) if math.isfinite(time_window[0]) else 0
+        while first * t_sep < time_window[0]:
+            first += 1
+        last = self.n_layers - 1 if self.n_layers is not None else math.inf
+        if math.isfinite(time_window[1]):
+            last = min(last, int(math.floor(time_window[1] / t_sep)) + 1)
+            while last >= first and last * t_sep > time_window[1]:
+                last -= 1
+        if last < first:
+            return
+        if last - first >= GOAL_BITMAP_LAYERS:
+            self.windows.setdefault(gridpt, []).append((first, last))
+            return
+        self._cover(first, last)
+        self.bitmap[(first - self.first_layer) * n_grid + gridpt:
+                    (last + 1 - self.first_layer) * n_grid:n_grid] = bytes([1]) * (last + 1 - first)
+
+    def add_node(self, node_id):
+        """Mark an exact lattice node_id (location and time) as a goal"""
+        time_idx = node_id // self.env.n_grid
+        self._cover(time_idx, time_idx)
+        self.bitmap[node_id - self.first_layer * self.env.n_grid] = 1
+
+    def discard(self, node_id):
+        """Remove node_id from the goals if it is one"""
+        index = node_id - self.first_layer * self.env.n_grid
+        if 0 <= index < len(self.bitmap):
+            self.bitmap[index] = 0
+        cell, time_idx = node_id % self.env.n_grid, node_id // self.env.n_grid
+        if cell in self.windows:
+            ranges = []
+            for first, last in self.windows[cell]:
+                if first <= time_idx <= last:
+                    ranges.extend(time_range for time_range in ((first, time_idx - 1), (time_idx + 1, last))
+                                  if time_range[0] <= time_range[1])
+                else:
+                    ranges.append((first, last))
+            self.windows[cell] = ranges
+
+    def __contains__(self, node_id):
+        index = node_id - self.first_layer * self.env.n_grid
+        if 0 <= index < len(self.bitmap) and self.bitmap[index] == 1:
+            return True
+        ranges = self.windows.get(node_id % self.env.n_grid)
+        if ranges:
+            time_idx = node_id // self.env.n_grid
+            return any(first <= time_idx <= last for first, last in ranges)
+        return False
+
+    def goal_cells(self):
+        """Sorted array of the grid points that are a goal at some time"""
+        goal_ids = np.flatnonzero(np.frombuffer(bytes(self.bitmap), dtype=np.uint8))
+        window_cells = [cell for cell, ranges in self.windows.items() if ranges]
+        return np.union1d(goal_ids % self.env.n_grid, np.array(window_cells, dtype=np.int64))
+
+    def node_bitmap(self, n_nodes):
+        """Goal membership as a uint8 array indexed by node_id over node_ids 0..n_nodes-1, e.g.
+        the baked threat tensor of an array search; goals from node_id n_nodes on are left out"""
+        bits = np.zeros(n_nodes, dtype=np.uint8)
+        n_grid = self.env.n_grid
+        offset = self.first_layer * n_grid
+        if offset < n_nodes:
+            covered = np.frombuffer(bytes(self.bitmap), dtype=np.uint8)[:n_nodes - offset]
+            bits[offset:offset + len(covered)] = covered
+        for cell, ranges in self.windows.items():
+            for first, last in ranges:
+                stop = n_nodes if math.isinf(last) else min(n_nodes, (last + 1) * n_grid)
+                bits[first * n_grid + cell:stop:n_grid] = 1
+        return bits
+
+
+class ReservationTable:
+    """Space-time states and moves claimed by already planned agents on the lattice of an
+    XYTEnvironment, for prioritized multi-agent planning
+
+    Occupied (cell, time_idx) states are a bitmap indexed by node_id. Edge swaps
+    (two agents trading cells over one time step) are blocked through a second byte per node_id
+    holding a bit for each direction that may not be taken out of that node.
+
+    reservations = ReservationTable(env=env)
+    reservations.reserve_path(path_ids)  # node_ids of a higher priority agent
+    goal_vertex_found = TimeAstar(graph=graph, start_vertex=start_vertex, goal_vertex=goal_vertex,
+                                  goal_set=reservations.goal_set(goal_cell), wait=True,
+                                  reservations=reservations)
+
+    With park=True (default) an agent stays at its goal cell after arriving, so the cell is
+    reserved until the last layer and goal_set only accepts arrivals after anyone else left it."""
+
+    # Directions out of a node, in the order of XYTEnvironment.get_neighbors, and their opposites
+    WAIT, RIGHT, LEFT, ABOVE, BELOW = range(5)
+    OPPOSITE = (WAIT, LEFT, RIGHT, BELOW, ABOVE)
+
+    def __init__(self, env, n_layers=None):
+        self.env = env
+        self.n_layers = n_layers if n_layers else env.t_pts + 1
+        self.vertex_bits = bytearray(env.n_grid * self.n_layers)
+        self.edge_bits = bytearray(env.n_grid * self.n_layers)
+        self.last_reserved = {}  # cell -> last time_idx it is reserved at
+        self._direction = {0: self.WAIT, 1: self.RIGHT, -1: self.LEFT,
+                           env.n_grid_x: self.ABOVE, -env.n_grid_x: self.BELOW}
+
+    def direction(self, node_id, nbr_id):
+        """Direction of the lattice edge node_id -> nbr_id (WAIT, RIGHT, LEFT, ABOVE or BELOW)"""
+        return self._direction[nbr_id - node_id - self.env.n_grid]
+
+    def reserve_node(self, node_id):
+        self.vertex_bits[node_id] = 1
+        cell = node_id % self.env.n_grid
+        time_idx = node_id // self.env.n_grid
+        if time_idx > self.last_reserved.get(cell, -1):
+            self.last_reserved[cell] = time_idx
+
+    def reserve_path(self, path_ids, park=True):
+        """Reserve every state of a path (node_ids from start to goal) and block the moves that
+        would swap cells with it"""
+        n_grid = self.env.n_grid
+        self.reserve_node(path_ids[0])
+        for node_id, nbr_id in zip(path_ids[:-1], path_ids[1:]):
+            self.reserve_node(nbr_id)
+            direction = self.direction(node_id, nbr_id)
+            if direction != self.WAIT:
+                # moving a -> b between t and t+1 forbids b -> a over the same step
+                self.edge_bits[nbr_id - n_grid] |= 1 << self.OPPOSITE[direction]
+        if park:
+            for node_id in range(path_ids[-1] + n_grid, len(self.vertex_bits), n_grid):
+                self.reserve_node(node_id)
+
+    def blocks(self, node_id, nbr_id):
+        """True if moving along the lattice edge node_id -> nbr_id is not allowed"""
+        if nbr_id < len(self.vertex_bits) and self.vertex_bits[nbr_id]:
+            return True
+        return node_id < len(self.edge_bits) and bool(self.edge_bits[node_id] >> self.direction(node_id, nbr_id) & 1)
+
+    def conflicts(self, path_ids):
+        """True if a path (node_ids from start to goal) uses a reserved state or swap"""
+        if path_ids[0] < len(self.vertex_bits) and self.vertex_bits[path_ids[0]]:
+            return True
+        return any(self.blocks(node_id, nbr_id) for node_id, nbr_id in zip(path_ids[:-1], path_ids[1:]))
+
+    def goal_set(self, goal_cell, time_window=None):
+        """GoalSet of goal_cell inside time_window, limited to arrivals after the cell's last
+        reservation so a parked agent never blocks a higher priority one"""
+        goal_set = GoalSet(env=self.env, n_layers=self.n_layers)
+        goal_set.add_location(goal_cell, time_window=time_window)
+        last = self.last_reserved.get(goal_cell % self.env.n_grid, -1)
+        for time_idx in range(last + 1):
+            goal_set.discard(time_idx * self.env.n_grid + goal_cell % self.env.n_grid)
+        return goal_set
+
+
+def lattice_heuristic(env, goal_set):
+    """Admissible, consistent heuristic for TimeAstar on an XYTEnvironment, as an array by cell:
+    the grid steps to the nearest goal cell of goal_set times the cheapest possible move edge
+    (exposure_cost*threat_field.lower_bound + move_cost*grid separation + wait_cost*t_sep)
+
+    h_cell = lattice_heuristic(env, goal_set)
+    h_cost = h_cell[node_id % env.n_grid]"""
+    n_layers = goal_set.last_layer + 2
+    min_threat = env.threat_field.lower_bound(t_max=n_layers * env.t_sep)
+    min_edge = (env.exposure_cost*max(min_threat, 0) + env.move_cost*min(env.grid_sep_x, env.grid_sep_y) +
+                env.wait_cost*env.t_sep)
+    goal_cells = goal_set.goal_cells()
+    cells = np.arange(env.n_grid)
+    steps = np.full(env.n_grid, np.iinfo(np.int64).max)
+    for chunk in range(0, len(goal_cells), 256):  # running minimum bounds memory to 256*n_grid
+        goals = goal_cells[chunk:chunk + 256, None]
+        chunk_steps = (np.abs(cells % env.n_grid_x - goals % env.n_grid_x) +
+                       np.abs(cells // env.n_grid_x - goals // env.n_grid_x))
+        steps = np.minimum(steps, chunk_steps.min(axis=0))
+    return (steps * min_edge).tolist()
+
+
+def incumbent_path(env, start_node, goal_set, wait=False, edge_exposure=None):
+    """Cheap feasible path for bounding TimeAstar: a staircase walk (x first or y first) to the
+    nearest goal cell of goal_set, padded at the goal with waits (or, without wait, steps out
+    and back) until it lands on a goal state. edge_exposure costs edges as in integrate_exposure
+    mode. Returns (node_ids, cost) of the cheaper staircase, or None if neither reaches a goal
+
+    node_ids, cost = incumbent_path(env, start_node, goal_set, wait=True)"""
+    n_grid, n_grid_x = env.n_grid, env.n_grid_x
+    start_cell = start_node.node_id % n_grid
+    start_time_idx = start_node.node_id // n_grid
+    start_x, start_y = start_cell % n_grid_x, start_cell // n_grid_x
+
+    goal_cells = goal_set.goal_cells()
+    if len(goal_cells) == 0:
+        return None
+    goal_steps = np.abs(goal_cells % n_grid_x - start_x) + np.abs(goal_cells // n_grid_x - start_y)
+    goal_cell = int(goal_cells[np.argmin(goal_steps)])
+    goal_x, goal_y = goal_cell % n_grid_x, goal_cell // n_grid_x
+    step_x = 1 if goal_x > start_x else -1
+    step_y = n_grid_x if goal_y > start_y else -n_grid_x
+    moves_x = [step_x] * abs(goal_x - start_x)
+    moves_y = [step_y] * abs(goal_y - start_y)
+    # out and back from the goal cell, for padding without waits
+    bounce = -step_x if goal_x != start_x else (1 if goal_x + 1 < n_grid_x else -1)
+
+    last_layer = goal_set.last_layer
+    best = None
+    for moves in (moves_x + moves_y, moves_y + moves_x):
+        cells = [start_cell]
+        for move in moves:
+            cells.append(cells[-1] + move)
+        while True:
+            arrival_time_idx = start_time_idx + len(cells) - 1
+            if arrival_time_idx > last_layer:
+                cells = None  # no goal state left in reach
+                break
+            if arrival_time_idx * n_grid + goal_cell in goal_set:
+                break
+            if wait:
+                cells.append(goal_cell)
+            else:
+                cells.extend((goal_cell + bounce, goal_cell))
+        if cells is None:
+            continue
+
+        node_ids = [cell + (start_time_idx + k) * n_grid for k, cell in enumerate(cells)]
+        if len(node_ids) == 1:
+            return node_ids, 0.0
+        xs = np.array(cells) % n_grid_x * env.grid_sep_x
+        ys = np.array(cells) // n_grid_x * env.grid_sep_y
+        ts = (start_time_idx + np.arange(len(cells))) * env.t_sep
+        if edge_exposure is not None:
+            threat = edge_exposure(xs[:-1], ys[:-1], ts[:-1], xs[1:], ys[1:], ts[1:])
+        else:
+            threat = env.threat_field.threat_values(xs[1:], ys[1:], ts[1:])
+        distance = np.array([env.step_distance[nbr_id - node_id - n_grid]
+                             for node_id, nbr_id in zip(node_ids[:-1], node_ids[1:])])
+        cost = float(np.sum(env.exposure_cost*threat + env.move_cost*distance + env.wait_cost*env.t_sep))
+        if best is None or cost < best[1]:
+            best = (node_ids, cost)
+    return best
+
+
+def Astar(graph, start_vertex, goal_vertex, jump_tol=None, stats=None):
     """A* search on a Graph from a start Vertex to goal Vertex
     Usage:
 
@@ -78,10 +503,28 @@ def Astar(graph, start_vertex, goal_vertex):
     goal_vertex = Vertex(node=goal_node)
     goal_vertex_found = Astart(graph=graph, start_vertex=start_vertex, goal_vertex=goal_vertex)
     path = [goal_vertex_found.node]
-    reconstruct_path(goal_vertex_found, path)"""
+    reconstruct_path(goal_vertex_found, path)
+
+    Set jump_tol (e.g. jump_tol=0.01) to skip straight through flat regions of the threat field
+    instead of expanding them cell by cell, see jump_expand for the cost bound. jump_tol=None
+    or jump_tol=0 is plain A*.
+    Pass a SearchStats as stats to collect expansion counts and timings."""
     found_path = False
+    cell_costs = {}  # threat value cache used by the jump expansion
     # Put start Vertex into priority queue
     open_list = PriorityQueue()
+    get_neighbors = graph.env.get_neighbors
+    threat_value = graph.env.threat_field.threat_value
+    add_edge = graph.add_edge
+    if stats is not None:
+        search_start = default_timer()
+        get_neighbors, threat_value, add_edge, open_list = stats.instrument(graph)
+
+    # New search epoch: search info left on the graph by earlier searches is reset lazily
+    epoch = graph.new_search()
+    vert_dict = graph.vert_dict
+    if start_vertex.search_epoch != epoch:
+        start_vertex.reset_search_info(epoch)
 
     open_list.add(start_vertex, 0)
     start_vertex.is_in_openlist = True
@@ -93,22 +536,36 @@ def Astar(graph, start_vertex, goal_vertex):
             continue
 
         if v_current.node == goal_vertex.node:
-            print("GOAL FOUND!!!")
+            logger.debug("Astar goal found, node %s cost %s", v_current.node.node_id, v_current.g_cost)
             found_path = True
+            if stats is not None:
+                stats.finish(graph, search_start)
             return v_current
 
         v_current.is_in_openlist = False
         v_current.is_visited = True
+        if stats is not None:
+            stats.nodes_expanded = stats.nodes_expanded + 1
 
         # Expand current vertex/node
-        neighbor_list = graph.env.get_neighbors(v_current.node)
-        for nbr in neighbor_list:
-            graph.add_edge(v_current.node, nbr, 1.0)
+        if jump_tol is not None:
+            jump_expand(graph, v_current, get_neighbors(v_current.node), goal_vertex.node, jump_tol, open_list,
+                        cell_costs, threat_value=threat_value, add_edge=add_edge)
+            continue
+        successors = v_current.successors  # adjacency cached by an earlier search on this graph
+        if successors is None:
+            neighbor_list = get_neighbors(v_current.node)
+            for nbr in neighbor_list:
+                add_edge(v_current.node, nbr, 1.0)
+            successors = tuple(vert_dict[nbr.node_id] for nbr in neighbor_list)
+            v_current.successors = successors
 
         # Check all neighbors of current vertex
-        for neighbor in v_current.neighbors:
+        for neighbor in successors:
+            if neighbor.search_epoch != epoch:
+                neighbor.reset_search_info(epoch)
             if not neighbor.is_visited:
-                nbr_cost = graph.env.threat_field.threat_value(neighbor.node.pos_x, neighbor.node.pos_y)
+                nbr_cost = threat_value(neighbor.node.pos_x, neighbor.node.pos_y)
                 new_cost = v_current.g_cost + nbr_cost
 
                 if not neighbor.is_in_openlist or new_cost < neighbor.g_cost:
@@ -119,11 +576,112 @@ def Astar(graph, start_vertex, goal_vertex):
 
                     open_list.add(neighbor, neighbor.f_cost)
                     neighbor.is_in_openlist = True
-    print("GOAL NOT FOUND???")
+    logger.info("Astar goal %s not found", goal_vertex.node.node_id)
+    if stats is not None:
+        stats.finish(graph, search_start)
     return None  # If goal not found and open_list becomes empty return None for goal_vertex_found
 
 
-def TimeAstar(graph, start_vertex, goal_vertex, time_window=None, wait=False):
+def jump_expand(graph, v_current, neighbor_list, goal_node, jump_tol, open_list, cell_costs,
+                threat_value=None, add_edge=None):
+    """Cost-bounded jump expansion of v_current, used by Astar when jump_tol is set
+
+    A neighbor is 'flat' if its threat value is less than jump_tol above the cheapest neighbor
+    of v_current (the local minimum), so jump_tol=0 jumps nothing. From each flat neighbor the
+    search keeps stepping in the same direction, marking the cells it passes through as visited
+    with their parent and g_cost set, and only the cell where the jump stops is added to the
+    open list. A jump stops at:
+        - the goal, or the goal's column (horizontal jumps) / row (vertical jumps)
+        - the edge of the environment or an already visited/cheaper vertex
+        - a cell whose next or side neighbor is not flat (near a threat)
+    Near threats no neighbor is flat so this reduces to normal expansion. Jumped cells are closed
+    without being expanded, so the returned path is near optimal rather than exactly optimal
+    when the flat region is not uniform to within jump_tol. On a field whose threat values span
+    less than jump_tol every cell is flat: the path takes the fewest grid steps and costs less
+    than jump_tol per step more than the optimal path.
+
+    cell_costs is a dict cache of threat values by node_id, shared over the whole search.
+    threat_value and add_edge default to the field's and graph's own functions"""
+    env = graph.env
+    threat_value = threat_value or env.threat_field.threat_value
+    add_edge = add_edge or graph.add_edge
+    epoch = graph.search_epoch
+
+    def get_vertex(node):
+        vertex = graph.get_vertex(node)
+        if vertex.search_epoch != epoch:
+            vertex.reset_search_info(epoch)
+        return vertex
+
+    def cost_of(node):
+        if node.node_id not in cell_costs:
+            cell_costs[node.node_id] = threat_value(node.pos_x, node.pos_y)
+        return cell_costs[node.node_id]
+
+    def is_flat(node):
+        return node is None or cost_of(node) < flat_cost
+
+    nbr_costs = [cost_of(nbr) for nbr in neighbor_list]
+    flat_cost = min(nbr_costs) + jump_tol
+    goal_x = goal_node.node_id % env.n_grid_x
+    goal_y = int(goal_node.node_id / env.n_grid_x)
+
+    for nbr, nbr_cost in zip(neighbor_list, nbr_costs):
+        add_edge(v_current.node, nbr, 1.0)
+        parent = v_current
+        vertex = get_vertex(nbr)
+        new_cost = v_current.g_cost + nbr_cost
+
+        # Direction of travel and the two directions to the side of it
+        step = nbr.node_id - v_current.node.node_id
+        side_step = env.n_grid_x if (step == 1 or step == -1) else 1
+
+        while nbr_cost < flat_cost and not vertex.is_visited:
+            node = vertex.node
+            if node == goal_node:
+                break
+            if (side_step != 1 and node.node_id % env.n_grid_x == goal_x) or \
+                    (side_step == 1 and int(node.node_id / env.n_grid_x) == goal_y):
+                break
+            if vertex.is_in_openlist and new_cost >= vertex.g_cost:
+                break
+            if not (is_flat(env.get_node_in_direction(node, side_step)) and
+                    is_flat(env.get_node_in_direction(node, -side_step))):
+                break
+            next_node = env.get_node_in_direction(node, step)
+            if next_node is None or not is_flat(next_node):
+                break
+            add_edge(node, next_node, 1.0)
+            next_vertex = get_vertex(next_node)
+            if next_vertex.is_visited:
+                break
+
+            # Jump through the current cell: close it and carry on to the next one
+            if vertex.is_in_openlist:
+                open_list.remove(vertex)
+                vertex.is_in_openlist = False
+            vertex.parent = parent
+            vertex.g_cost = new_cost
+            vertex.f_cost = new_cost
+            vertex.is_visited = True
+
+            nbr_cost = cost_of(next_node)
+            parent = vertex
+            vertex = next_vertex
+            new_cost = new_cost + nbr_cost
+
+        if not vertex.is_visited and (not vertex.is_in_openlist or new_cost < vertex.g_cost):
+            vertex.parent = parent
+            vertex.g_cost = new_cost
+            vertex.h_cost = vertex.node.get_heuristic(goal_node=goal_node)
+            vertex.f_cost = vertex.g_cost + vertex.h_cost
+
+            open_list.add(vertex, vertex.f_cost)
+            vertex.is_in_openlist = True
+
+
+def TimeAstar(graph, start_vertex, goal_vertex, time_window=None, wait=False, goal_set=None,
+              stats=None, reservations=None, prune=False):
     """A* search on a Graph from a start Vertex to goal Vertex
     Usage:
 
@@ -134,71 +692,348 @@ def TimeAstar(graph, start_vertex, goal_vertex, time_window=None, wait=False):
     goal_vertex = Vertex(node=goal_node)
     goal_vertex_found = Astart(graph=graph, start_vertex=start_vertex, goal_vertex=goal_vertex)
     path = [goal_vertex_found.node]
-    reconstruct_path(goal_vertex_found, path)"""
+    reconstruct_path(goal_vertex_found, path)
+
+    The goal is reached at goal_vertex's exact node, or at its spatial location anywhere inside
+    time_window. Pass a GoalSet as goal_set to search for several locations/time intervals at
+    once (goal_vertex may then be None). time_window is not limited to t_final: the lattice
+    goes on in time, so a later window still matches arrivals at goal_vertex's location.
+    Pass a SearchStats as stats to collect expansion counts and timings.
+    Pass a ReservationTable as reservations to avoid states and moves claimed by other agents.
+
+    With prune=True the search uses the admissible lattice_heuristic, and first costs a greedy
+    incumbent_path (skipped with reservations). Neighbors whose f exceeds the incumbent's cost
+    are never queued, which keeps the open list small; the result is still optimal.
+
+    If graph.env.integrate_exposure is set, each edge is charged the threat integrated along it
+    (threat_field.edge_exposure, evaluated for all neighbors of a vertex at once) instead of
+    the threat value at the neighbor node."""
+
+    # Precompute goal membership over the lattice so each pop is a single lookup
+    if goal_set is None:
+        goal_set = GoalSet(env=graph.env)
+        if time_window:
+            goal_set.add_location(goal_vertex.node.node_id, time_window=time_window)
+        goal_set.add_node(goal_vertex.node.node_id)
+    goal_bits = goal_set.bitmap
+    n_goal_bits = len(goal_bits)
+    goal_offset = goal_set.first_layer * graph.env.n_grid
+    goal_windows = goal_set.windows  # wide windows, checked by cell when the bitmap misses
+    goal_node = goal_vertex.node if goal_vertex is not None else None
 
-    found_path = False
     # Put start Vertex into priority queue
     open_list = PriorityQueue()
+    get_neighbors = graph.env.get_neighbors
+    add_edge = graph.add_edge
+    threat_values = graph.env.threat_field.threat_values
+    edge_exposure = graph.env.threat_field.edge_exposure if graph.env.integrate_exposure else None
+    if stats is not None:
+        search_start = default_timer()
+        get_neighbors, _, add_edge, open_list = stats.instrument(graph)
+        threat_values = stats.timed_threat(threat_values)
+        if edge_exposure is not None:
+            edge_exposure = stats.timed_threat(edge_exposure)
+
+    # Bounds for pruning: heuristic by cell and the cost of a cheap feasible path
+    h_cell = None
+    upper_bound = float('inf')
+    n_grid = graph.env.n_grid
+    if prune:
+        h_cell = lattice_heuristic(graph.env, goal_set)
+        incumbent = None
+        if reservations is None:
+            incumbent = incumbent_path(graph.env, start_vertex.node, goal_set, wait=wait, edge_exposure=edge_exposure)
+        if incumbent is not None:
+            upper_bound = incumbent[1] + 1e-9 * (1 + abs(incumbent[1]))  # slack for summation order
+            if stats is not None:
+                stats.incumbent_cost = incumbent[1]
+
+    # New search epoch: search info left on the graph by earlier searches is reset lazily
+    epoch = graph.new_search()
+    vert_dict = graph.vert_dict
+    if start_vertex.search_epoch != epoch:
+        start_vertex.reset_search_info(epoch)
 
     open_list.add(start_vertex, 0)
     start_vertex.is_in_openlist = True
     start_vertex.g_cost = 0
 
-    while not open_list.is_empty() and not found_path:
+    while not open_list.is_empty():
         v_current = open_list.pop()
         if v_current.is_visited:
             continue
 
-        # If there is a time window specified
-        if time_window:  # If v_current node_id matches spatial location of goal_node and inside time window
-            if ((v_current.node.node_id % graph.env.n_grid) == (goal_vertex.node.node_id % graph.env.n_grid) and
-                    (v_current.node.time >= time_window[0]) and (v_current.node.time <= time_window[1])):
-                print("GOAL FOUND inside time window!!!")
-                found_path = True
-                return v_current
-        if v_current.node == goal_vertex.node:  # otherwise, match goal_node_id location/time exactly
-            print("GOAL FOUND!!!")
-            found_path = True
+        node_id = v_current.node.node_id
+        if ((0 <= node_id - goal_offset < n_goal_bits and goal_bits[node_id - goal_offset]) or
+                (goal_windows and node_id in goal_set)):
+            logger.debug("TimeAstar goal found, node %s cost %s", node_id, v_current.g_cost)
+            if stats is not None:
+                stats.finish(graph, search_start)
             return v_current
 
         v_current.is_in_openlist = False
         v_current.is_visited = True
+        if stats is not None:
+            stats.nodes_expanded = stats.nodes_expanded + 1
 
         # Expand current vertex/node
-        neighbor_list = graph.env.get_neighbors(v_current.node, wait=wait)
-        for nbr in neighbor_list:
-            graph.add_edge(v_current.node, nbr, 1.0)
+        successors = v_current.successors  # adjacency cached by an earlier search on this graph
+        if successors is None or (wait and not v_current.successors_wait):
+            neighbor_list = get_neighbors(v_current.node, wait=wait)
+            for nbr in neighbor_list:
+                add_edge(v_current.node, nbr, 1.0)
+            successors = tuple(vert_dict[nbr.node_id] for nbr in neighbor_list)
+            v_current.successors = successors
+            v_current.successors_wait = wait
+        elif v_current.successors_wait and not wait:
+            successors = successors[1:]  # get_neighbors lists the wait neighbor first
 
         # Check all neighbors of current vertex
-        for neighbor in v_current.neighbors:
+        open_neighbors = []
+        for neighbor in successors:
+            if neighbor.search_epoch != epoch:
+                neighbor.reset_search_info(epoch)
             if not neighbor.is_visited:
-                threat_cost = graph.env.threat_field.threat_value(
-                            neighbor.node.pos_x, neighbor.node.pos_y, neighbor.node.time)
-                neighbor.node.threat_value = threat_cost
+                if reservations is not None and reservations.blocks(node_id, neighbor.node.node_id):
+                    continue
+                open_neighbors.append(neighbor)
+        if not open_neighbors:
+            continue
+        threat_costs, nbr_costs = neighbor_costs(graph.env, v_current.node, open_neighbors,
+                                                 threat_values, edge_exposure)
+
+        for neighbor, threat_cost, nbr_cost in zip(open_neighbors, threat_costs, nbr_costs):
+            neighbor.node.threat_value = threat_cost
+            new_cost = v_current.g_cost + nbr_cost
+
+            if not neighbor.is_in_openlist or new_cost < neighbor.g_cost:
+                if h_cell is not None:
+                    h_cost = h_cell[neighbor.node.node_id % n_grid]
+                    if new_cost + h_cost > upper_bound:
+                        if stats is not None:
+                            stats.pruned = stats.pruned + 1
+                        continue  # can't beat the incumbent
+                else:
+                    h_cost = neighbor.node.get_heuristic(goal_node=goal_node)
+                neighbor.parent = v_current
+                neighbor.g_cost = new_cost
+                neighbor.h_cost = h_cost
+                neighbor.f_cost = neighbor.g_cost + neighbor.h_cost
+
+                open_list.add(neighbor, neighbor.f_cost)
+                neighbor.is_in_openlist = True
+    if stats is not None:
+        stats.finish(graph, search_start)
+    logger.info("TimeAstar goal not found")
+    return None  # If goal not found and open_list becomes empty return None for goal_vertex_found
+
+
+def neighbor_costs(env, node, neighbor_vertices, threat_values, edge_exposure=None):
+    """Threat costs and total edge costs from node to each of neighbor_vertices on an
+    XYTEnvironment, computed for the whole neighbor set in one vectorized call.
+    Returns two lists (threat_costs, edge_costs) in the order of neighbor_vertices
 
-                # Pull environment cost weight values for readability
-                wait_cost = graph.env.wait_cost
-                move_cost = graph.env.move_cost
-                exposure_cost = graph.env.exposure_cost
+    edge cost = exposure_cost*threat + move_cost*distance + wait_cost*t_sep
+    threat is threat_values at the neighbor nodes, or edge_exposure along the edges when given.
+    Distances come from env.step_distance instead of a norm per neighbor."""
+    xs = [nbr.node.pos_x for nbr in neighbor_vertices]
+    ys = [nbr.node.pos_y for nbr in neighbor_vertices]
+    ts = [nbr.node.time for nbr in neighbor_vertices]
+    if edge_exposure is not None:
+        threat = edge_exposure(node.pos_x, node.pos_y, node.time, xs, ys, ts)
+    else:
+        threat = threat_values(xs, ys, ts)
 
-                # temporal and spatial distances
-                time_step = neighbor.node.time - v_current.node.time
-                grid_step = graph.env.node_spatial_distance(v_current.node, neighbor.node)
+    step_distance = env.step_distance
+    offset = node.node_id + env.n_grid
+    distance = np.array([step_distance[nbr.node.node_id - offset] for nbr in neighbor_vertices])
+    edge_costs = env.exposure_cost*threat + env.move_cost*distance + env.wait_cost*env.t_sep
+    return threat.tolist(), edge_costs.tolist()
+
+
+def MultiGoalAstar(graph, start_vertex, goal_vertices):
+    """One-to-many A* search: a single search from start Vertex that continues until every goal
+    Vertex in goal_vertices is settled, instead of one Astar call per goal.
+    Usage:
+
+    graph = Graph(env=env)
+    graph.add_vertex(start_node)
+    start_vertex = graph.get_vertex(start_node)
+
+    goal_vertices = [Vertex(node=goal_node) for goal_node in goal_nodes]
+    goals_found = MultiGoalAstar(graph=graph, start_vertex=start_vertex, goal_vertices=goal_vertices)
+    paths = reconstruct_paths(goals_found)
+
+    goals_found is a dict of goal node_id -> Vertex found (None for goals that were not reached)"""
+    goals_found = {goal_vertex.node.node_id: None for goal_vertex in goal_vertices}
+    goals_remaining = set(goals_found)
+
+    # Put start Vertex into priority queue
+    open_list = PriorityQueue()
 
-                # Total cost of an edge movement
-                nbr_cost = exposure_cost*threat_cost + move_cost*grid_step + wait_cost*time_step
+    # New search epoch: search info left on the graph by earlier searches is reset lazily
+    epoch = graph.new_search()
+    vert_dict = graph.vert_dict
+    if start_vertex.search_epoch != epoch:
+        start_vertex.reset_search_info(epoch)
+
+    open_list.add(start_vertex, 0)
+    start_vertex.is_in_openlist = True
+    start_vertex.g_cost = 0
+
+    while not open_list.is_empty() and goals_remaining:
+        v_current = open_list.pop()
+        if v_current.is_visited:
+            continue
+
+        if v_current.node.node_id in goals_remaining:
+            goals_found[v_current.node.node_id] = v_current
+            goals_remaining.remove(v_current.node.node_id)
+
+        v_current.is_in_openlist = False
+        v_current.is_visited = True
+
+        # Expand current vertex/node, other goals may still lie beyond this one
+        successors = v_current.successors  # adjacency cached by an earlier search on this graph
+        if successors is None:
+            neighbor_list = graph.env.get_neighbors(v_current.node)
+            for nbr in neighbor_list:
+                graph.add_edge(v_current.node, nbr, 1.0)
+            successors = tuple(vert_dict[nbr.node_id] for nbr in neighbor_list)
+            v_current.successors = successors
+
+        # Check all neighbors of current vertex
+        for neighbor in successors:
+            if neighbor.search_epoch != epoch:
+                neighbor.reset_search_info(epoch)
+            if not neighbor.is_visited:
+                nbr_cost = graph.env.threat_field.threat_value(neighbor.node.pos_x, neighbor.node.pos_y)
                 new_cost = v_current.g_cost + nbr_cost
 
                 if not neighbor.is_in_openlist or new_cost < neighbor.g_cost:
                     neighbor.parent = v_current
                     neighbor.g_cost = new_cost
-                    neighbor.h_cost = neighbor.node.get_heuristic(goal_node=goal_vertex.node)
-                    neighbor.f_cost = neighbor.g_cost + neighbor.h_cost
+                    neighbor.f_cost = neighbor.g_cost  # no single goal for a heuristic
 
                     open_list.add(neighbor, neighbor.f_cost)
                     neighbor.is_in_openlist = True
-    print("GOAL NOT FOUND???")
-    return None  # If goal not found and open_list becomes empty return None for goal_vertex_found
+    if goals_remaining:
+        logger.info("Goals not found: %s", sorted(goals_remaining))
+    return goals_found
+
+
+def MultiGoalTimeAstar(graph, start_vertex, goal_vertices, time_window=None, wait=False):
+    """One-to-many version of TimeAstar: a single search from start Vertex that continues until
+    every goal Vertex in goal_vertices is settled. With a time_window a goal is settled by the
+    first (cheapest) arrival at its spatial location inside the window, as in TimeAstar.
+    Usage:
+
+    goal_vertices = [Vertex(node=goal_node) for goal_node in goal_nodes]
+    goals_found = MultiGoalTimeAstar(graph=graph, start_vertex=start_vertex, goal_vertices=goal_vertices,
+                                     time_window=time_window, wait=True)
+    paths = reconstruct_paths(goals_found)
+
+    goals_found is a dict of goal node_id -> Vertex found (None for goals that were not reached)"""
+    n_grid = graph.env.n_grid
+    goals_found = {goal_vertex.node.node_id: None for goal_vertex in goal_vertices}
+    goals_remaining = set(goals_found)
+
+    # With a time window goals are matched on spatial location only
+    goals_at_location = {}
+    for goal_id in goals_found:
+        goals_at_location.setdefault(goal_id % n_grid, []).append(goal_id)
+
+    # Put start Vertex into priority queue
+    open_list = PriorityQueue()
+
+    # New search epoch: search info left on the graph by earlier searches is reset lazily
+    epoch = graph.new_search()
+    vert_dict = graph.vert_dict
+    if start_vertex.search_epoch != epoch:
+        start_vertex.reset_search_info(epoch)
+
+    open_list.add(start_vertex, 0)
+    start_vertex.is_in_openlist = True
+    start_vertex.g_cost = 0
+
+    threat_values = graph.env.threat_field.threat_values
+    edge_exposure = graph.env.threat_field.edge_exposure if graph.env.integrate_exposure else None
+
+    while not open_list.is_empty() and goals_remaining:
+        v_current = open_list.pop()
+        if v_current.is_visited:
+            continue
+
+        node_id = v_current.node.node_id
+        if time_window:
+            if ((node_id % n_grid) in goals_at_location and
+                    (v_current.node.time >= time_window[0]) and (v_current.node.time <= time_window[1])):
+                for goal_id in goals_at_location.pop(node_id % n_grid):
+                    goals_found[goal_id] = v_current
+                    goals_remaining.remove(goal_id)
+        elif node_id in goals_remaining:
+            goals_found[node_id] = v_current
+            goals_remaining.remove(node_id)
+
+        v_current.is_in_openlist = False
+        v_current.is_visited = True
+
+        # Expand current vertex/node, other goals may still lie beyond this one
+        successors = v_current.successors  # adjacency cached by an earlier search on this graph
+        if successors is None or (wait and not v_current.successors_wait):
+            neighbor_list = graph.env.get_neighbors(v_current.node, wait=wait)
+            for nbr in neighbor_list:
+                graph.add_edge(v_current.node, nbr, 1.0)
+            successors = tuple(vert_dict[nbr.node_id] for nbr in neighbor_list)
+            v_current.successors = successors
+            v_current.successors_wait = wait
+        elif v_current.successors_wait and not wait:
+            successors = successors[1:]  # get_neighbors lists the wait neighbor first
+
+        # Check all neighbors of current vertex
+        open_neighbors = []
+        for neighbor in successors:
+            if neighbor.search_epoch != epoch:
+                neighbor.reset_search_info(epoch)
+            if not neighbor.is_visited:
+                open_neighbors.append(neighbor)
+        if not open_neighbors:
+            continue
+        threat_costs, nbr_costs = neighbor_costs(graph.env, v_current.node, open_neighbors,
+                                                 threat_values, edge_exposure)
+
+        for neighbor, threat_cost, nbr_cost in zip(open_neighbors, threat_costs, nbr_costs):
+            neighbor.node.threat_value = threat_cost
+            new_cost = v_current.g_cost + nbr_cost
+
+            if not neighbor.is_in_openlist or new_cost < neighbor.g_cost:
+                neighbor.parent = v_current
+                neighbor.g_cost = new_cost
+                neighbor.f_cost = neighbor.g_cost  # no single goal for a heuristic
+
+                open_list.add(neighbor, neighbor.f_cost)
+                neighbor.is_in_openlist = True
+    if goals_remaining:
+        logger.info("Goals not found: %s", sorted(goals_remaining))
+    return goals_found
+
+
+def reconstruct_paths(goals_found):
+    """Make the shortest path to every goal found by a MultiGoal search
+
+    paths = reconstruct_paths(goals_found)
+
+    paths is a dict of goal node_id -> list of nodes from start to goal (None if not found)"""
+    paths = {}
+    for goal_id, vertex in goals_found.items():
+        if vertex is None:
+            paths[goal_id] = None
+            continue
+        path = [vertex.node]
+        reconstruct_path(vertex, path)
+        path.reverse()
+        paths[goal_id] = path
+    return paths
 
 
 def reconstruct_path(vertex, path):
@@ -209,8 +1044,66 @@ def reconstruct_path(vertex, path):
     path = [goal_vertex_found.node]
     reconstruct_path(goal_vertex_found, path)
 
-    path now contains list of nodes from start to goal"""
-    if vertex.parent:
-        path.append(vertex.parent.node)
-        reconstruct_path(vertex=vertex.parent, path=path)
+    path now contains list of nodes from goal to start (call path.reverse() for start to goal)"""
+    vertex = vertex.parent
+    while vertex is not None:
+        path.append(vertex.node)
+        vertex = vertex.parent
     return
+
+
+class PathArrays:
+    """A path stored as NumPy arrays, ordered from start to goal:
+    node_id, x, y, t, time_idx, threat and cost (cumulative g_cost at each node)
+
+    Create with reconstruct_path_arrays. A PathArrays can be used where a list of Nodes is
+    expected (len, indexing, iteration); XYTNode objects are only built for the items accessed.
+
+    path = reconstruct_path_arrays(goal_vertex_found)
+    path.x, path.y      # waypoint arrays
+    path[-1]            # XYTNode at the goal"""
+
+    def __init__(self, node_id, x, y, t, time_idx, threat, cost):
+        self.node_id = node_id
+        self.x = x
+        self.y = y
+        self.t = t
+        self.time_idx = time_idx
+        self.threat = threat
+        self.cost = cost
+
+    def __len__(self):
+        return len(self.node_id)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[i] for i in range(*item.indices(len(self)))]
+        return XYTNode(node_id=int(self.node_id[item]), pos_x=float(self.x[item]), pos_y=float(self.y[item]),
+                       threat_value=float(self.threat[item]), time=float(self.t[item]),
+                       time_idx=int(self.time_idx[item]))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def reconstruct_path_arrays(vertex):
+    """Make shortest path from vertex.parent as a PathArrays, without recursion or new Nodes
+
+    goal_vertex_found = SOME_SEARCH_ALG(input params)
+    path = reconstruct_path_arrays(goal_vertex_found)"""
+    node_id, x, y, t, time_idx, threat, cost = [], [], [], [], [], [], []
+    while vertex is not None:
+        node = vertex.node
+        node_id.append(node.node_id)
+        x.append(node.pos_x)
+        y.append(node.pos_y)
+        t.append(getattr(node, 'time', 0))
+        time_idx.append(getattr(node, 'time_idx', 0))
+        threat.append(node.threat_value)
+        cost.append(vertex.g_cost)
+        vertex = vertex.parent
+    return PathArrays(node_id=np.array(node_id[::-1], dtype=np.int64), x=np.array(x[::-1], dtype=float),
+                      y=np.array(y[::-1], dtype=float), t=np.array(t[::-1], dtype=float),
+                      time_idx=np.array(time_idx[::-1], dtype=np.int64), threat=np.array(threat[::-1], dtype=float),
+                      cost=np.array(cost[::-1], dtype=float))
@@ -0,0 +1,144 @@
+"""Planning Service
+
+asyncio front end for Astar/TimeAstar, for handlers that take many concurrent planning calls.
+Searches run in a bounded process pool, identical in-flight requests share one search, each
+request may carry a deadline, and the service refuses new work when its queue is full.
+
+async def handler(service):
+    path_ids, cost = await service.time_astar(env=env, start_id=0, goal_id=env.n_grid - 1,
+                                              time_window=(0, env.t_final), wait=True, timeout=2.0)
+
+async def main():
+    async with PlanningService(max_workers=4, max_pending=64) as service:
+        results = await asyncio.gather(*(handler(service) for _ in range(100)))
+        print(service.stats())
+
+asyncio.run(main())
+
+Everything runs in process, so the service can be exercised locally with no network; pass a
+concurrent.futures.ThreadPoolExecutor as executor to avoid starting processes at all."""
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from Graph import Graph, Vertex, XYNode, XYTNode
+from PathCache import PathCache
+from Search import Astar, TimeAstar, reconstruct_path
+
+
+class ServiceBusyError(RuntimeError):
+    """Raised instead of queueing a request when the service already has max_pending searches"""
+
+
+def _make_node(env, node_id):
+    if hasattr(env, 't_final'):
+        pos_x, pos_y, time_idx = env.get_location_from_gridpt(node_id)
+        return XYTNode(node_id=node_id, pos_x=pos_x, pos_y=pos_y, time=time_idx * env.t_sep, time_idx=time_idx)
+    pos_x, pos_y = env.get_location_from_gridpt(node_id)
+    return XYNode(node_id=node_id, pos_x=pos_x, pos_y=pos_y)
+
+
+def _run_search(kind, env, start_id, goal_id, time_window, wait):
+    """Worker side of a request: run the search, return (path_ids, cost) or (None, None)"""
+    graph = Graph(env=env)
+    start_vertex = graph.add_vertex(_make_node(env, start_id))
+    goal_vertex = Vertex(node=_make_node(env, goal_id))
+    if kind == "astar":
+        goal_vertex_found = Astar(graph=graph, start_vertex=start_vertex, goal_vertex=goal_vertex)
+    else:
+        goal_vertex_found = TimeAstar(graph=graph, start_vertex=start_vertex, goal_vertex=goal_vertex,
+                                      time_window=time_window, wait=wait)
+    if goal_vertex_found is None:
+        return None, None
+    path = [goal_vertex_found.node]
+    reconstruct_path(goal_vertex_found, path)
+    path.reverse()
+    return [node.node_id for node in path], goal_vertex_found.g_cost
+
+
+class PlanningService:
+    """PlanningService
+
+    max_workers: size of the process pool running searches (default: number of cores)
+    max_pending: most searches queued or running at once, beyond that requests raise
+                 ServiceBusyError so callers can back off
+    executor: optional concurrent.futures executor to use instead of the process pool
+
+    Functions:
+    - astar / time_astar: coroutines returning (path_ids, cost), with an optional timeout in
+      seconds. A timed out or cancelled request stops waiting; the search itself is cancelled
+      when no other request is waiting for it and it hasn't started yet
+    - stats: submitted/coalesced/rejected/timed out/completed counts
+    - close: shut the pool down (also done by `async with`)"""
+
+    def __init__(self, max_workers=None, max_pending=64, executor=None):
+        self.max_pending = max_pending
+        self._own_executor = executor is None
+        if executor is None:
+            executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+        self.executor = executor
+        self._in_flight = {}  # request key -> [search future, its asyncio wrapper, number of waiting requests]
+        self.submitted = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.completed = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._own_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def astar(self, env, start_id, goal_id, timeout=None):
+        """Astar from node_id start_id to goal_id on an XYEnvironment, returns (path_ids, cost)"""
+        return await self._request("astar", env, start_id, goal_id, None, None, timeout)
+
+    async def time_astar(self, env, start_id, goal_id, time_window=None, wait=False, timeout=None):
+        """TimeAstar from node_id start_id to goal_id on an XYTEnvironment, returns (path_ids, cost)"""
+        return await self._request("time_astar", env, start_id, goal_id, time_window, wait, timeout)
+
+    async def _request(self, kind, env, start_id, goal_id, time_window, wait, timeout):
+        key = (kind,) + PathCache.make_key(env, XYNode(start_id), XYNode(goal_id), time_window, wait)
+        entry = self._in_flight.get(key)
+        if entry is not None and not entry[0].cancelled():
+            self.coalesced = self.coalesced + 1
+        else:
+            if len(self._in_flight) >= self.max_pending:
+                self.rejected = self.rejected + 1
+                raise ServiceBusyError("{0} searches pending".format(len(self._in_flight)))
+            self.submitted = self.submitted + 1
+            loop = asyncio.get_running_loop()
+            search = self.executor.submit(_run_search, kind, env, start_id, goal_id, time_window, wait)
+            entry = [search, None, 0]
+            # a search counts as pending until its worker is done with it, even if nobody waits.
+            # Registered before wrap_future's callback, so stats are updated before waiters resume
+            search.add_done_callback(lambda _: loop.call_soon_threadsafe(self._finished, key, entry))
+            entry[1] = asyncio.wrap_future(search)
+            self._in_flight[key] = entry
+        entry[2] = entry[2] + 1
+
+        try:
+            # shield: one request giving up must not cancel the search other requests wait on
+            return await asyncio.wait_for(asyncio.shield(entry[1]), timeout)
+        except asyncio.TimeoutError:
+            self.timed_out = self.timed_out + 1
+            raise
+        finally:
+            entry[2] = entry[2] - 1
+            if entry[2] == 0:
+                entry[0].cancel()  # nobody is waiting any more, drop it if it hasn't started
+
+    def _finished(self, key, entry):
+        if self._in_flight.get(key) is entry:
+            del self._in_flight[key]
+        if not entry[0].cancelled():
+            self.completed = self.completed + 1
+
+    def stats(self):
+        """Request counts and the number of searches currently pending"""
+        return {"submitted": self.submitted, "coalesced": self.coalesced, "rejected": self.rejected,
+                "timed_out": self.timed_out, "completed": self.completed, "pending": len(self._in_flight)}
@@ -6,15 +6,68 @@ Associates a cost for a location in the Environment. Our common threat is a
 summation of Gaussians
 
 threat = sum( 1/sqrt(2*pi*sigma_i^2)*exp(-1/2*sigma_i^2*(x - mu_i)^2)"""
+import hashlib
+import math
 import numpy as np
 
+# Fixed layout of one threat's 10 parameters, as stored by DataManagement's binary field format.
+# Static GaussThreats have zero rates.
+THREAT_DTYPE = np.dtype([('location', '<f8', (2,)), ('shape', '<f8', (2,)), ('intensity', '<f8'),
+                         ('location_rate', '<f8', (2,)), ('shape_rate', '<f8', (2,)), ('intensity_rate', '<f8')])
+
+
+# edge_exposure splits an edge into pieces over which no threat's relative shape change, times
+# the distance the edge moves relative to it in sigmas, exceeds EDGE_SHAPE_STEP (at most
+# EDGE_MAX_SEGMENTS pieces)
+EDGE_SHAPE_STEP = 0.01
+EDGE_MAX_SEGMENTS = 1024
+
+
+def _erf(x):
+    """Vectorized error function (Abramowitz & Stegun 7.1.26, max abs error 1.5e-7)"""
+    x = np.asarray(x, dtype=float)
+    sign = np.sign(x)
+    x = np.abs(x)
+    t = 1 / (1 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    return sign * (1 - poly * np.exp(-x * x))
+
+
+def _gauss_segment_integrals(px, py, qx, qy, shape_x, shape_y):
+    """Closed form integrals over s in [0, 1] of g(s) and s*g(s), where
+    g(s) = exp(-1/2*((px + qx*s)^2/shape_x^2 + (py + qy*s)^2/shape_y^2))
+    is a Gaussian seen along a straight segment. All arguments broadcast."""
+    a = ((qx / shape_x) ** 2 + (qy / shape_y) ** 2) / 2
+    b = px * qx / shape_x ** 2 + py * qy / shape_y ** 2
+    c = ((px / shape_x) ** 2 + (py / shape_y) ** 2) / 2
+    # exponent is -(a*s^2 + b*s + c). a ~ 0 when the segment doesn't move relative to the threat
+    small = a < 1e-8
+    a_safe = np.where(small, 1.0, a)
+    root_a = np.sqrt(a_safe)
+    m = b / (2 * a_safe)
+    peak = np.exp(-np.maximum(c - a_safe * m * m, 0))  # exponent at its minimum over all s
+    int_g = peak * (np.sqrt(np.pi) / (2 * root_a)) * (_erf(root_a * (1 + m)) - _erf(root_a * m))
+    int_sg = (np.exp(-c) - np.exp(-(a_safe + b + c))) / (2 * a_safe) - m * int_g
+    # a ~ 0: g is flat, use its value at s = 1/2 (a quadratic form, so the exponent is >= 0)
+    flat = np.exp(-np.maximum(a / 4 + b / 2 + c, 0))
+    return np.where(small, flat, int_g), np.where(small, flat / 2, int_sg)
+
 
 class Threat(object):
-    """Base class for a Threat"""
+    """Base class for a Threat
+
+    Every attribute assignment on a threat counts in Threat.edits, so GaussThreatFields know
+    to rebuild their cached parameter arrays (e.g. after set_rates or a new intensity). Assign
+    new values rather than mutating a location or shape sequence in place."""
+    edits = 0
 
     def __init__(self):
         pass
 
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        Threat.edits += 1
+
 
 class ThreatField(object):
     """Base class for a threat field. Can be a linear combination of Threats
@@ -130,6 +183,7 @@ class GaussThreatField(ThreatField):
             self.n_threats = 0
         else:
             self.n_threats = len(threats)
+        self._params = None  # threat parameter arrays for edge_exposure, see _threat_params
 
     def threat_value(self, x, y):
         """Given a location, returns the threat value of the field
@@ -144,6 +198,159 @@ class GaussThreatField(ThreatField):
 
         return threat_val
 
+    def threat_values(self, x, y):
+        """Threat values at many locations in one call, vectorized over threats and broadcast
+        over the location arrays x and y (threat_value loops over threats in Python instead)
+
+        values = threat_field.threat_values(xs, ys)"""
+        return self._threat_values(x, y, 0)
+
+    def _threat_values(self, x, y, t):
+        loc, loc_rate, shape, shape_rate, intensity, intensity_rate = self._threat_params()
+        x, y, t = (np.asarray(v, dtype=float)[..., None] for v in (x, y, t))
+        shape_x = shape[:, 0] + shape_rate[:, 0] * t
+        shape_y = shape[:, 1] + shape_rate[:, 1] * t
+        dx = (x - (loc[:, 0] + loc_rate[:, 0] * t)) / shape_x
+        dy = (y - (loc[:, 1] + loc_rate[:, 1] * t)) / shape_y
+        weighted = (intensity + intensity_rate * t) / (2 * shape_x * shape_y) * np.exp(-(dx * dx + dy * dy) / 2)
+        return self.offset + np.sum(weighted, axis=-1)
+
+    def edge_exposure(self, x0, y0, x1, y1):
+        """Mean threat value along the straight edge from (x0, y0) to (x1, y1), integrated in
+        closed form with erf instead of sampled at the end point. Vectorized over threats and
+        broadcast over edges: the coordinates may be arrays of edge end points.
+
+        exposure = threat_field.edge_exposure(x0, y0, x1, y1)"""
+        return self._edge_exposure(x0, y0, 0, x1, y1, 0)
+
+    def _edge_exposure(self, x0, y0, t0, x1, y1, t1, shape_step=None):
+        loc, loc_rate, shape, shape_rate, intensity, intensity_rate = self._threat_params()
+        x0, y0, t0, x1, y1, t1 = (np.asarray(v, dtype=float)[..., None] for v in (x0, y0, t0, x1, y1, t1))
+        dt = t1 - t0
+        n_segments = np.ones(np.broadcast(x0, y0, t0, x1, y1, t1).shape)  # constant shapes, the closed form is exact
+        if np.any(shape_rate) and np.any(dt):
+            # Holding a shape fixed errs by about its relative change times the distance the edge
+            # moves relative to the threat in sigmas, so pieces are sized on the product. Each edge
+            # gets its own count so its cost doesn't depend on the edges evaluated alongside it
+            t_ends = np.stack(np.broadcast_arrays(t0, t1))
+            shape_ends = np.abs(shape + shape_rate * t_ends[..., None])
+            low = np.maximum(np.min(shape_ends, axis=0), 1e-12)
+            change = np.max(np.abs(shape_ends[1] - shape_ends[0]) / low, axis=-1)
+            travel = np.hypot(((x1 - x0) - loc_rate[:, 0] * dt) / low[..., 0],
+                              ((y1 - y0) - loc_rate[:, 1] * dt) / low[..., 1])
+            error = np.max(change * (1 + travel), axis=-1, keepdims=True)
+            n_segments = np.clip(np.ceil(error / (shape_step or EDGE_SHAPE_STEP)), 1, EDGE_MAX_SEGMENTS)
+        # Each edge is split into n_segments pieces. Within a piece threat motion and intensity
+        # change are exact and shapes are held at the middle of the piece
+        total = 0
+        for k in range(int(np.max(n_segments))):
+            s0 = k / n_segments
+            t_start = t0 + dt * s0
+            t_mid = t0 + dt * (k + 0.5) / n_segments
+            shape_x = shape[:, 0] + shape_rate[:, 0] * t_mid
+            shape_y = shape[:, 1] + shape_rate[:, 1] * t_mid
+            # Offset from each threat's center at the start of the piece, and its change over the piece
+            px = x0 + (x1 - x0) * s0 - (loc[:, 0] + loc_rate[:, 0] * t_start)
+            py = y0 + (y1 - y0) * s0 - (loc[:, 1] + loc_rate[:, 1] * t_start)
+            qx = ((x1 - x0) - loc_rate[:, 0] * dt) / n_segments
+            qy = ((y1 - y0) - loc_rate[:, 1] * dt) / n_segments
+            int_g, int_sg = _gauss_segment_integrals(px, py, qx, qy, shape_x, shape_y)
+            # intensity(s) = intensity at the start of the piece + intensity_rate*dt/n_segments*s
+            weighted = ((intensity + intensity_rate * t_start) * int_g +
+                        intensity_rate * dt / n_segments * int_sg)
+            piece = np.sum(weighted / (2 * shape_x * shape_y), axis=-1, keepdims=True) / n_segments
+            total = total + np.where(k < n_segments, piece, 0)[..., 0]  # edges with fewer pieces add 0
+        return self.offset + total
+
+    def lower_bound(self, t_max=0):
+        """A value the field never goes below for times 0..t_max: the offset, lowered by the
+        deepest possible dip of any threat whose intensity becomes negative
+
+        min_threat = threat_field.lower_bound(t_max=env.t_final)"""
+        loc, loc_rate, shape, shape_rate, intensity, intensity_rate = self._threat_params()
+        # fmin drops the nan of a zero rate times t_max=inf
+        min_intensity = intensity + np.fmin(intensity_rate * t_max, 0)
+        min_shape = shape + np.fmin(shape_rate * t_max, 0)
+        with np.errstate(invalid='ignore'):
+            dips = np.minimum(min_intensity, 0) / (2 * min_shape[:, 0] * min_shape[:, 1])
+        if np.isnan(dips).any():  # unbounded decay over an unbounded time
+            return -math.inf
+        return self.offset + float(np.sum(dips))
+
+    def _threat_params(self):
+        """Threat parameters as arrays (one row per threat), built on first use and rebuilt
+        after any threat edit (Threat.edits) or a change in the number of threats. Rates are
+        zero for static GaussThreats. Every vectorized method, __eq__, __hash__ and fingerprint
+        read the threats through these arrays."""
+        threats = self.threats or []
+        params = getattr(self, '_params', None)
+        if (params is None or getattr(self, '_params_edits', None) != Threat.edits or
+                len(params[4]) != len(threats)):
+            self._params_edits = Threat.edits
+            self._params = (
+                np.array([t.location for t in threats], dtype=float).reshape(-1, 2),
+                np.array([getattr(t, 'location_rate', (0, 0)) for t in threats], dtype=float).reshape(-1, 2),
+                np.array([t.shape for t in threats], dtype=float).reshape(-1, 2),
+                np.array([getattr(t, 'shape_rate', (0, 0)) for t in threats], dtype=float).reshape(-1, 2),
+                np.array([t.intensity for t in threats], dtype=float),
+                np.array([getattr(t, 'intensity_rate', 0) for t in threats], dtype=float))
+        return self._params
+
+    def fingerprint(self):
+        """Return a hex digest identifying the field by its offset and threat parameters.
+        Two fields with identical parameters have the same fingerprint.
+
+        key = threat_field.fingerprint()"""
+        name, offset, records = self._key()
+        return hashlib.sha1(repr((name, offset)).encode() + records).hexdigest()
+
+    def threat_records(self):
+        """Threat parameters as a THREAT_DTYPE structured array, one record per threat"""
+        location, location_rate, shape, shape_rate, intensity, intensity_rate = self._threat_params()
+        records = np.zeros(len(intensity), dtype=THREAT_DTYPE)
+        records['location'] = location
+        records['shape'] = shape
+        records['intensity'] = intensity
+        records['location_rate'] = location_rate
+        records['shape_rate'] = shape_rate
+        records['intensity_rate'] = intensity_rate
+        return records
+
+    @classmethod
+    def from_records(cls, records, offset=0):
+        """Build a field from a THREAT_DTYPE array (e.g. a zero-copy np.frombuffer view).
+        The records are used as the field's parameter arrays as they are, without copying
+
+        threat_field = GaussDynamicThreatField.from_records(threat_field.threat_records(), offset=2)"""
+        threats = []
+        for rec in records:
+            if cls is GaussThreatField:
+                threats.append(GaussThreat(location=tuple(rec['location']), shape=tuple(rec['shape']),
+                                           intensity=float(rec['intensity'])))
+            else:
+                threats.append(GaussDynamicThreat(location_0=tuple(rec['location']), shape_0=tuple(rec['shape']),
+                                                  intensity_0=float(rec['intensity']),
+                                                  location_rate=tuple(rec['location_rate']),
+                                                  shape_rate=tuple(rec['shape_rate']),
+                                                  intensity_rate=float(rec['intensity_rate'])))
+        threat_field = cls(threats=threats, offset=offset)
+        threat_field._params = (records['location'], records['location_rate'], records['shape'],
+                                records['shape_rate'], records['intensity'], records['intensity_rate'])
+        threat_field._params_edits = Threat.edits
+        return threat_field
+
+    def _key(self):
+        return type(self).__name__, float(self.offset), self.threat_records().tobytes()
+
+    def __eq__(self, other):
+        if not isinstance(other, GaussThreatField):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        # fields hash by value, so don't edit one in place while it is a dict key or set member
+        return hash(self._key())
+
     def add_threat(self, threat):
         """Add a new threat to the field
 
@@ -155,6 +362,7 @@ class GaussThreatField(ThreatField):
         else:
             self.threats.append(threat)
         self.n_threats = self.n_threats + 1
+        self._params = None
 
 
 class GaussDynamicThreatField(GaussThreatField):
@@ -185,16 +393,38 @@ class GaussDynamicThreatField(GaussThreatField):
                                            ((y - location_yt) ** 2) / (shape_yt ** 2))))
         return threat_val
 
+    def threat_values(self, x, y, t):
+        """Threat values at many locations and times in one call, vectorized over threats and
+        broadcast over the arrays x, y and t
+
+        values = threat_field.threat_values(xs, ys, ts)"""
+        return self._threat_values(x, y, t)
+
+    def edge_exposure(self, x0, y0, t0, x1, y1, t1):
+        """Mean threat value along the straight space-time edge from (x0, y0, t0) to
+        (x1, y1, t1), integrated in closed form with erf. Threat motion and intensity change
+        across the time step are exact. Changing threat shapes are handled by splitting the
+        edge into pieces with the shape held at each piece's middle. Each edge gets enough
+        pieces that the relative shape change times the distance travelled in sigmas stays
+        under EDGE_SHAPE_STEP per piece, up to EDGE_MAX_SEGMENTS, so its value doesn't depend
+        on the other edges in the call. On random fields (generate_random_field, t_pts 20 to
+        100) the relative error against fine quadrature stays below 3e-4; only an edge that
+        would need more than EDGE_MAX_SEGMENTS pieces (a threat narrowing to almost nothing as
+        the edge crosses it) can exceed that. Vectorized over threats and broadcast over edges.
+
+        exposure = threat_field.edge_exposure(x0, y0, t0, x1, y1, t1)"""
+        return self._edge_exposure(x0, y0, t0, x1, y1, t1)
+
     def generate_random_field(self, env, n_threats=None, fixed_location=False, fixed_shape=False,
-                              fixed_intensity=False):
+                              fixed_intensity=False, seed=None):
         """Generate a random field.
         n_threats: specify a number of threats, or if None allow random set
         Set fixed_location = True to create stationary threats
         Set fixed_shape = True to create moving threats of fixed size
         set fixed_intensity = True to create threats that don't grow or shrink
-        Or allow all False for moving, shape-shifting and variable height threats"""
-        # randstate = np.random.RandomState(12345678)  # for consistent random values
-        randstate = np.random.RandomState()
+        Or allow all False for moving, shape-shifting and variable height threats
+        seed: optional seed (e.g. 12345678) for consistent random values"""
+        randstate = np.random.RandomState(seed)
 
         min_threats = 1
         max_threats = 20
@@ -202,7 +432,7 @@ class GaussDynamicThreatField(GaussThreatField):
         max_intensity = 5
 
         if not n_threats:
-            n_threats = int(randstate.randint(min_threats, max_threats, 1))
+            n_threats = int(randstate.randint(min_threats, max_threats))
 
         for nt in range(min_threats, n_threats+1):
             loc0x, locfx = tuple(randstate.uniform(0, env.x_size, 2))
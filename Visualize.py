@@ -2,31 +2,89 @@
 
 saving videos, need to support ffmpeg
 conda install -c conda-forge ffmpeg
+
+export_animation/export_sims render frames without a display (Agg canvases) in a process
+pool and write PNG sequences or pipe raw RGB frames to ffmpeg.
 """
 
+import multiprocessing
+import os
+import subprocess
 from mpl_toolkits.mplot3d import Axes3D
 import matplotlib.pyplot as plt
-from matplotlib import cm
+from matplotlib import cm, image
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from matplotlib.ticker import LinearLocator, FormatStrFormatter
 import numpy as np
 from matplotlib import animation
 
 
-def draw_threat_field(env, threat_field, x_res=100, y_res=100):
+def pixel_resolution(ax, x_res, y_res):
+    """Cap a plot resolution at the size of ax in pixels, finer grids can't be seen and only
+    cost time and memory
+
+    x_res, y_res = pixel_resolution(ax, 1000, 1000)"""
+    bbox = ax.get_window_extent()
+    return max(2, min(x_res, int(bbox.width))), max(2, min(y_res, int(bbox.height)))
+
+
+def _field_grid(env, values, x_res, y_res):
+    """X, Y, Z for plotting precomputed values on the env grid (e.g. a layer of
+    env.bake_threat_values()), block-max downsampled to at most x_res by y_res so peaks stay"""
+    values = np.asarray(values)
+    step_y = -(-values.shape[0] // y_res)
+    step_x = -(-values.shape[1] // x_res)
+    if step_x > 1 or step_y > 1:
+        pad_y = -values.shape[0] % step_y
+        pad_x = -values.shape[1] % step_x
+        values = np.pad(values, ((0, pad_y), (0, pad_x)), mode='edge')
+        values = values.reshape(values.shape[0] // step_y, step_y, values.shape[1] // step_x, step_x).max(axis=(1, 3))
+    X = np.linspace(0, env.x_size, values.shape[1])
+    Y = np.linspace(0, env.y_size, values.shape[0])
+    X, Y = np.meshgrid(X, Y)
+    return X, Y, values
+
+
+def decimate_path(x, y, max_points):
+    """Indices of at most about max_points points of a polyline that keep its shape: the path
+    is cut into buckets and each bucket keeps its first, last and min/max x and y points
+
+    keep = decimate_path(x, y, max_points=2000)"""
+    n_points = len(x)
+    if n_points <= max_points:
+        return np.arange(n_points)
+    x = np.asarray(x)
+    y = np.asarray(y)
+    keep = [0, n_points - 1]
+    bucket_size = -(-n_points * 6 // max_points)  # up to 6 points kept per bucket
+    for start in range(0, n_points, bucket_size):
+        stop = min(start + bucket_size, n_points)
+        keep.extend((start, stop - 1, start + np.argmin(x[start:stop]), start + np.argmax(x[start:stop]),
+                     start + np.argmin(y[start:stop]), start + np.argmax(y[start:stop])))
+    return np.unique(keep)
+
+
+def draw_threat_field(env, threat_field, x_res=100, y_res=100, values=None):
     """Draw a 3D threat field and return an axis object which can be used to update plot
 
     ax = draw_threat_field(env=env, threat_field=threat_field, x_res = 200, y_res = 200)
 
-    x_res and y_res are optional arguments to change the resolution of the plot, default = 100"""
+    x_res and y_res are optional arguments to change the resolution of the plot, default = 100.
+    They are capped at the axes size in pixels. Pass values (e.g. env.bake_threat_values()[t_idx])
+    to plot an already evaluated grid instead of evaluating the field again"""
     fig = plt.figure()
-    ax = fig.gca(projection='3d')
+    ax = fig.add_subplot(111, projection='3d')
+    x_res, y_res = pixel_resolution(ax, x_res, y_res)
 
     # Make data
-    X = np.linspace(0, env.x_size, x_res)
-    Y = np.linspace(0, env.y_size, y_res)
-    X, Y = np.meshgrid(X, Y)
-
-    Z = threat_field.threat_value(X, Y)
+    if values is not None:
+        X, Y, Z = _field_grid(env, values, x_res, y_res)
+    else:
+        X = np.linspace(0, env.x_size, x_res)
+        Y = np.linspace(0, env.y_size, y_res)
+        X, Y = np.meshgrid(X, Y)
+        Z = threat_field.threat_value(X, Y)
 
     # Plot the surface
     surf = ax.plot_surface(X, Y, Z, cmap=cm.jet, linewidth=0, antialiased=False)
@@ -43,20 +101,42 @@ def draw_threat_field(env, threat_field, x_res=100, y_res=100):
     return ax
 
 
+def threat_frames(env, threat_field, times, x_res=100, y_res=100, max_chunk_values=2**24):
+    """Threat field values on an x_res by y_res grid at every time in times, as one array of
+    shape (len(times), y_res, x_res)
+
+    frames = threat_frames(env=env, threat_field=threat_field, times=np.linspace(0, env.t_final, env.t_pts))
+
+    Frames are evaluated with the vectorized threat_values, a chunk of frames per call, with at
+    most max_chunk_values intermediate (grid point x threat) values per chunk"""
+    X = np.linspace(0, env.x_size, x_res)
+    Y = np.linspace(0, env.y_size, y_res)
+    X, Y = np.meshgrid(X, Y)
+    times = np.asarray(times, dtype=float)
+
+    frames = np.empty((len(times), y_res, x_res))
+    chunk = max(1, max_chunk_values // (x_res * y_res * max(threat_field.n_threats, 1)))
+    for start in range(0, len(times), chunk):
+        frames[start:start + chunk] = threat_field.threat_values(X, Y, times[start:start + chunk, None, None])
+    return frames
+
+
 def animate_threat_field(env, threat_field, x_res=100, y_res=100):
-    """Animate a 3D dynamic threat field"""
+    """Animate a 3D dynamic threat field
+
+    All frames are computed up front with threat_frames. 3D surfaces can't be updated in place,
+    so each frame replaces the previous surface (the axes and their settings are kept)"""
 
     def animate(i, Z, surf):
         # Threat field at ith time instant
-        Z = threat_field.threat_value(X, Y, T[i])
-        ax.clear()
-        surf = ax.plot_surface(X, Y, Z, cmap=cm.jet, linewidth=0, antialiased=False)
-        # ax.zlim([0, 20])
-        return surf,
+        surfaces[0].remove()
+        surfaces[0] = ax.plot_surface(X, Y, Z[i], cmap=cm.jet, norm=norm, linewidth=0, antialiased=False)
+        return surfaces[0],
 
     # Set up figure, axis, and plot element we want to animate
     fig = plt.figure()
     ax = fig.add_subplot(111, projection='3d')
+    x_res, y_res = pixel_resolution(ax, x_res, y_res)
     # Make data
     X = np.linspace(0, env.x_size, x_res)
     Y = np.linspace(0, env.y_size, y_res)
@@ -64,8 +144,11 @@ def animate_threat_field(env, threat_field, x_res=100, y_res=100):
     T = np.linspace(0, env.t_final, env.t_pts)
     frames = env.t_pts
 
-    Z = threat_field.threat_value(X, Y, 0)
-    surf = ax.plot_surface(X, Y, Z, cmap=cm.jet, linewidth=0, antialiased=False)
+    Z = threat_frames(env=env, threat_field=threat_field, times=T, x_res=x_res, y_res=y_res)
+    norm = plt.Normalize(Z.min(), Z.max())  # same colors and z range for every frame
+    surf = ax.plot_surface(X, Y, Z[0], cmap=cm.jet, norm=norm, linewidth=0, antialiased=False)
+    surfaces = [surf]
+    ax.set_zlim(Z.min(), Z.max())
     ax.zaxis.set_major_locator(LinearLocator(10))
     ax.zaxis.set_major_formatter(FormatStrFormatter('%.02f'))
     fig.colorbar(surf, shrink=0.5, aspect=5)
@@ -101,62 +184,72 @@ def animate_test():
     plt.show()
 
 
-def draw_threat_field_2D(env, threat_field, x_res=100, y_res=100):
+def draw_threat_field_2D(env, threat_field, x_res=100, y_res=100, values=None):
     """Draw a 2D threat field and return an axis object to further modify plot
 
     ax_2d = draw_threat_field_2D(env=env, threat_field=threat_field)
 
-    This function is useful for later plotting the path on top"""
+    This function is useful for later plotting the path on top. The resolution is capped at the
+    axes size in pixels, and values (e.g. env.bake_threat_values()[t_idx]) plots an already
+    evaluated grid instead of evaluating the field again"""
     fig, ax = plt.subplots(1, 1)
+    x_res, y_res = pixel_resolution(ax, x_res, y_res)
 
     # Make data
-    X = np.linspace(0, env.x_size, x_res)
-    Y = np.linspace(0, env.y_size, y_res)
-    X, Y = np.meshgrid(X, Y)
-
-    Z = threat_field.threat_value(X, Y)
+    if values is not None:
+        X, Y, Z = _field_grid(env, values, x_res, y_res)
+    else:
+        X = np.linspace(0, env.x_size, x_res)
+        Y = np.linspace(0, env.y_size, y_res)
+        X, Y = np.meshgrid(X, Y)
+        Z = threat_field.threat_value(X, Y)
 
-    pcol = ax.pcolor(X, Y, Z, cmap=cm.jet)
+    pcol = ax.pcolormesh(X, Y, Z, cmap=cm.jet, shading='auto')
     plt.colorbar(pcol)
     plt.show(block=False)
     return ax
 
 def animate_threat_field_2D(env, threat_field, path=None, x_res=100, y_res=100):
-    """Animate the time varying threat field in 2D with opttion to plot path"""
+    """Animate the time varying threat field in 2D with opttion to plot path
+
+    The frame stack is computed up front (threat_frames) at the path's node times, or at
+    env.t_pts times over [0, t_final] without a path. Frames then only update the data of a
+    single pcolormesh and the position marker, with blitting"""
     def animate(i, Z, pcol):
         # Threat field at ith time instant
-        Z = threat_field.threat_value(X, Y, T[i])
-        ax.clear()
-        pcol = ax.pcolor(X, Y, Z, cmap=cm.jet)
-        # animate_path(ax=ax, path=path, t_idx=i)
-        curr_node = path[i]
-        ax.plot(curr_node.pos_x, curr_node.pos_y, markersize=10, color='white',
-                marker='o', markeredgewidth=2.0, markeredgecolor='black')
+        pcol.set_array(Z[i].ravel())
+        if path:
+            curr_node = path[i]
+            marker.set_data([curr_node.pos_x], [curr_node.pos_y])
+            return pcol, marker
         return pcol,
 
     # Set up figure, axis, and plot element we want to animate
     fig, ax = plt.subplots(1, 1)
+    x_res, y_res = pixel_resolution(ax, x_res, y_res)
     # Make data
     X = np.linspace(0, env.x_size, x_res)
     Y = np.linspace(0, env.y_size, y_res)
     X, Y = np.meshgrid(X, Y)
-    T = np.linspace(0, env.t_final, env.t_pts)
     if path:
-        frames = len(path)
+        T = [node.time for node in path]
     else:
-        frames = env.t_pts
+        T = np.linspace(0, env.t_final, env.t_pts)
+    frames = len(T)
 
-    Z = threat_field.threat_value(X, Y, 0)
-    pcol = ax.pcolor(X, Y, Z, cmap=cm.jet)
+    Z = threat_frames(env=env, threat_field=threat_field, times=T, x_res=x_res, y_res=y_res)
+    pcol = ax.pcolormesh(X, Y, Z[0], cmap=cm.jet, vmin=Z.min(), vmax=Z.max(), shading='auto')
     plt.colorbar(pcol)
+    marker, = ax.plot([], [], markersize=10, color='white', linestyle='',
+                      marker='o', markeredgewidth=2.0, markeredgecolor='black')
 
-    anim = animation.FuncAnimation(fig, animate, fargs=(Z, pcol), frames=frames, interval=20, blit=False, repeat=False)
+    anim = animation.FuncAnimation(fig, animate, fargs=(Z, pcol), frames=frames, interval=20, blit=True, repeat=False)
 
     plt.show()
     return anim
 
 
-def draw_path(ax, path):
+def draw_path(ax, path, max_points=None):
     """Add a path to an existing plot. Used in combination with draw_threat_field_2D.
     Typical usage:
 
@@ -167,12 +260,26 @@ def draw_path(ax, path):
 
     goal_vertex_found = Astar(graph=graph, start_vertex=start_vertex, goal_vertex=goal_vertex)
     path = [goal_vertex_found.node]
-    reconstruct_path(goal_vertex_found, path)"""
-    x = [n.pos_x for n in path]
-    y = [n.pos_y for n in path]
+    reconstruct_path(goal_vertex_found, path)
 
-    ax.plot(x, y, markersize=8, color='white',
-            marker='o', markeredgewidth=2.0, markeredgecolor='black')
+    or a PathArrays from reconstruct_path_arrays(goal_vertex_found), whose x/y arrays are used directly
+
+    Long paths are decimated to about max_points points (default twice the axes width in
+    pixels) with decimate_path, and waypoint markers are only drawn while they don't overlap"""
+    if hasattr(path, 'x'):
+        x, y = np.asarray(path.x), np.asarray(path.y)
+    else:
+        x = np.array([n.pos_x for n in path])
+        y = np.array([n.pos_y for n in path])
+
+    width = ax.get_window_extent().width
+    if max_points is None:
+        max_points = max(2, int(2 * width))
+    keep = decimate_path(x, y, max_points)
+    marker = 'o' if len(keep) <= width / 8 else None
+
+    ax.plot(x[keep], y[keep], markersize=8, color='white',
+            marker=marker, markeredgewidth=2.0, markeredgecolor='black')
 
     plt.show(block=False)
 
@@ -190,3 +297,162 @@ def animate_path(ax, path, t_idx):
             marker='o', markeredgewidth=2.0, markeredgecolor='black')
 
     plt.show(block=False)
+
+
+class _FrameRenderer:
+    """Draws threat field (and path) frames on an Agg canvas, no display or pyplot needed.
+    Built once per process and reused for every frame it renders"""
+
+    def __init__(self, env, threat_field, times, path_xy=None, x_res=100, y_res=100, vmin=None, vmax=None,
+                 figsize=(6.4, 4.8), dpi=100):
+        self.env = env
+        self.threat_field = threat_field
+        self.times = times
+        self.path_xy = path_xy
+
+        self.fig = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.fig)
+        ax = self.fig.add_subplot(111)
+        self.x_res, self.y_res = x_res, y_res = pixel_resolution(ax, x_res, y_res)
+        X, Y = np.meshgrid(np.linspace(0, env.x_size, x_res), np.linspace(0, env.y_size, y_res))
+        self.pcol = ax.pcolormesh(X, Y, np.zeros((y_res, x_res)), cmap=cm.jet, vmin=vmin, vmax=vmax, shading='auto')
+        self.fig.colorbar(self.pcol)
+        self.marker = None
+        if path_xy is not None:
+            keep = decimate_path(path_xy[0], path_xy[1], max_points=2 * self.canvas.get_width_height()[0])
+            ax.plot(np.asarray(path_xy[0])[keep], np.asarray(path_xy[1])[keep], markersize=5, color='white',
+                    marker='o' if len(keep) <= 100 else None, markeredgewidth=2.0, markeredgecolor='black')
+            self.marker, = ax.plot([], [], markersize=10, color='white', linestyle='',
+                                   marker='o', markeredgewidth=2.0, markeredgecolor='black')
+        self.canvas.draw()
+        self.width, self.height = self.canvas.get_width_height()
+
+    def render(self, start, stop):
+        """Yield (frame index, RGB array of shape (height, width, 3)) for frames start..stop-1"""
+        Z = threat_frames(env=self.env, threat_field=self.threat_field, times=self.times[start:stop],
+                          x_res=self.x_res, y_res=self.y_res)
+        for i in range(start, stop):
+            self.pcol.set_array(Z[i - start].ravel())
+            if self.marker is not None:
+                self.marker.set_data([self.path_xy[0][i]], [self.path_xy[1][i]])
+            self.canvas.draw()
+            yield i, np.asarray(self.canvas.buffer_rgba())[:, :, :3]
+
+
+_renderer = None
+
+
+def _init_renderer(renderer_args):
+    global _renderer
+    _renderer = _FrameRenderer(**renderer_args)
+
+
+def _render_range(task):
+    """Pool task: render frames start..stop-1, writing PNGs to png_folder, or returning the raw
+    RGB bytes of the frames in order when png_folder is None"""
+    start, stop, png_folder = task
+    if png_folder is None:
+        return b''.join(rgb.tobytes() for _, rgb in _renderer.render(start, stop))
+    for i, rgb in _renderer.render(start, stop):
+        image.imsave(os.path.join(png_folder, "frame_{0:05d}.png".format(i)), rgb)
+    return stop - start
+
+
+def _open_ffmpeg(filename, width, height, fps, ffmpeg):
+    """Start an ffmpeg process encoding raw RGB frames written to its stdin"""
+    command = [ffmpeg, '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+               '-s', '{0}x{1}'.format(width, height), '-r', str(fps), '-i', '-',
+               '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p', filename]
+    return subprocess.Popen(command, stdin=subprocess.PIPE)
+
+
+def export_animation(env, threat_field, filename, path=None, x_res=100, y_res=100, fps=20, figsize=(6.4, 4.8),
+                     dpi=100, vmin=None, vmax=None, n_workers=None, frames_per_task=16, ffmpeg='ffmpeg'):
+    """Render the 2D threat field animation (and path) without a display and save it
+
+    export_animation(env=env, threat_field=threat_field, filename='sim_3.mp4', path=path)
+    export_animation(env=env, threat_field=threat_field, filename='sim_3_frames', path=path)
+
+    A filename with an extension is encoded by piping raw RGB frames to an ffmpeg subprocess
+    (ffmpeg is the executable to run), a filename without one is a folder that receives a
+    frame_00000.png, ... sequence. Frames are those of animate_threat_field_2D. Ranges of
+    frames_per_task frames are rendered in a pool of n_workers processes (default: all cores,
+    1 renders in this process). vmin/vmax fix the color scale, by default it spans the field
+    sampled on a coarse grid over all frame times."""
+    if path:
+        times = [node.time for node in path]
+        path_xy = ([node.pos_x for node in path], [node.pos_y for node in path])
+    else:
+        times = list(np.linspace(0, env.t_final, env.t_pts))
+        path_xy = None
+    if vmin is None or vmax is None:
+        coarse = threat_frames(env=env, threat_field=threat_field, times=times, x_res=25, y_res=25)
+        vmin = coarse.min() if vmin is None else vmin
+        vmax = coarse.max() if vmax is None else vmax
+    renderer_args = dict(env=env, threat_field=threat_field, times=times, path_xy=path_xy, x_res=x_res, y_res=y_res,
+                         vmin=vmin, vmax=vmax, figsize=figsize, dpi=dpi)
+
+    png_folder = None if os.path.splitext(filename)[1] else filename
+    if png_folder is not None:
+        os.makedirs(png_folder, exist_ok=True)
+    tasks = [(start, min(start + frames_per_task, len(times)), png_folder)
+             for start in range(0, len(times), frames_per_task)]
+
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers == 1:
+        _init_renderer(renderer_args)
+        results = map(_render_range, tasks)
+        _write_results(results, png_folder, filename, _renderer, fps, ffmpeg)
+    else:
+        renderer = _FrameRenderer(**renderer_args)  # only used for the frame size
+        with multiprocessing.get_context('spawn').Pool(processes=n_workers, initializer=_init_renderer,
+                                                       initargs=(renderer_args,)) as pool:
+            # imap returns ranges in order, so video frames stream to ffmpeg as they complete
+            _write_results(pool.imap(_render_range, tasks), png_folder, filename, renderer, fps, ffmpeg)
+
+
+def _write_results(results, png_folder, filename, renderer, fps, ffmpeg):
+    if png_folder is not None:
+        for _ in results:
+            pass
+        return
+    encoder = _open_ffmpeg(filename, renderer.width, renderer.height, fps, ffmpeg)
+    try:
+        for frame_bytes in results:
+            encoder.stdin.write(frame_bytes)
+    finally:
+        encoder.stdin.close()
+        encoder.wait()
+    if encoder.returncode != 0:
+        raise RuntimeError("ffmpeg exited with code {0} writing {1}".format(encoder.returncode, filename))
+
+
+def _export_sim(task):
+    """Pool task: export one SimData in this process"""
+    sim, out_folder, path_key, extension, kwargs = task
+    from LatticeSearch import path_nodes
+
+    env, threat_field = sim.load_field()
+    path = sim.paths.get(path_key)
+    if path is None and sim.path_codes.get(path_key) is not None:
+        path = path_nodes(env, sim.load_path(path_key))
+    filename = os.path.join(out_folder, "sim_{0}{1}".format(sim.sim_id, extension))
+    export_animation(env=env, threat_field=threat_field, filename=filename, path=path,
+                     n_workers=1, **kwargs)
+    return filename
+
+
+def export_sims(sim_data, out_folder, path_key="wait", video=True, n_workers=None, **kwargs):
+    """Export an animation per SimData of a DataCollector run (e.g. DataReader().sim_data),
+    one sim per worker process, as out_folder/sim_<sim_id>.mp4 or PNG folders with video=False.
+    path_key picks the path drawn ("wait", "no_wait"), other arguments go to export_animation.
+    Returns the list of files/folders written
+
+    files = export_sims(sim_data=collector.sim_data, out_folder='videos', n_workers=8)"""
+    os.makedirs(out_folder, exist_ok=True)
+    tasks = [(sim, out_folder, path_key, '.mp4' if video else '', kwargs) for sim in sim_data]
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers == 1:
+        return [_export_sim(task) for task in tasks]
+    with multiprocessing.get_context('spawn').Pool(processes=n_workers) as pool:
+        return pool.map(_export_sim, tasks)
@@ -0,0 +1,289 @@
+"""Benchmark suite for search and field evaluation
+
+Sweeps grid size, t_pts, threat count and wait/no-wait and measures throughput, latency
+percentiles and peak RSS of:
+    threat_value, get_neighbors, Astar, TimeAstar and DataCollector file I/O
+
+Results are written as JSON. A stored result file can be used as a baseline, cases whose
+median latency got slower by more than the tolerance are reported as regressions.
+
+python benchmark.py --output bench_baseline.json
+python benchmark.py --output bench_new.json --compare bench_baseline.json --tolerance 0.2
+python benchmark.py --quick   # small sweep for a fast sanity check
+
+Every case runs in a fresh process (unless --no-isolate) so peak RSS is per case. Random
+threat fields are seeded, so repeated runs benchmark identical problems."""
+import argparse
+import itertools
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import tempfile
+from timeit import default_timer
+import numpy as np
+from Threat import GaussThreat, GaussThreatField, GaussDynamicThreatField
+from Environment import XYEnvironment, XYTEnvironment
+from Graph import XYNode, XYTNode, Vertex, Graph
+from Search import Astar, TimeAstar, reconstruct_path
+
+
+FULL_SWEEP = {"grid_pts": [10, 20, 40], "t_pts": [40, 100], "n_threats": [1, 5, 20], "wait": [False, True]}
+QUICK_SWEEP = {"grid_pts": [10], "t_pts": [40], "n_threats": [5], "wait": [False, True]}
+
+
+def make_environment(grid_pts, t_pts, n_threats, seed=0):
+    """Seeded XYTEnvironment with a random dynamic threat field, like generate_wait_go_data"""
+    t_final = 10
+    env = XYTEnvironment(x_size=10, y_size=10, x_pts=grid_pts, y_pts=grid_pts, t_final=t_final, t_pts=t_pts)
+    threat_field = GaussDynamicThreatField(offset=2)
+    threat_field.generate_random_field(env=env, n_threats=n_threats, seed=seed)
+    env.add_threat_field(threat_field)
+    env.exposure_cost = 1
+    env.move_cost = 1
+    env.wait_cost = 0
+    return env
+
+
+def make_static_environment(env):
+    """XYEnvironment with the t = 0 snapshot of env's dynamic threat field, for Astar"""
+    static_env = XYEnvironment(x_size=env.x_size, y_size=env.y_size, x_pts=env.n_grid_x, y_pts=env.n_grid_y)
+    threats = [GaussThreat(location=th.location, shape=th.shape, intensity=th.intensity)
+               for th in env.threat_field.threats]
+    static_env.add_threat_field(GaussThreatField(threats=threats, offset=env.threat_field.offset))
+    return static_env
+
+
+def summarize(latencies, n_items=None):
+    """Throughput and latency percentiles (seconds) of a list of timings.
+    n_items is the number of operations covered by all timings (default one per timing)"""
+    latencies = np.asarray(latencies, dtype=float)
+    total = float(latencies.sum())
+    n_items = n_items if n_items is not None else len(latencies)
+    return {"n": len(latencies), "total": total, "throughput": n_items / total if total > 0 else float('inf'),
+            "p50": float(np.percentile(latencies, 50)), "p90": float(np.percentile(latencies, 90)),
+            "p99": float(np.percentile(latencies, 99)), "max": float(latencies.max())}
+
+
+def bench_threat_value(env, n_calls=2000, seed=0):
+    randstate = np.random.RandomState(seed)
+    xs = randstate.uniform(0, env.x_size, n_calls)
+    ys = randstate.uniform(0, env.y_size, n_calls)
+    ts = randstate.uniform(0, env.t_final, n_calls)
+    threat_value = env.threat_field.threat_value
+    latencies = []
+    for x, y, t in zip(xs, ys, ts):
+        start = default_timer()
+        threat_value(x, y, t)
+        latencies.append(default_timer() - start)
+    return summarize(latencies)
+
+
+def bench_get_neighbors(env, wait, n_calls=2000, seed=0):
+    randstate = np.random.RandomState(seed)
+    nodes = []
+    for gridpt in randstate.randint(0, env.n_grid * env.t_pts, n_calls):
+        pos_x, pos_y, time_idx = env.get_location_from_gridpt(gridpt)
+        nodes.append(XYTNode(node_id=int(gridpt), pos_x=pos_x, pos_y=pos_y, time=time_idx * env.t_sep,
+                             time_idx=time_idx))
+    latencies = []
+    for node in nodes:
+        start = default_timer()
+        env.get_neighbors(node, wait=wait)
+        latencies.append(default_timer() - start)
+    return summarize(latencies)
+
+
+def bench_astar(env, repeats):
+    static_env = make_static_environment(env)
+    latencies = []
+    for _ in range(repeats):
+        graph = Graph(env=static_env)
+        start_vertex = graph.add_vertex(XYNode(node_id=0))
+        goal_x, goal_y = static_env.get_location_from_gridpt(static_env.n_grid - 1)
+        goal_vertex = Vertex(node=XYNode(static_env.n_grid - 1, goal_x, goal_y))
+        start = default_timer()
+        Astar(graph=graph, start_vertex=start_vertex, goal_vertex=goal_vertex)
+        latencies.append(default_timer() - start)
+    return summarize(latencies)
+
+
+def run_time_astar(env, wait):
+    """One TimeAstar search corner to corner inside (0, t_final), returns (goal_vertex_found, graph)"""
+    graph = Graph(env=env)
+    start_vertex = graph.add_vertex(XYTNode(node_id=0))
+    goal_x, goal_y, goal_tidx = env.get_location_from_gridpt(env.n_grid - 1)
+    goal_vertex = Vertex(node=XYTNode(node_id=env.n_grid - 1, pos_x=goal_x, pos_y=goal_y, time_idx=goal_tidx))
+    goal_vertex_found = TimeAstar(graph=graph, start_vertex=start_vertex, goal_vertex=goal_vertex,
+                                  time_window=(0, env.t_final), wait=wait)
+    return goal_vertex_found, graph
+
+
+def bench_time_astar(env, wait, repeats):
+    latencies = []
+    for _ in range(repeats):
+        start = default_timer()
+        run_time_astar(env, wait)
+        latencies.append(default_timer() - start)
+    return summarize(latencies)
+
+
+def bench_data_collector(env, wait, repeats, n_sims=50):
+    """Store, write, read back and decode a DataCollector file of n_sims copies of one search
+    result, paths stored with SimData.store_path (encode_path) and fields with store_field"""
+    from DataManagement import DataCollector, SimData
+    import dill
+
+    goal_vertex_found, _ = run_time_astar(env, wait)
+    path = [goal_vertex_found.node]
+    reconstruct_path(goal_vertex_found, path)
+    path.reverse()
+    path_ids = [node.node_id for node in path]
+    key = "wait" if wait else "no_wait"
+
+    encode_latencies, write_latencies, read_latencies = [], [], []
+    with tempfile.TemporaryDirectory() as tmp_folder:
+        for _ in range(repeats):
+            start = default_timer()
+            sims = []
+            for sim_n in range(n_sims):
+                sim = SimData(sim_n)
+                sim.store_field(env, env.threat_field)
+                sim.store_path(key, env, path_ids)
+                sims.append(sim)
+            encode_latencies.append(default_timer() - start)
+
+            collector = DataCollector(filename='bench', sim_folder='bench')
+            collector.top_data_folder = tmp_folder
+            collector.add_multiple_sims(sims)
+            start = default_timer()
+            collector.write_to_file()
+            write_latencies.append(default_timer() - start)
+
+            the_file = tmp_folder + '/' + collector.sim_sub_folder + 'On' + collector.curr_time + '/' + collector.filename
+            start = default_timer()
+            with open(the_file, 'rb') as f:
+                for sim in dill.load(f):
+                    sim.load_path(key)
+            read_latencies.append(default_timer() - start)
+    return {"encode": summarize(encode_latencies, n_items=n_sims * repeats),
+            "write": summarize(write_latencies, n_items=n_sims * repeats),
+            "read": summarize(read_latencies, n_items=n_sims * repeats)}
+
+
+BENCHMARKS = {
+    "threat_value": lambda env, case: bench_threat_value(env),
+    "get_neighbors": lambda env, case: bench_get_neighbors(env, wait=case["wait"]),
+    "Astar": lambda env, case: bench_astar(env, repeats=case["repeats"]),
+    "TimeAstar": lambda env, case: bench_time_astar(env, wait=case["wait"], repeats=case["repeats"]),
+    "DataCollector": lambda env, case: bench_data_collector(env, wait=case["wait"], repeats=case["repeats"]),
+}
+
+
+def case_name(case):
+    return "{0}/grid={1}/t_pts={2}/threats={3}/wait={4}".format(
+        case["benchmark"], case["grid_pts"], case["t_pts"], case["n_threats"], case["wait"])
+
+
+def run_case(case):
+    """Run a single benchmark case, returns its result dict"""
+    env = make_environment(case["grid_pts"], case["t_pts"], case["n_threats"], seed=case["seed"])
+    result = BENCHMARKS[case["benchmark"]](env, case)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak_rss = peak_rss / 1024
+    return {"case": case, "result": result, "peak_rss_kb": peak_rss}
+
+
+def make_cases(sweep, benchmarks, repeats, seed):
+    """All combinations of the sweep, skipping parameters a benchmark doesn't depend on"""
+    cases = {}
+    for benchmark in benchmarks:
+        for grid_pts, t_pts, n_threats, wait in itertools.product(
+                sweep["grid_pts"], sweep["t_pts"], sweep["n_threats"], sweep["wait"]):
+            if benchmark in ("threat_value", "Astar") and wait:
+                continue  # wait doesn't apply
+            if benchmark in ("Astar", "get_neighbors") and t_pts != sweep["t_pts"][0]:
+                continue  # t_pts doesn't apply
+            if benchmark == "get_neighbors" and n_threats != sweep["n_threats"][0]:
+                continue  # n_threats doesn't apply
+            case = {"benchmark": benchmark, "grid_pts": grid_pts, "t_pts": t_pts, "n_threats": n_threats,
+                    "wait": wait, "repeats": repeats, "seed": seed}
+            cases[case_name(case)] = case
+    return list(cases.values())
+
+
+def run_cases(cases, isolate=True):
+    results = {}
+    for case in cases:
+        if isolate:
+            # fresh process per case, so peak RSS belongs to that case only
+            with multiprocessing.get_context('spawn').Pool(processes=1) as pool:
+                result = pool.apply(run_case, (case,))
+        else:
+            result = run_case(case)
+        results[case_name(case)] = result
+        print("{0:<60} p50 = {1:.3e} s".format(case_name(case), median_latency(result)))
+    return results
+
+
+def median_latency(result):
+    """The number compared against the baseline: median latency (sum of parts for I/O)"""
+    if "p50" in result["result"]:
+        return result["result"]["p50"]
+    return sum(part["p50"] for part in result["result"].values())
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of (case name, baseline p50, new p50, ratio) for cases slower than
+    baseline by more than tolerance (0.2 = 20%)"""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old = median_latency(baseline[name])
+        new = median_latency(result)
+        if old > 0 and new > old * (1 + tolerance):
+            regressions.append((name, old, new, new / old))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default='bench_results.json', help='JSON file for the results')
+    parser.add_argument('--compare', default=None, help='baseline JSON file to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown vs baseline (0.2 = 20%%)')
+    parser.add_argument('--benchmarks', nargs='+', default=list(BENCHMARKS), choices=list(BENCHMARKS))
+    parser.add_argument('--repeats', type=int, default=5, help='searches/writes per search and I/O case')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the random threat fields')
+    parser.add_argument('--quick', action='store_true', help='small sweep for a fast check')
+    parser.add_argument('--no-isolate', action='store_true', help='run all cases in this process')
+    args = parser.parse_args(argv)
+
+    sweep = QUICK_SWEEP if args.quick else FULL_SWEEP
+    cases = make_cases(sweep, args.benchmarks, args.repeats, args.seed)
+    results = run_cases(cases, isolate=not args.no_isolate)
+
+    output = {"meta": {"python": platform.python_version(), "numpy": np.__version__,
+                       "platform": platform.platform(), "sweep": sweep},
+              "results": results}
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=1)
+    print("\nResults written to", args.output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for name, old, new, ratio in regressions:
+            print("REGRESSION {0}: p50 {1:.3e} s -> {2:.3e} s ({3:.2f}x)".format(name, old, new, ratio))
+        if regressions:
+            return 1
+        print("No regressions against", args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""Shared helpers of the pytest tests: seeded environments, nodes and reference searches
+
+from conftest import make_env, make_node, time_astar"""
+
+import copy
+from Threat import GaussDynamicThreatField
+from Environment import XYTEnvironment
+from Graph import XYNode, XYTNode, Vertex, Graph
+from Search import Astar, TimeAstar, reconstruct_path
+
+
+def make_env(seed=0, x_pts=6, y_pts=6, n_threats=5, offset=1, t_final=5, t_pts=20, **costs):
+    """XYTEnvironment over a 10x10 area with a seeded random GaussDynamicThreatField. costs are
+    passed on to XYTEnvironment (exp_cost, wait_cost, move_cost, integrate_exposure)"""
+    env = XYTEnvironment(x_size=10, y_size=10, x_pts=x_pts, y_pts=y_pts, t_final=t_final, t_pts=t_pts, **costs)
+    threat_field = GaussDynamicThreatField(offset=offset)
+    threat_field.generate_random_field(env=env, n_threats=n_threats, seed=seed)
+    env.add_threat_field(threat_field)
+    return env
+
+
+def make_node(env, node_id):
+    """XYTNode (XYNode on an XYEnvironment) of node_id with its position and time filled in"""
+    if hasattr(env, 't_final'):
+        pos_x, pos_y, time_idx = env.get_location_from_gridpt(node_id)
+        return XYTNode(node_id=node_id, pos_x=pos_x, pos_y=pos_y, time=time_idx * env.t_sep, time_idx=time_idx)
+    pos_x, pos_y = env.get_location_from_gridpt(node_id)
+    return XYNode(node_id=node_id, pos_x=pos_x, pos_y=pos_y)
+
+
+def weighted_env(env, exposure_cost, move_cost, wait_cost):
+    """Shallow copy of env with other cost weights"""
+    env = copy.copy(env)
+    env.exposure_cost, env.move_cost, env.wait_cost = exposure_cost, move_cost, wait_cost
+    return env
+
+
+def path_result(goal_vertex_found):
+    """(path_ids, cost) of a search result Vertex, (None, None) for None"""
+    if goal_vertex_found is None:
+        return None, None
+    path = [goal_vertex_found.node]
+    reconstruct_path(goal_vertex_found, path)
+    path.reverse()
+    return [node.node_id for node in path], goal_vertex_found.g_cost
+
+
+def start_vertex(graph, node_id):
+    """The Vertex of node_id in graph, added if the graph doesn't have it yet"""
+    vertex = graph.vert_dict.get(node_id)
+    return vertex if vertex is not None else graph.add_vertex(make_node(graph.env, node_id))
+
+
+def time_astar(env, start_id, goal_id, time_window=None, wait=False, graph=None, **kwargs):
+    """(path_ids, cost) from TimeAstar, on a fresh Graph unless graph is given"""
+    graph = graph if graph is not None else Graph(env=env)
+    goal_vertex = Vertex(node=make_node(env, goal_id))
+    goal_vertex_found = TimeAstar(graph=graph, start_vertex=start_vertex(graph, start_id), goal_vertex=goal_vertex,
+                                  time_window=time_window, wait=wait, **kwargs)
+    return path_result(goal_vertex_found)
+
+
+def astar(env, start_id, goal_id, graph=None, **kwargs):
+    """(path_ids, cost) from Astar, on a fresh Graph unless graph is given"""
+    graph = graph if graph is not None else Graph(env=env)
+    goal_vertex = Vertex(node=make_node(env, goal_id))
+    goal_vertex_found = Astar(graph=graph, start_vertex=start_vertex(graph, start_id), goal_vertex=goal_vertex,
+                              **kwargs)
+    return path_result(goal_vertex_found)
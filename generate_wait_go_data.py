@@ -1,9 +1,10 @@
 from Threat import GaussDynamicThreatField
 from Environment import XYTEnvironment
 from DataManagement import DataCollector, SimData
-from Graph import XYTNode, Vertex, Graph
-from Search import reconstruct_path, TimeAstar
-from timeit import default_timer
+from LatticeSearch import compare_modes
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 def main():
@@ -13,90 +14,61 @@ def main():
     my_collector = DataCollector(filename='test_data', sim_folder='first_test')
 
     for sim_n in range(50):
-        print("--------------------------------------------------------------------")
-        print("Sim ", sim_n)
+        logger.info("--------------------------------------------------------------------")
+        logger.info("Sim %s", sim_n)
         threat_field = GaussDynamicThreatField(offset=2)
         threat_field.generate_random_field(env=env, n_threats=None, fixed_shape=False,
                                        fixed_intensity=False, fixed_location=False)
         env.add_threat_field(threat_field)
-        print("\nEnv.threat_field: ", env.threat_field)
-
-        # Use first node in the environment as start node
-        start_x, start_y, tidx0 = env.get_location_from_gridpt(0)
-        start_node = XYTNode(node_id=0, pos_x=start_x, pos_y=start_y, time_idx=tidx0)
+        logger.info("Env.threat_field: %s", env.threat_field)
 
-        # Use last node in environment as goal node
-        goal_x, goal_y, goal_tidx = env.get_location_from_gridpt(env.n_grid - 1)
-        goal_node = XYTNode(node_id=env.n_grid - 1, pos_x=goal_x, pos_y=goal_y, time_idx=goal_tidx)
+        # Use first node in the environment as start node, last node as goal node
+        start_id = 0
+        goal_id = env.n_grid - 1
 
         time_window = (0, t_final)
-        print("time window = ", time_window)
+        logger.info("time window = %s", time_window)
 
         # Assign Exposure, Movement, Waiting Costs
         env.exposure_cost = 1
         env.move_cost = 1
         env.wait_cost = 0
 
-        # ------------------------- Waiting Search Setup ------------------------------------------
-        # Create the Graph based on our environment
-        graph_wait = Graph(env=env)
-
-        # Add a start vertex to the graph to begin the search at. Add goal vertex for search
-        graph_wait.add_vertex(start_node)
-        start_vertex = graph_wait.get_vertex(start_node)
-        goal_vertex = Vertex(node=goal_node)
-
-        print("\nRun A* Waiting search")
-        start_wait = default_timer()
-        goal_vertex_wait = TimeAstar(graph=graph_wait, start_vertex=start_vertex, goal_vertex=goal_vertex,
-                                     time_window=time_window, wait=True)
-        wait_time = default_timer() - start_wait
-        print("A*-Wait finished in ", wait_time, " seconds")
-        path_wait = [goal_vertex_wait.node]
-        reconstruct_path(goal_vertex_wait, path_wait)
-        path_wait.reverse()
-
-        # ------------------------- No-Waiting Search section --------------------------------------------
-        print("\nRun A* No-Waiting search")
-        graph_nowait = Graph(env=env)
-        graph_nowait.add_vertex(start_node)
-        start_vertex_nw = graph_nowait.get_vertex(start_node)
-        goal_vertex_nw = Vertex(node=goal_node)
-
-        start_nowait = default_timer()
-        goal_vertex_nowait = TimeAstar(graph=graph_nowait, start_vertex=start_vertex_nw, goal_vertex=goal_vertex_nw,
-                                       time_window=time_window, wait=False)
-        nowait_time = default_timer() - start_nowait
-        print("A*-NoWait finished in ", nowait_time, " seconds")
-        path_nowait = [goal_vertex_nowait.node]
-        reconstruct_path(goal_vertex_nowait, path_nowait)
-        path_nowait.reverse()
+        # ------------------------- Waiting and No-Waiting searches ---------------------------------
+        # Both modes share one baked threat tensor and run concurrently when they can
+        logger.info("Run A* Waiting and No-Waiting searches")
+        threat = env.bake_threat_values()
+        results = compare_modes(env=env, start_id=start_id, goal_id=goal_id, time_window=time_window,
+                                threat=threat)
+        path_ids_wait, cost_wait = results["wait"]
+        path_ids_nowait, cost_nowait = results["no_wait"]
+        stats_wait = results["stats"]["wait"]
+        stats_nowait = results["stats"]["no_wait"]
+        wait_time = stats_wait.time_total
+        nowait_time = stats_nowait.time_total
+        logger.info("A*-Wait finished in %s seconds", wait_time)
+        logger.info("A*-NoWait finished in %s seconds", nowait_time)
 
         # Store simulation data and add to data collector
         nsim_data = SimData(sim_n)
-        nsim_data.path_costs["wait"] = goal_vertex_wait.g_cost
-        nsim_data.path_costs["no_wait"] = goal_vertex_nowait.g_cost
-        nsim_data.paths["wait"] = path_wait
-        nsim_data.paths["no_wait"] = path_nowait
+        nsim_data.path_costs["wait"] = cost_wait
+        nsim_data.path_costs["no_wait"] = cost_nowait
+        nsim_data.store_path("wait", env, path_ids_wait)
+        nsim_data.store_path("no_wait", env, path_ids_nowait)
         nsim_data.compute_time["wait"] = wait_time
         nsim_data.compute_time["no_wait"] = nowait_time
-        nsim_data.env_data["n_threats"] = threat_field.n_threats
-        nsim_data.env_data["x_size"] = env.x_size
-        nsim_data.env_data["y_size"] = env.y_size
-        nsim_data.env_data["x_pts"] = env.n_grid_x
-        nsim_data.env_data["y_pts"] = env.n_grid_y
-        nsim_data.env_data["t_final"] = t_final
-        nsim_data.env_data["t_pts"] = env.t_pts
-        nsim_data.env_data["exposure_cost"] = env.exposure_cost
-        nsim_data.env_data["move_cost"] = env.move_cost
-        nsim_data.env_data["wait_cost"] = env.wait_cost
-        nsim_data.threats = threat_field.threats
+        nsim_data.num_nodes_gen["wait"] = stats_wait.nodes_generated
+        nsim_data.num_nodes_gen["no_wait"] = stats_nowait.nodes_generated
+        nsim_data.search_stats["wait"] = stats_wait.as_dict()
+        nsim_data.search_stats["no_wait"] = stats_nowait.as_dict()
+        nsim_data.store_field(env, threat_field)
 
         my_collector.add_sim(nsim_data)
         # End of current simulation
     my_collector.write_to_file()
-    print("\nDone with simulation runs!!")
+    logger.info("Done with simulation runs!!")
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     main()
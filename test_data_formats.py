@@ -0,0 +1,148 @@
+"""Tests of the binary threat field format and the path codec, run with pytest"""
+
+import pickle
+import numpy as np
+import pytest
+from conftest import make_env
+from Threat import GaussThreat, GaussThreatField, GaussDynamicThreatField
+from Environment import XYEnvironment
+from Graph import XYNode, XYTNode
+from DataManagement import SimData, FieldArchive, pack_fields, write_fields, encode_path, decode_path
+
+# every cost weight and flag set, so the environment round trip checks them all
+ENV_ARGS = dict(seed=7, x_pts=8, n_threats=6, offset=1.5, exp_cost=2, wait_cost=0.5, move_cost=1,
+                integrate_exposure=True)
+
+
+def static_field():
+    return GaussThreatField(threats=[GaussThreat(location=(2, 3), shape=(1, 0.5), intensity=4),
+                                     GaussThreat(location=(7, 7), shape=(0.8, 0.8), intensity=2)], offset=0.5)
+
+
+def test_fields_round_trip():
+    env = make_env(**ENV_ARGS)
+    fields = [env.threat_field, static_field(), GaussDynamicThreatField(offset=3)]
+    archive = FieldArchive(pack_fields(fields, env=env))
+    assert len(archive) == 3
+    for index, threat_field in enumerate(fields):
+        loaded = archive.field(index)
+        assert type(loaded) is type(threat_field)
+        assert loaded == threat_field
+        assert len(archive.threats(index)) == threat_field.n_threats
+    xs, ys = np.meshgrid(np.linspace(0, 10, 7), np.linspace(0, 10, 5))
+    assert np.array_equal(archive.field(0).threat_values(xs, ys, 1.25), env.threat_field.threat_values(xs, ys, 1.25))
+    assert archive.field_key(0) != archive.field_key(1)
+    assert FieldArchive(pack_fields([static_field()])).field_key(0) == archive.field_key(1)
+
+
+def test_environment_round_trip(tmp_path):
+    env = make_env(**ENV_ARGS)
+    filename = str(tmp_path / 'fields.bin')
+    write_fields(filename, [env.threat_field], env=env)
+    archive = FieldArchive.open(filename)
+    loaded = archive.environment()
+    for name in ('x_size', 'y_size', 'n_grid_x', 'n_grid_y', 't_final', 't_pts', 'exposure_cost', 'wait_cost',
+                 'move_cost', 'integrate_exposure'):
+        assert getattr(loaded, name) == getattr(env, name)
+    assert archive.field(0) == env.threat_field
+
+    xy_env = XYEnvironment(x_size=10, y_size=5, x_pts=4, y_pts=3)
+    assert isinstance(FieldArchive(pack_fields([static_field()], env=xy_env)).environment(), XYEnvironment)
+    assert FieldArchive(pack_fields([static_field()])).environment() is None
+
+
+def test_rejects_other_buffers():
+    blob = bytearray(pack_fields([static_field()]))
+    blob[:4] = b'XXXX'
+    with pytest.raises(ValueError):
+        FieldArchive(bytes(blob))
+
+
+def test_sim_data_field():
+    env = make_env(**ENV_ARGS)
+    sim = SimData(0)
+    sim.store_field(env, env.threat_field)
+    assert sim.threats is None
+    loaded_env, threat_field = sim.load_field()
+    assert threat_field == env.threat_field and loaded_env.threat_field is threat_field
+    assert (loaded_env.n_grid, loaded_env.t_pts) == (env.n_grid, env.t_pts)
+
+
+def random_path(env, n_steps, seed):
+    """node_ids of a random walk on the lattice of env, waits included, staying on the grid"""
+    randstate = np.random.RandomState(seed)
+    moves = ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1))
+    x, y = env.n_grid_x // 2, env.n_grid_y // 2
+    layer = int(hasattr(env, 't_final'))
+    path_ids = [x + y * env.n_grid_x]
+    while len(path_ids) <= n_steps:
+        dx, dy = moves[randstate.randint(layer == 0, 5)]  # XYEnvironment paths have no waits
+        if 0 <= x + dx < env.n_grid_x and 0 <= y + dy < env.n_grid_y:
+            x, y = x + dx, y + dy
+            path_ids.append(len(path_ids) * layer * env.n_grid + x + y * env.n_grid_x)
+    return path_ids
+
+
+@pytest.mark.parametrize("n_steps", [0, 1, 7, 8, 9, 100])
+def test_path_round_trip(n_steps):
+    env = make_env(**ENV_ARGS)
+    path_ids = random_path(env, n_steps, seed=n_steps)
+    code = encode_path(env, path_ids)
+    assert len(code) == 12 + (3 * n_steps + 7) // 8
+    assert decode_path(env.n_grid_x, env.n_grid, code).tolist() == path_ids
+    assert encode_path(env, [XYTNode(node_id=node_id) for node_id in path_ids]) == code
+
+    xy_env = XYEnvironment(x_size=10, y_size=10, x_pts=8, y_pts=6)
+    xy_path_ids = random_path(xy_env, n_steps, seed=n_steps)
+    xy_code = encode_path(xy_env, [XYNode(node_id=node_id) for node_id in xy_path_ids])
+    assert decode_path(xy_env.n_grid_x, 0, xy_code).tolist() == xy_path_ids
+
+
+def test_path_rejects_non_lattice_steps():
+    env = make_env(**ENV_ARGS)
+    with pytest.raises(ValueError):
+        encode_path(env, [0, env.n_grid + 2])
+    with pytest.raises(ValueError):
+        encode_path(env, [env.n_grid, env.n_grid + 1])  # no layer advance
+
+
+def test_sim_data_paths():
+    env = make_env(**ENV_ARGS)
+    path_ids = random_path(env, 30, seed=1)
+    sim = SimData(0)
+    sim.store_field(env, env.threat_field)
+    sim.store_path("wait", env, path_ids)
+    sim.store_path("no_wait", env, None)
+    assert sim.load_path("wait").tolist() == path_ids
+    assert sim.load_path("no_wait") is None
+
+
+def test_sim_data_paths_without_field():
+    env = make_env(**ENV_ARGS)
+    xy_env = XYEnvironment(x_size=10, y_size=10, x_pts=5, y_pts=9)
+    path_ids, xy_path_ids = random_path(env, 30, seed=3), random_path(xy_env, 30, seed=4)
+    sim = SimData(0)
+    sim.store_path("wait", env, path_ids)
+    sim.store_path("no_wait", xy_env, xy_path_ids)
+    sim = pickle.loads(pickle.dumps(sim))
+    assert sim.load_path("wait").tolist() == path_ids
+    assert sim.load_path("no_wait").tolist() == xy_path_ids
+
+
+def old_sim_data(env):
+    """SimData as pickled before field_bytes, path_codes and path_grids existed, threats stored as objects"""
+    sim = SimData(0)
+    sim.store_field(env, env.threat_field)
+    sim.threats = env.threat_field.threats
+    sim.paths["wait"] = [XYTNode(node_id=node_id) for node_id in random_path(env, 10, seed=2)]
+    del sim.field_bytes, sim.path_codes, sim.path_grids
+    return pickle.loads(pickle.dumps(sim))
+
+
+def test_old_sim_data_pickle():
+    env = make_env(**ENV_ARGS)
+    sim = old_sim_data(env)
+    loaded_env, threat_field = sim.load_field()
+    assert threat_field == env.threat_field
+    assert sim.load_path("wait").tolist() == random_path(env, 10, seed=2)
+    assert sim.load_path("no_wait") is None
@@ -0,0 +1,88 @@
+"""Tests of GoalSet time windows and TimeAstar goal membership, run with pytest"""
+
+import math
+import numpy as np
+import pytest
+from conftest import make_env, time_astar
+from Search import GoalSet, GOAL_BITMAP_LAYERS
+
+
+def test_window_covers_only_its_layers():
+    env = make_env(n_threats=4, move_cost=1)
+    goal_set = GoalSet(env=env)
+    goal_set.add_location(gridpt=7, time_window=(1, 2))
+    assert goal_set.first_layer == 4 and goal_set.last_layer == 8
+    assert len(goal_set.bitmap) == 5 * env.n_grid
+    assert all(time_idx * env.n_grid + 7 in goal_set for time_idx in range(4, 9))
+    assert 3 * env.n_grid + 7 not in goal_set and 9 * env.n_grid + 7 not in goal_set
+    assert list(goal_set.goal_cells()) == [7]
+
+
+def test_window_past_t_final():
+    env = make_env(n_threats=4, move_cost=1)
+    unbounded = GoalSet(env=env)
+    unbounded.add_location(gridpt=7, time_window=(env.t_final + 1, env.t_final + 2))
+    assert unbounded.first_layer == env.t_pts + 4 and unbounded.last_layer == env.t_pts + 8
+
+    bounded = GoalSet(env=env, n_layers=env.t_pts + 1)
+    bounded.add_location(gridpt=7, time_window=(env.t_final - 0.5, env.t_final + 2))
+    assert bounded.first_layer == env.t_pts - 2 and bounded.last_layer == env.t_pts
+    bounded.add_location(gridpt=8, time_window=(env.t_final + 1, env.t_final + 2))
+    assert bounded.last_layer == env.t_pts and 8 not in bounded.goal_cells()
+
+
+def test_node_bitmap_clips_to_nodes():
+    env = make_env(n_threats=4, move_cost=1)
+    goal_set = GoalSet(env=env)
+    goal_set.add_location(gridpt=7, time_window=(env.t_final - 0.25, env.t_final + 1))
+    n_nodes = env.n_grid * (env.t_pts + 1)
+    bits = goal_set.node_bitmap(n_nodes)
+    assert len(bits) == n_nodes
+    assert [int(node_id) for node_id in bits.nonzero()[0]] == [(env.t_pts - 1) * env.n_grid + 7,
+                                                               env.t_pts * env.n_grid + 7]
+
+
+def test_time_astar_window_past_t_final():
+    env = make_env(n_threats=4, move_cost=1)
+    goal_id = env.n_grid - 1
+    time_window = (env.t_final + 1, env.t_final + 2)
+    path_ids, _ = time_astar(env, 0, goal_id, time_window, wait=True)
+    assert path_ids is not None and path_ids[-1] % env.n_grid == goal_id
+    assert time_window[0] <= path_ids[-1] // env.n_grid * env.t_sep <= time_window[1]
+
+
+def test_open_ended_window():
+    env = make_env(n_threats=4, move_cost=1)
+    goal_set = GoalSet(env=env)
+    goal_set.add_location(gridpt=7, time_window=(1, math.inf))
+    assert len(goal_set.bitmap) == 0 and goal_set.last_layer == math.inf
+    assert 3 * env.n_grid + 7 not in goal_set
+    assert all(time_idx * env.n_grid + 7 in goal_set for time_idx in (4, 5, env.t_pts, 10 ** 6))
+    assert list(goal_set.goal_cells()) == [7]
+    goal_set.discard(5 * env.n_grid + 7)
+    assert 5 * env.n_grid + 7 not in goal_set and 6 * env.n_grid + 7 in goal_set
+    bits = goal_set.node_bitmap(env.n_grid * (env.t_pts + 1))
+    assert [int(node_id) for node_id in bits.nonzero()[0]] == [time_idx * env.n_grid + 7
+                                                               for time_idx in range(4, env.t_pts + 1) if time_idx != 5]
+
+
+def test_wide_window_matches_layers():
+    env = make_env(n_threats=4, move_cost=1)
+    time_window = (0.3, (GOAL_BITMAP_LAYERS + 40) * env.t_sep)
+    goal_set = GoalSet(env=env)
+    goal_set.add_location(gridpt=7, time_window=time_window)
+    assert len(goal_set.bitmap) == 0 and goal_set.windows == {7: [(2, GOAL_BITMAP_LAYERS + 40)]}
+    n_layers = GOAL_BITMAP_LAYERS + 50
+    expected = [time_idx * env.n_grid + 7 for time_idx in range(n_layers)
+                if time_window[0] <= time_idx * env.t_sep <= time_window[1]]
+    assert [node_id for node_id in range(n_layers * env.n_grid) if node_id in goal_set] == expected
+    assert np.flatnonzero(goal_set.node_bitmap(n_layers * env.n_grid)).tolist() == expected
+
+
+@pytest.mark.parametrize("prune", [False, True])
+def test_time_astar_open_ended_window(prune):
+    env = make_env(n_threats=4, move_cost=1, wait_cost=0.1)
+    goal_id = env.n_grid - 1
+    path_ids, cost = time_astar(env, 0, goal_id, (0, math.inf), wait=True, prune=prune)
+    expected_ids, expected = time_astar(env, 0, goal_id, (0, 3 * env.t_final), wait=True)  # bitmap window
+    assert path_ids == expected_ids and cost == pytest.approx(expected, rel=1e-12)
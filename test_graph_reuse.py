@@ -0,0 +1,56 @@
+"""Tests of searches on a reused Graph (search epochs) against fresh Graphs, and of CompactVertex, run with pytest"""
+
+import pytest
+from conftest import make_env, make_node, start_vertex, path_result, astar, time_astar
+from Threat import GaussThreatField
+from Environment import XYEnvironment
+from Graph import Vertex, Graph, CompactGraph
+from Search import MultiGoalTimeAstar
+
+
+@pytest.mark.parametrize("graph_class", [Graph, CompactGraph])
+def test_time_searches_on_one_graph(graph_class):
+    env = make_env(2, move_cost=1, wait_cost=0.2)
+    graph = graph_class(env=env)
+    window = (1, env.t_final)
+    searches = [(0, env.n_grid - 1, window, False, {}),
+                (5, 30, window, True, {}),
+                (0, env.n_grid - 1, window, False, {}),  # successors were cached with waits
+                (14, 3, (2, 4), True, {"prune": True}),
+                (0, 10 * env.n_grid + 21, None, True, {}),
+                (7, env.n_grid - 1, window, False, {"prune": True})]
+    for start_id, goal_id, time_window, wait, kwargs in searches:
+        result = time_astar(env, start_id, goal_id, time_window, wait, graph=graph, **kwargs)
+        assert result == time_astar(env, start_id, goal_id, time_window, wait, graph=graph_class(env=env), **kwargs)
+        assert result[0] is not None
+
+    env.move_cost, env.wait_cost = 0.3, 1  # reuse after a cost change
+    assert (time_astar(env, 0, env.n_grid - 1, window, True, graph=graph) ==
+            time_astar(env, 0, env.n_grid - 1, window, True))
+
+    goal_ids = [env.n_grid - 1, 20, 9]
+    goals_found = MultiGoalTimeAstar(graph=graph, start_vertex=start_vertex(graph, 4),
+                                     goal_vertices=[Vertex(node=make_node(env, goal_id)) for goal_id in goal_ids],
+                                     time_window=window, wait=True)
+    for goal_id in goal_ids:
+        assert path_result(goals_found[goal_id]) == time_astar(env, 4, goal_id, window, True)
+
+
+def test_astar_searches_on_one_graph():
+    env = XYEnvironment(x_size=10, y_size=10, x_pts=8, y_pts=8)
+    env.add_threat_field(GaussThreatField(threats=make_env(1).threat_field.threats, offset=1))
+    graph = Graph(env=env)
+    for start_id, goal_id, jump_tol in [(0, 63, None), (63, 0, 0.05), (9, 50, None), (0, 63, None), (40, 7, 0.2)]:
+        result = astar(env, start_id, goal_id, graph=graph, jump_tol=jump_tol)
+        assert result == astar(env, start_id, goal_id, jump_tol=jump_tol)
+
+
+def test_compact_vertex_slots():
+    env = make_env(0)
+    graph = CompactGraph(env=env)
+    vertex = graph.add_vertex(make_node(env, 0))
+    other = graph.add_vertex(make_node(env, env.n_grid + 1))
+    graph.add_edge(vertex.node, other.node, 2.0)
+    assert not hasattr(vertex, '__dict__')
+    assert 'neighbors' not in {slot for cls in type(vertex).__mro__ for slot in getattr(cls, '__slots__', ())}
+    assert vertex.neighbors == (other,) and vertex.get_neighbor_cost(other) == 2.0
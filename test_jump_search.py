@@ -0,0 +1,44 @@
+"""Tests of Astar with jump_tol (jump_expand) against plain Astar, run with pytest"""
+
+import numpy as np
+import pytest
+from conftest import astar
+from Threat import GaussThreat, GaussThreatField
+from Environment import XYEnvironment
+
+
+def random_env(seed, amplitude, x_pts=12, y_pts=9):
+    """XYEnvironment with a few random Gaussian threats of intensity up to amplitude on offset 1"""
+    randstate = np.random.RandomState(seed)
+    env = XYEnvironment(x_size=10, y_size=10, x_pts=x_pts, y_pts=y_pts)
+    threats = [GaussThreat(location=tuple(randstate.uniform(0, 10, 2)), shape=tuple(randstate.uniform(0.5, 2, 2)),
+                           intensity=randstate.uniform(-1, 1) * amplitude) for _ in range(5)]
+    env.add_threat_field(GaussThreatField(threats=threats, offset=1))
+    return env
+
+
+def start_goal(env, seed):
+    return tuple(int(node_id) for node_id in np.random.RandomState(100 + seed).randint(env.n_grid, size=2))
+
+
+@pytest.mark.parametrize("seed", range(6))
+@pytest.mark.parametrize("amplitude", [5, 0.05])
+def test_zero_tolerance_is_plain_astar(seed, amplitude):
+    env = random_env(seed, amplitude)
+    start_id, goal_id = start_goal(env, seed)
+    assert astar(env, start_id, goal_id, jump_tol=0) == astar(env, start_id, goal_id)
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_cost_bound_on_flat_field(seed):
+    env = random_env(seed, 0.05)
+    start_id, goal_id = start_goal(env, seed)
+    values = [env.threat_field.threat_value(*env.get_location_from_gridpt(node_id)) for node_id in range(env.n_grid)]
+    jump_tol = 1.5 * (max(values) - min(values))  # every cell is flat
+    path_ids, cost = astar(env, start_id, goal_id, jump_tol=jump_tol)
+    _, expected = astar(env, start_id, goal_id)
+    n_steps = (abs(start_id % env.n_grid_x - goal_id % env.n_grid_x) +
+               abs(start_id // env.n_grid_x - goal_id // env.n_grid_x))
+    assert path_ids[0] == start_id and path_ids[-1] == goal_id
+    assert len(path_ids) - 1 == n_steps
+    assert expected <= cost + 1e-12 and cost < expected + jump_tol * n_steps + 1e-12
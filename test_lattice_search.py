@@ -0,0 +1,67 @@
+"""Tests of LatticeTimeAstar against TimeAstar on seeded random fields, run with pytest"""
+
+import numpy as np
+import pytest
+from conftest import make_env, time_astar
+from LatticeSearch import LatticeTimeAstar, path_cost
+
+SEEDS = range(4)
+ENV_ARGS = dict(x_pts=8, y_pts=8, move_cost=1, wait_cost=0.2)
+
+
+def check_path(env, path_ids, cost, threat):
+    """path_ids is a lattice path, one layer per step, that costs cost"""
+    steps = np.diff(path_ids) - env.n_grid
+    assert set(steps.tolist()) <= {0, 1, -1, env.n_grid_x, -env.n_grid_x}
+    assert path_cost(env, path_ids, threat) == pytest.approx(cost, rel=1e-9)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("wait", [True, False])
+def test_time_window_matches_time_astar(seed, wait):
+    env = make_env(seed, **ENV_ARGS)
+    threat = env.bake_threat_values()
+    goal_id = env.n_grid - 1
+    time_window = (2, env.t_final)
+    _, expected_cost = time_astar(env, 0, goal_id, time_window, wait)
+    path_ids, cost = LatticeTimeAstar(env=env, start_id=0, goal_id=goal_id, time_window=time_window, wait=wait,
+                                      threat=threat, use_numba=False)
+    assert cost == pytest.approx(expected_cost, rel=1e-9)
+    assert path_ids[-1] % env.n_grid == goal_id and time_window[0] <= path_ids[-1] // env.n_grid * env.t_sep
+    check_path(env, path_ids, cost, threat)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_exact_goal_matches_time_astar(seed):
+    env = make_env(seed, **ENV_ARGS)
+    threat = env.bake_threat_values()
+    goal_id = 15 * env.n_grid + env.n_grid - 1
+    _, expected_cost = time_astar(env, 3, goal_id, None, True)
+    path_ids, cost = LatticeTimeAstar(env=env, start_id=3, goal_id=goal_id, wait=True, threat=threat, use_numba=False)
+    assert cost == pytest.approx(expected_cost, rel=1e-9)
+    assert path_ids[0] == 3 and path_ids[-1] == goal_id
+    check_path(env, path_ids, cost, threat)
+
+    # the array path taken with a heuristic finds the same cost
+    heuristic = np.zeros(threat.size)
+    path_ids, cost = LatticeTimeAstar(env=env, start_id=3, goal_id=goal_id, wait=True, threat=threat,
+                                      use_numba=False, heuristic=heuristic)
+    assert cost == pytest.approx(expected_cost, rel=1e-9)
+
+
+def test_goal_past_baked_layers():
+    env = make_env(0, **ENV_ARGS)
+    path_ids, cost = LatticeTimeAstar(env=env, start_id=0, goal_id=env.n_grid - 1,
+                                      time_window=(env.t_final + 1, env.t_final + 2), wait=True, use_numba=False)
+    assert path_ids is None and cost is None
+
+
+@pytest.mark.parametrize("wait", [True, False])
+def test_numba_matches_python(wait):
+    pytest.importorskip("numba")
+    env = make_env(1, **ENV_ARGS)
+    threat = env.bake_threat_values()
+    kwargs = dict(env=env, start_id=0, goal_id=env.n_grid - 1, time_window=(2, env.t_final), wait=wait, threat=threat)
+    _, cost = LatticeTimeAstar(use_numba=False, **kwargs)
+    _, numba_cost = LatticeTimeAstar(use_numba=True, **kwargs)
+    assert numba_cost == pytest.approx(cost, rel=1e-12)
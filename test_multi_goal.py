@@ -0,0 +1,54 @@
+"""Tests of MultiGoalAstar and MultiGoalTimeAstar against single-goal searches, run with pytest"""
+
+import pytest
+from conftest import make_env, make_node, start_vertex, astar, time_astar
+from Threat import GaussThreatField
+from Environment import XYEnvironment
+from Graph import Vertex, Graph
+from Search import MultiGoalAstar, MultiGoalTimeAstar, reconstruct_paths
+
+
+def multi_goal_results(search, env, start_id, goal_ids, **kwargs):
+    """goal node_id -> (path_ids, cost) of one MultiGoal search, (None, None) for goals not found"""
+    graph = Graph(env=env)
+    goals_found = search(graph=graph, start_vertex=start_vertex(graph, start_id),
+                         goal_vertices=[Vertex(node=make_node(env, goal_id)) for goal_id in goal_ids], **kwargs)
+    paths = reconstruct_paths(goals_found)
+    assert set(paths) == set(goal_ids)
+    return {goal_id: (None, None) if paths[goal_id] is None else
+            ([node.node_id for node in paths[goal_id]], goals_found[goal_id].g_cost) for goal_id in goal_ids}
+
+
+def assert_same_results(results, expected):
+    for goal_id, (expected_ids, expected_cost) in expected.items():
+        path_ids, cost = results[goal_id]
+        assert path_ids == expected_ids
+        assert cost == pytest.approx(expected_cost, rel=1e-12) if cost is not None else expected_cost is None
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_multi_goal_astar(seed):
+    time_env = make_env(seed)
+    env = XYEnvironment(x_size=10, y_size=10, x_pts=8, y_pts=8)
+    env.add_threat_field(GaussThreatField(threats=time_env.threat_field.threats, offset=1))
+    goal_ids = [env.n_grid - 1, 7, 27, 0, 40]
+    results = multi_goal_results(MultiGoalAstar, env, 9, goal_ids + [env.n_grid + 3])
+    assert_same_results(results, {goal_id: astar(env, 9, goal_id) for goal_id in goal_ids})
+    assert results[env.n_grid + 3] == (None, None)  # off the grid
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("wait", [True, False])
+def test_multi_goal_time_astar_window(seed, wait):
+    env = make_env(seed, move_cost=1, wait_cost=0.2)
+    goal_ids = [env.n_grid - 1, 5, 20, 30]
+    time_window = (1, env.t_final)
+    results = multi_goal_results(MultiGoalTimeAstar, env, 0, goal_ids, time_window=time_window, wait=wait)
+    assert_same_results(results, {goal_id: time_astar(env, 0, goal_id, time_window, wait) for goal_id in goal_ids})
+
+
+def test_multi_goal_time_astar_nodes():
+    env = make_env(1, move_cost=1, wait_cost=0.2)
+    goal_ids = [12 * env.n_grid + env.n_grid - 1, 9 * env.n_grid + 3, 6 * env.n_grid + 14]
+    results = multi_goal_results(MultiGoalTimeAstar, env, 0, goal_ids, wait=True)
+    assert_same_results(results, {goal_id: time_astar(env, 0, goal_id, wait=True) for goal_id in goal_ids})
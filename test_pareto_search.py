@@ -0,0 +1,48 @@
+"""Tests of ParetoTimeSearch and best_weighted against weighted TimeAstar, run with pytest"""
+
+import pytest
+from conftest import make_env, time_astar, weighted_env
+from LatticeSearch import ParetoTimeSearch, best_weighted, path_cost
+
+WEIGHTS = [(1, 0, 0), (1, 1, 0), (1, 0.3, 0.5), (0.2, 2, 1)]
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("wait", [True, False])
+def test_best_weighted_matches_time_astar(seed, wait):
+    env = make_env(seed, offset=0.5)
+    threat = env.bake_threat_values()
+    goal_id = env.n_grid - 1
+    time_window = (2, env.t_final)
+    front = ParetoTimeSearch(env=env, start_id=0, goal_id=goal_id, time_window=time_window, wait=wait,
+                             threat=threat)
+    assert front
+    for weights in WEIGHTS:
+        path_ids, cost = best_weighted(front, *weights)
+        _, expected = time_astar(weighted_env(env, *weights), 0, goal_id, time_window, wait)
+        assert cost == pytest.approx(expected, rel=1e-9)
+        assert path_cost(weighted_env(env, *weights), path_ids, threat) == pytest.approx(cost, rel=1e-9)
+
+
+def test_front_is_pareto_optimal():
+    env = make_env(1, offset=0.5)
+    threat = env.bake_threat_values()
+    front = ParetoTimeSearch(env=env, start_id=0, goal_id=env.n_grid - 1, time_window=(2, env.t_final),
+                             threat=threat)
+    objectives = [(entry["exposure"], entry["distance"], entry["time"]) for entry in front]
+    assert [entry["time"] for entry in front] == sorted(entry["time"] for entry in front)
+    for entry, (exposure, distance, time) in zip(front, objectives):
+        path_ids = entry["path_ids"]
+        assert path_ids[0] == 0 and path_ids[-1] % env.n_grid == env.n_grid - 1
+        assert time == pytest.approx((len(path_ids) - 1) * env.t_sep)
+        assert path_cost(weighted_env(env, 1, 0, 0), path_ids, threat) == pytest.approx(exposure, rel=1e-9)
+        assert path_cost(weighted_env(env, 0, 1, 0), path_ids, threat) == pytest.approx(distance, rel=1e-9)
+        assert not any(other != (exposure, distance, time) and
+                       other[0] <= exposure and other[1] <= distance and other[2] <= time
+                       for other in objectives)
+
+
+def test_unreachable_goal():
+    env = make_env(0, offset=0.5)
+    assert ParetoTimeSearch(env=env, start_id=0, goal_id=env.n_grid - 1, time_window=(0, 0.5)) == []
+    assert best_weighted([], 1, 1, 1) == (None, None)
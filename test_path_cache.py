@@ -0,0 +1,38 @@
+"""Tests of PathCache hits, misses and failed searches, run with pytest"""
+
+from conftest import make_env, make_node
+from Threat import GaussThreat, GaussThreatField
+from Environment import XYEnvironment
+from Graph import XYNode
+from PathCache import PathCache
+
+
+def make_xy_env():
+    env = XYEnvironment(x_size=10, y_size=10, x_pts=6, y_pts=6)
+    env.add_threat_field(GaussThreatField(threats=[GaussThreat(location=(4, 4), shape=(1, 1), intensity=5)],
+                                          offset=1))
+    return env
+
+
+def test_hit_returns_the_cached_path():
+    env = make_env(n_threats=4, move_cost=1)
+    cache = PathCache()
+    start_node, goal_node = make_node(env, 0), make_node(env, env.n_grid - 1)
+    path, cost = cache.time_astar(env=env, start_node=start_node, goal_node=goal_node,
+                                  time_window=(0, env.t_final), wait=True)
+    cached_path, cached_cost = cache.time_astar(env=env, start_node=start_node, goal_node=goal_node,
+                                                time_window=(0, env.t_final), wait=True)
+    assert [node.node_id for node in cached_path] == [node.node_id for node in path] and cached_cost == cost
+    cached_path.pop()  # callers get a copy, the cached path is untouched
+    assert len(cache.time_astar(env=env, start_node=start_node, goal_node=goal_node,
+                                time_window=(0, env.t_final), wait=True)[0]) == len(path)
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (2, 1)
+
+
+def test_repeated_failed_search():
+    env = make_xy_env()
+    cache = PathCache()
+    start_node, off_grid = make_node(env, 0), XYNode(node_id=env.n_grid + 5, pos_x=20, pos_y=20)
+    assert cache.astar(env=env, start_node=start_node, goal_node=off_grid) == (None, None)
+    assert cache.astar(env=env, start_node=start_node, goal_node=off_grid) == (None, None)
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
@@ -0,0 +1,72 @@
+"""Tests of ReservationTable and PrioritizedTimeAstar, run with pytest"""
+
+import pytest
+from conftest import make_env
+from Search import ReservationTable
+from LatticeSearch import PrioritizedTimeAstar, LatticeTimeAstar
+
+ENV_ARGS = dict(move_cost=1, wait_cost=0.2)
+# corners to opposite corners, and two neighbors trading cells
+START_IDS = [0, 35, 5, 30, 14, 15]
+GOAL_CELLS = [35, 0, 30, 5, 15, 14]
+
+
+def cells_by_layer(env, path_ids):
+    """Cell of an agent at every time layer 0..t_pts, parked at its goal after arriving"""
+    cells = {path_id // env.n_grid: path_id % env.n_grid for path_id in path_ids}
+    return [cells.get(time_idx, path_ids[-1] % env.n_grid) for time_idx in range(env.t_pts + 1)]
+
+
+def assert_conflict_free(env, paths):
+    for path_ids in paths:
+        assert path_ids is not None
+        assert all(nbr_id - node_id - env.n_grid in (0, 1, -1, env.n_grid_x, -env.n_grid_x)
+                   for node_id, nbr_id in zip(path_ids[:-1], path_ids[1:]))
+    layers = [cells_by_layer(env, path_ids) for path_ids in paths]
+    for time_idx in range(env.t_pts + 1):
+        cells = [agent_cells[time_idx] for agent_cells in layers]
+        assert len(set(cells)) == len(cells), "vertex conflict at layer {0}".format(time_idx)
+    for time_idx in range(env.t_pts):
+        moves = {(agent_cells[time_idx], agent_cells[time_idx + 1]) for agent_cells in layers
+                 if agent_cells[time_idx] != agent_cells[time_idx + 1]}
+        assert not any((cell_to, cell_from) in moves for cell_from, cell_to in moves), \
+            "edge swap at layer {0}".format(time_idx)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_paths_are_conflict_free(seed):
+    env = make_env(seed, **ENV_ARGS)
+    threat = env.bake_threat_values()
+    paths, costs = PrioritizedTimeAstar(env=env, start_ids=START_IDS, goal_cells=GOAL_CELLS, threat=threat)
+    assert_conflict_free(env, paths)
+    for path_ids, goal_cell in zip(paths, GOAL_CELLS):
+        assert path_ids[-1] % env.n_grid == goal_cell
+    # the first agent sees no reservations, so it gets the single-agent optimum
+    _, expected = LatticeTimeAstar(env=env, start_id=START_IDS[0], goal_id=GOAL_CELLS[0],
+                                   time_window=(0, env.t_final), wait=True, threat=threat)
+    assert costs[0] == pytest.approx(expected, rel=1e-12)
+    independent = [LatticeTimeAstar(env=env, start_id=start_id, goal_id=goal_cell, time_window=(0, env.t_final),
+                                    wait=True, threat=threat)[0] for start_id, goal_cell in zip(START_IDS, GOAL_CELLS)]
+    with pytest.raises(AssertionError):  # the agents do get in each other's way
+        assert_conflict_free(env, independent)
+
+
+def test_reservation_table_blocks_swaps():
+    env = make_env(0, **ENV_ARGS)
+    reservations = ReservationTable(env=env)
+    path_ids = [14, env.n_grid + 15]  # 14 -> 15 over the first time step
+    reservations.reserve_path(path_ids, park=False)
+    assert reservations.blocks(15, env.n_grid + 14)  # 15 -> 14 over the same step swaps
+    assert reservations.blocks(21, env.n_grid + 15)  # 15 is occupied at layer 1
+    assert not reservations.blocks(env.n_grid + 15, 2 * env.n_grid + 14)
+    assert reservations.conflicts([15, env.n_grid + 14]) and not reservations.conflicts([16, env.n_grid + 17])
+
+
+def test_worker_pool_matches_sequential():
+    env = make_env(1, **ENV_ARGS)
+    threat = env.bake_threat_values()
+    paths, costs = PrioritizedTimeAstar(env=env, start_ids=START_IDS, goal_cells=GOAL_CELLS, threat=threat)
+    pool_paths, pool_costs = PrioritizedTimeAstar(env=env, start_ids=START_IDS, goal_cells=GOAL_CELLS, threat=threat,
+                                                  n_workers=2)
+    assert pool_costs == pytest.approx(costs, rel=1e-12)
+    assert_conflict_free(env, pool_paths)
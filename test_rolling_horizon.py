@@ -0,0 +1,79 @@
+"""Tests of RollingHorizonPlanner on a StreamingXYTEnvironment, run with pytest"""
+
+import pytest
+from conftest import make_env
+from Threat import GaussDynamicThreatField
+from Environment import StreamingXYTEnvironment
+from LatticeSearch import RollingHorizonPlanner, LatticeTimeAstar
+
+ENV_ARGS = dict(move_cost=1, wait_cost=0.2)
+
+
+def streaming_env(env, threat_field=None):
+    """StreamingXYTEnvironment with the grid, time step, costs and threat field of env"""
+    return StreamingXYTEnvironment(x_size=env.x_size, y_size=env.y_size, x_pts=env.n_grid_x, y_pts=env.n_grid_y,
+                                   t_sep=env.t_sep, exp_cost=env.exposure_cost, wait_cost=env.wait_cost,
+                                   move_cost=env.move_cost, threat_field=threat_field or env.threat_field)
+
+
+def bounded_env(seed):
+    """make_env with threats of fixed shape, valid at any time"""
+    env = make_env(seed, **ENV_ARGS)
+    threat_field = GaussDynamicThreatField(offset=1)
+    threat_field.generate_random_field(env=env, n_threats=5, fixed_shape=True, seed=seed)
+    env.add_threat_field(threat_field)
+    return env
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("wait", [True, False])
+def test_plan_matches_lattice_search(seed, wait):
+    env = bounded_env(seed)
+    start_cell, goal_cell = 2, env.n_grid - 3
+    planner = RollingHorizonPlanner(env=streaming_env(env), horizon=env.t_pts, wait=wait)
+    path_cells, cost, reached = planner.plan(start_cell=start_cell, time_idx=0, goal_cell=goal_cell)
+    path_ids, expected = LatticeTimeAstar(env=env, start_id=start_cell, goal_id=goal_cell,
+                                          time_window=(0, env.t_final), wait=wait, use_numba=False)
+    assert reached and cost == pytest.approx(expected, rel=1e-9)
+    assert path_cells[0] == start_cell and path_cells[-1] == goal_cell
+    assert len(path_cells) == len(path_ids)
+
+
+def test_plan_outside_horizon_heads_for_goal():
+    env = bounded_env(0)
+    planner = RollingHorizonPlanner(env=streaming_env(env), horizon=3)
+    path_cells, cost, reached = planner.plan(start_cell=0, time_idx=0, goal_cell=env.n_grid - 1)
+    assert not reached and len(path_cells) == 4 and cost < float('inf')
+
+
+def threat_value(env, cell, time_idx):
+    pos_x, pos_y = (cell % env.n_grid_x) * env.grid_sep_x, (cell // env.n_grid_x) * env.grid_sep_y
+    return env.threat_field.threat_value(pos_x, pos_y, time_idx * env.t_sep)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_run_reaches_goal(seed):
+    env = bounded_env(seed)
+    stream = streaming_env(env)
+    planner = RollingHorizonPlanner(env=stream, horizon=8)
+    cells, cost, reached = planner.run(start_cell=0, goal_cell=env.n_grid - 1)
+    assert reached and cells[-1] == env.n_grid - 1
+    assert len(cells) - 1 <= env.n_grid + planner.horizon  # the default max_steps
+    expected = sum(stream.exposure_cost * threat_value(stream, cell, time_idx) +
+                   stream.move_cost * stream.step_distance[cell - prev_cell] + stream.wait_cost * stream.t_sep
+                   for time_idx, (prev_cell, cell) in enumerate(zip(cells[:-1], cells[1:]), start=1))
+    assert cost == pytest.approx(expected, rel=1e-12)
+    assert min(stream.layers) == len(cells) - 2  # layers behind the last plan were discarded
+
+
+def test_discarded_layers_raise():
+    env = bounded_env(0)
+    stream = streaming_env(env)
+    planner = RollingHorizonPlanner(env=stream, horizon=4)
+    planner.plan(start_cell=0, time_idx=3, goal_cell=env.n_grid - 1)
+    assert stream.first_layer == 3 and min(stream.layers) >= 3
+    stream.get_layer(3)
+    with pytest.raises(ValueError):
+        stream.get_layer(2)
+    with pytest.raises(ValueError):
+        planner.plan(start_cell=0, time_idx=1, goal_cell=env.n_grid - 1)
@@ -0,0 +1,87 @@
+"""Tests of PlanningService on a ThreadPoolExecutor, run with pytest"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from conftest import make_env
+from Threat import GaussThreat, GaussThreatField
+from Environment import XYEnvironment
+from Service import PlanningService, ServiceBusyError, _run_search
+
+
+def time_astar_request(service, env, timeout=None):
+    return service.time_astar(env=env, start_id=0, goal_id=env.n_grid - 1, time_window=(0, env.t_final),
+                              wait=True, timeout=timeout)
+
+
+def test_results_match_direct_search():
+    env = make_env(seed=3, n_threats=4, move_cost=1)
+    xy_env = XYEnvironment(x_size=10, y_size=10, x_pts=8, y_pts=8)
+    xy_env.add_threat_field(GaussThreatField(threats=[GaussThreat(location=(4, 4), shape=(1, 1), intensity=5)],
+                                             offset=1))
+
+    async def main():
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            async with PlanningService(executor=executor) as service:
+                time_result = await time_astar_request(service, env)
+                astar_result = await service.astar(env=xy_env, start_id=0, goal_id=xy_env.n_grid - 1)
+        return time_result, astar_result
+
+    time_result, astar_result = asyncio.run(main())
+    assert time_result == _run_search("time_astar", env, 0, env.n_grid - 1, (0, env.t_final), True)
+    assert astar_result == _run_search("astar", xy_env, 0, xy_env.n_grid - 1, None, None)
+    assert astar_result[0][0] == 0 and astar_result[0][-1] == xy_env.n_grid - 1
+
+
+def test_identical_requests_share_one_search():
+    env = make_env(seed=3, n_threats=4, move_cost=1)
+
+    async def main():
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            service = PlanningService(executor=executor)
+            results = await asyncio.gather(*(time_astar_request(service, env) for _ in range(5)))
+            return results, service.stats()
+
+    results, stats = asyncio.run(main())
+    assert all(result == results[0] for result in results)
+    assert stats["submitted"] == 1 and stats["coalesced"] == 4
+    assert stats["completed"] == 1 and stats["pending"] == 0
+
+
+def test_full_queue_raises_busy():
+    env = make_env(seed=3, n_threats=4, move_cost=1)
+
+    async def main():
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            service = PlanningService(max_pending=1, executor=executor)
+            results = await asyncio.gather(
+                time_astar_request(service, env),
+                service.time_astar(env=env, start_id=1, goal_id=env.n_grid - 1, time_window=(0, env.t_final)),
+                return_exceptions=True)
+            return results, service.stats()
+
+    results, stats = asyncio.run(main())
+    assert results[0][0] is not None
+    assert isinstance(results[1], ServiceBusyError)
+    assert stats["submitted"] == 1 and stats["rejected"] == 1
+
+
+def test_timeout_cancels_unstarted_search():
+    env = make_env(seed=3, n_threats=4, move_cost=1)
+    release = threading.Event()
+
+    async def main():
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            blocker = executor.submit(release.wait)  # keeps the only worker busy
+            service = PlanningService(executor=executor)
+            with pytest.raises(asyncio.TimeoutError):
+                await time_astar_request(service, env, timeout=0.05)
+            release.set()
+            blocker.result()
+            await asyncio.sleep(0.01)  # let the done callback of the cancelled search run
+            return service.stats()
+
+    stats = asyncio.run(main())
+    assert stats["timed_out"] == 1
+    assert stats["completed"] == 0 and stats["pending"] == 0
@@ -0,0 +1,109 @@
+"""Tests of the vectorized GaussThreatField methods against the per-threat ones, run with pytest"""
+
+import copy
+import numpy as np
+import pytest
+from conftest import make_env
+from Threat import GaussThreat, GaussThreatField, GaussDynamicThreatField
+
+
+def sample_points(seed, n_points=50):
+    randstate = np.random.RandomState(seed)
+    return randstate.uniform(0, 10, n_points), randstate.uniform(0, 10, n_points), randstate.uniform(0, 5, n_points)
+
+
+def assert_matches_threat_value(threat_field, seed):
+    xs, ys, ts = sample_points(seed)
+    expected = [threat_field.threat_value(x, y, t) for x, y, t in zip(xs, ys, ts)]
+    assert threat_field.threat_values(xs, ys, ts) == pytest.approx(expected, rel=1e-12)
+
+
+def test_threat_edits_reach_the_vectorized_methods():
+    threat_field = make_env(seed=2).threat_field
+    before = (threat_field.fingerprint(), hash(threat_field))
+    snapshot = copy.deepcopy(threat_field)
+    assert_matches_threat_value(threat_field, seed=0)
+    assert threat_field == snapshot
+
+    threat_field.threats[0].set_rates(location_rate=(0.3, -0.2), shape_rate=(0.1, 0.05), intensity_rate=-0.4)
+    threat_field.threats[1].intensity = threat_field.threats[1].intensity + 3
+    assert_matches_threat_value(threat_field, seed=1)
+    x, y = threat_field.threats[1].location
+    assert threat_field.edge_exposure(x, y, 0, x, y, 0.25) != snapshot.edge_exposure(x, y, 0, x, y, 0.25)
+    assert threat_field != snapshot
+    assert (threat_field.fingerprint(), hash(threat_field)) != before
+
+    rebuilt = GaussDynamicThreatField(threats=copy.deepcopy(threat_field.threats), offset=threat_field.offset)
+    assert threat_field == rebuilt and hash(threat_field) == hash(rebuilt)
+    assert threat_field.edge_exposure(x, y, 0, x, y, 0.25) == rebuilt.edge_exposure(x, y, 0, x, y, 0.25)
+    assert threat_field.fingerprint() == rebuilt.fingerprint()
+
+
+def test_edits_after_from_records():
+    threat_field = make_env(seed=3).threat_field
+    loaded = GaussDynamicThreatField.from_records(threat_field.threat_records(), offset=threat_field.offset)
+    assert loaded == threat_field
+    loaded.threats[2].location = (5, 5)
+    assert_matches_threat_value(loaded, seed=2)
+    assert loaded != threat_field
+
+
+def test_static_field_edits():
+    threat_field = GaussThreatField(threats=[GaussThreat(location=(2, 3), shape=(1, 0.5), intensity=4)], offset=0.5)
+    xs, ys, _ = sample_points(4)
+    threat_field.threat_values(xs, ys)
+    threat_field.threats[0].shape = (2, 2)
+    threat_field.threats.append(GaussThreat(location=(7, 7), shape=(0.8, 0.8), intensity=2))
+    expected = [threat_field.threat_value(x, y) for x, y in zip(xs, ys)]
+    assert threat_field.threat_values(xs, ys) == pytest.approx(expected, rel=1e-12)
+
+
+def lattice_edges(env):
+    """Start and end (x, y, t) arrays of every lattice edge of env, waits included"""
+    cells = np.arange(env.n_grid)
+    cell_x, cell_y = cells % env.n_grid_x, cells // env.n_grid_x
+    ends = []
+    for dx, dy in ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1)):
+        on_grid = ((0 <= cell_x + dx) & (cell_x + dx < env.n_grid_x) &
+                   (0 <= cell_y + dy) & (cell_y + dy < env.n_grid_y))
+        ends.append((cell_x[on_grid], cell_y[on_grid], cell_x[on_grid] + dx, cell_y[on_grid] + dy))
+    x0, y0, x1, y1 = (np.concatenate(values) for values in zip(*ends))
+    time_idx = np.arange(env.t_pts)[:, None]
+    x0, y0, x1, y1 = (np.broadcast_to(values * sep, (env.t_pts, len(values))).ravel()
+                      for values, sep in ((x0, env.grid_sep_x), (y0, env.grid_sep_y),
+                                          (x1, env.grid_sep_x), (y1, env.grid_sep_y)))
+    t0 = np.broadcast_to(time_idx * env.t_sep, (env.t_pts, len(x0) // env.t_pts)).ravel()
+    return x0, y0, t0, x1, y1, t0 + env.t_sep
+
+
+def quadrature(threat_values, x0, y0, t0, x1, y1, t1, n_samples=2001):
+    """Mean of threat_values(x, y, t) along each edge by Simpson's rule over n_samples (odd) points"""
+    s = np.linspace(0, 1, n_samples)[:, None]
+    weights = np.ones(n_samples)
+    weights[1:-1:2], weights[2:-1:2] = 4, 2
+    values = threat_values(x0 + (x1 - x0) * s, y0 + (y1 - y0) * s, t0 + (t1 - t0) * s)
+    return weights @ values / (3 * (n_samples - 1))
+
+
+@pytest.mark.parametrize("seed", range(2))
+@pytest.mark.parametrize("fixed_shape", [True, False])
+def test_edge_exposure_matches_quadrature(seed, fixed_shape):
+    env = make_env(seed=seed)
+    threat_field = GaussDynamicThreatField(offset=1)
+    threat_field.generate_random_field(env=env, n_threats=5, fixed_shape=fixed_shape, seed=seed)
+    edges = [values[seed::4] for values in lattice_edges(env)]
+    exposure = threat_field.edge_exposure(*edges)
+    # constant shapes are exact up to the erf approximation, changing shapes within the documented 3e-4
+    expected = quadrature(threat_field.threat_values, *edges)
+    assert exposure == pytest.approx(expected, rel=1e-5 if fixed_shape else 3e-4)
+    alone = [threat_field.edge_exposure(*edge) for edge in zip(*(values[::40] for values in edges))]
+    assert np.array_equal(np.ravel(alone), exposure[::40])  # per-edge piece count, not per call
+
+
+def test_static_edge_exposure_matches_quadrature():
+    env = make_env(seed=4)
+    threat_field = GaussThreatField(threats=[GaussThreat(location=(2, 3), shape=(1, 0.5), intensity=4),
+                                             GaussThreat(location=(7, 7), shape=(0.8, 0.8), intensity=-2)], offset=3)
+    x0, y0, t0, x1, y1, t1 = lattice_edges(env)
+    expected = quadrature(lambda x, y, t: threat_field.threat_values(x, y), x0, y0, t0, x1, y1, t1)
+    assert threat_field.edge_exposure(x0, y0, x1, y1) == pytest.approx(expected, rel=1e-6)
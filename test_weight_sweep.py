@@ -0,0 +1,49 @@
+"""Tests of WeightSweep against cold weighted searches, run with pytest"""
+
+import numpy as np
+import pytest
+from conftest import make_env, time_astar, weighted_env
+from LatticeSearch import LatticeTimeAstar, WeightSweep
+
+ENV_ARGS = dict(x_pts=7, y_pts=7)
+WEIGHTS = [(1, move_cost, wait_cost) for wait_cost in (0, 0.3) for move_cost in np.linspace(0, 2, 6)]
+
+
+@pytest.mark.parametrize("seed", range(2))
+@pytest.mark.parametrize("wait", [True, False])
+def test_sweep_matches_time_astar(seed, wait):
+    env = make_env(seed, offset=0.5, **ENV_ARGS)
+    goal_id = env.n_grid - 1
+    time_window = (2, env.t_final)
+    expected = [time_astar(weighted_env(env, *weights), 0, goal_id, time_window, wait)[1] for weights in WEIGHTS]
+    for reanchor in (8.0, 0.0):  # 0: a new anchor for every search
+        sweep = WeightSweep(env=env, start_id=0, goal_id=goal_id, time_window=time_window, wait=wait,
+                            use_numba=False, reanchor=reanchor)
+        results = sweep.run(WEIGHTS)
+        assert len(results) == len(WEIGHTS) == len(sweep.stats)
+        for expected_cost, (path_ids, cost) in zip(expected, results):
+            assert cost == pytest.approx(expected_cost, rel=1e-9)
+            assert path_ids[0] == 0 and path_ids[-1] % env.n_grid == goal_id
+    assert (env.exposure_cost, env.move_cost, env.wait_cost) == (1, 0, 0)
+
+
+def test_cost_to_go_is_exact():
+    env = make_env(1, offset=0.5, **ENV_ARGS)
+    goal_id = env.n_grid - 1
+    sweep = WeightSweep(env=env, start_id=0, goal_id=goal_id, time_window=(2, env.t_final), use_numba=False)
+    for weights in WEIGHTS[::3]:
+        cost_to_go = sweep.cost_to_go(*weights)
+        _, expected = LatticeTimeAstar(env=weighted_env(env, *weights), start_id=0, goal_set=sweep.goal_set,
+                                       wait=True, threat=sweep.threat, use_numba=False)
+        assert cost_to_go.flat[0] == pytest.approx(expected, rel=1e-9)
+
+
+def test_negative_threat_runs_cold():
+    env = make_env(0, offset=-0.5, **ENV_ARGS)
+    goal_id = env.n_grid - 1
+    sweep = WeightSweep(env=env, start_id=0, goal_id=goal_id, time_window=(2, env.t_final), use_numba=False)
+    assert not sweep.warm
+    for weights, (_, cost) in zip(WEIGHTS, sweep.run(WEIGHTS)):
+        _, expected = LatticeTimeAstar(env=weighted_env(env, *weights), start_id=0, goal_id=goal_id,
+                                       time_window=(2, env.t_final), wait=True, threat=sweep.threat, use_numba=False)
+        assert cost == expected